@@ -34,6 +34,7 @@ import getopt
 import sickbeard
 
 from sickbeard import db
+from sickbeard import show_registry, show_loader, snapshot
 from sickbeard.tv import TVShow
 from sickbeard import logger
 from sickbeard.version import SICKBEARD_VERSION
@@ -47,9 +48,27 @@ signal.signal(signal.SIGTERM, sickbeard.sig_handler)
 
 def loadShowsFromDB():
 
+    # the snapshot from the last clean shutdown has everything already, the folders are still checked
+    if sickbeard.SHOW_SNAPSHOT and snapshot.restore(sickbeard.showList):
+        show_loader.finishLoading(list(sickbeard.showList))
+        return
+
     myDB = db.DBConnection()
     sqlResults = myDB.select("SELECT * FROM tv_shows")
 
+    # build the shows from the rows we just got and check their folders in the background
+    if sickbeard.LAZY_SHOW_LOADING:
+        for sqlShow in sqlResults:
+            try:
+                curShow = TVShow.fromDBRow(sqlShow)
+                sickbeard.showList.append(curShow)
+            except Exception, e:
+                logger.log(u"There was an error creating the show in "+sqlShow["location"]+": "+str(e).decode('utf-8'), logger.ERROR)
+                logger.log(traceback.format_exc(), logger.DEBUG)
+
+        show_loader.finishLoading(list(sickbeard.showList))
+        return
+
     for sqlShow in sqlResults:
         try:
             curShow = TVShow(int(sqlShow["tvdb_id"]))
@@ -220,7 +239,7 @@ def main():
     # initialize the config and our threads
     sickbeard.initialize(consoleLogging=consoleLogging)
 
-    sickbeard.showList = []
+    sickbeard.showList = show_registry.ShowRegistry()
 
     if sickbeard.DAEMON:
         daemonize()
@@ -33,7 +33,7 @@ from sickbeard import providers, metadata
 from providers import ezrss, tvtorrents, nzbs_org, nzbmatrix, nzbsrus, newznab, womble, newzbin, fanzub
 
 from sickbeard import searchCurrent, searchBacklog, showUpdater, versionChecker, properFinder, autoPostProcesser
-from sickbeard import helpers, db, exceptions, show_queue, search_queue, scheduler
+from sickbeard import helpers, db, exceptions, show_queue, search_queue, scheduler, dbMaintenance, show_registry, snapshot, folder_watcher
 from sickbeard import logger
 
 from sickbeard.common import *
@@ -70,6 +70,8 @@ showQueueScheduler = None
 searchQueueScheduler = None
 properFinderScheduler = None
 autoPostProcesserScheduler = None
+dbMaintenanceScheduler = None
+folderWatcherScheduler = None
 
 showList = None
 loadingShowList = None
@@ -253,6 +255,28 @@ GIT_PATH = None
 
 IGNORE_WORDS = "german,french,core2hd,dutch,swedish"
 
+EPISODE_CACHE_SIZE = 5000
+
+LAZY_SHOW_LOADING = True
+SHOW_SNAPSHOT = False
+
+FOLDER_WATCHER = False
+FOLDER_WATCHER_MAX_WATCHES = 8192
+FOLDER_WATCHER_POLL_INTERVAL = 300
+
+DB_JOURNAL_MODE = 'delete'
+DB_SYNCHRONOUS = 'full'
+DB_CACHE_SIZE = 0
+DB_MMAP_SIZE = 0
+DB_TEMP_STORE = 'default'
+DB_QUERY_STATS = False
+DB_SLOW_QUERY_MS = 0
+DB_WRITE_BEHIND = False
+DB_WRITE_BEHIND_SIZE = 200
+DB_WRITE_BEHIND_SECONDS = 5
+DB_HISTORY_RETENTION_DAYS = 0
+DB_EPISODE_STATUS_CACHE = True
+
 __INITIALIZED__ = False
 
 def CheckSection(sec):
@@ -360,7 +384,7 @@ def initialize(consoleLogging=True):
                 KEEP_PROCESSED_DIR, TV_DOWNLOAD_DIR, TVDB_BASE_URL, MIN_SEARCH_FREQUENCY, \
                 showQueueScheduler, searchQueueScheduler, ROOT_DIRS, \
                 NAMING_SHOW_NAME, NAMING_EP_TYPE, NAMING_MULTI_EP_TYPE, CACHE_DIR, ACTUAL_CACHE_DIR, TVDB_API_PARMS, \
-                RENAME_EPISODES, properFinderScheduler, PROVIDER_ORDER, autoPostProcesserScheduler, \
+                RENAME_EPISODES, properFinderScheduler, PROVIDER_ORDER, autoPostProcesserScheduler, dbMaintenanceScheduler, folderWatcherScheduler, \
                 NAMING_EP_NAME, NAMING_SEP_TYPE, NAMING_USE_PERIODS, WOMBLE, \
                 NZBSRUS, NZBSRUS_UID, NZBSRUS_HASH, NAMING_QUALITY, providerList, newznabProviderList, \
                 NAMING_DATES,NAMING_ANIME, EXTRA_SCRIPTS, USE_TWITTER, TWITTER_USERNAME, TWITTER_PASSWORD, TWITTER_PREFIX, \
@@ -368,7 +392,10 @@ def initialize(consoleLogging=True):
                 USE_LIBNOTIFY, LIBNOTIFY_NOTIFY_ONSNATCH, LIBNOTIFY_NOTIFY_ONDOWNLOAD, USE_NMJ, NMJ_HOST, NMJ_DATABASE, NMJ_MOUNT, \
                 USE_BANNER, USE_LISTVIEW, METADATA_XBMC, METADATA_MEDIABROWSER, METADATA_PS3, metadata_provider_dict, \
                 NEWZBIN, NEWZBIN_USERNAME, NEWZBIN_PASSWORD,FANZUB, GIT_PATH, MOVE_ASSOCIATED_FILES, \
-                COMING_EPS_LAYOUT, COMING_EPS_SORT, COMING_EPS_DISPLAY_PAUSED, METADATA_WDTV, ANIMESUPPORT, IGNORE_WORDS
+                COMING_EPS_LAYOUT, COMING_EPS_SORT, COMING_EPS_DISPLAY_PAUSED, METADATA_WDTV, ANIMESUPPORT, IGNORE_WORDS, \
+                DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_CACHE_SIZE, DB_MMAP_SIZE, DB_TEMP_STORE, DB_QUERY_STATS, DB_SLOW_QUERY_MS, \
+                DB_WRITE_BEHIND, DB_WRITE_BEHIND_SIZE, DB_WRITE_BEHIND_SECONDS, DB_HISTORY_RETENTION_DAYS, DB_EPISODE_STATUS_CACHE, \
+                EPISODE_CACHE_SIZE, LAZY_SHOW_LOADING, SHOW_SNAPSHOT, FOLDER_WATCHER, FOLDER_WATCHER_MAX_WATCHES, FOLDER_WATCHER_POLL_INTERVAL
 
         if __INITIALIZED__:
             return False
@@ -386,6 +413,7 @@ def initialize(consoleLogging=True):
         CheckSection('Prowl')
         CheckSection('Twitter')
         CheckSection('NMJ')
+        CheckSection('Database')
 
         LOG_DIR = check_setting_str(CFG, 'General', 'log_dir', 'Logs')
         if not helpers.makeDir(LOG_DIR):
@@ -583,6 +611,21 @@ def initialize(consoleLogging=True):
 
         IGNORE_WORDS = check_setting_str(CFG, 'General', 'ignore_words', IGNORE_WORDS)
 
+        # how many episode objects are kept in memory across all shows, 0 keeps all of them
+        EPISODE_CACHE_SIZE = max(0, check_setting_int(CFG, 'General', 'episode_cache_size', 5000))
+
+        # build the shows from the DB at startup without writing them back, their folders are checked in the background
+        LAZY_SHOW_LOADING = bool(check_setting_int(CFG, 'General', 'lazy_show_loading', 1))
+
+        # write the shows to DATA_DIR on shutdown and start from there next time if the DB didn't change
+        SHOW_SNAPSHOT = bool(check_setting_int(CFG, 'General', 'show_snapshot', 0))
+
+        # watch the show folders and refresh changed files right away instead of waiting for the nightly refresh
+        FOLDER_WATCHER = bool(check_setting_int(CFG, 'General', 'folder_watcher', 0))
+        # one inotify watch per folder, shows that don't fit are polled every folder_watcher_poll_interval seconds
+        FOLDER_WATCHER_MAX_WATCHES = max(1, check_setting_int(CFG, 'General', 'folder_watcher_max_watches', 8192))
+        FOLDER_WATCHER_POLL_INTERVAL = max(30, check_setting_int(CFG, 'General', 'folder_watcher_poll_interval', 300))
+
         EXTRA_SCRIPTS = [x for x in check_setting_str(CFG, 'General', 'extra_scripts', '').split('|') if x]
 
         USE_BANNER = bool(check_setting_int(CFG, 'General', 'use_banner', 0))
@@ -653,14 +696,36 @@ def initialize(consoleLogging=True):
         
         logger.sb_log_instance.initLogging(consoleLogging=consoleLogging)
 
+        # set journal_mode to wal to let the UI read while something is writing to the DB
+        DB_JOURNAL_MODE = check_setting_str(CFG, 'Database', 'db_journal_mode', 'delete')
+        DB_SYNCHRONOUS = check_setting_str(CFG, 'Database', 'db_synchronous', 'full')
+        DB_CACHE_SIZE = check_setting_int(CFG, 'Database', 'db_cache_size', 0)
+        DB_MMAP_SIZE = check_setting_int(CFG, 'Database', 'db_mmap_size', 0)
+        DB_TEMP_STORE = check_setting_str(CFG, 'Database', 'db_temp_store', 'default')
+
+        # query timing is shown on the logs page, slow queries are logged with their plan
+        DB_QUERY_STATS = bool(check_setting_int(CFG, 'Database', 'db_query_stats', 0))
+        DB_SLOW_QUERY_MS = check_setting_int(CFG, 'Database', 'db_slow_query_ms', 0)
+        DB_WRITE_BEHIND = bool(check_setting_int(CFG, 'Database', 'db_write_behind', 0))
+        DB_WRITE_BEHIND_SIZE = max(1, check_setting_int(CFG, 'Database', 'db_write_behind_size', 200))
+        DB_WRITE_BEHIND_SECONDS = max(1, check_setting_int(CFG, 'Database', 'db_write_behind_seconds', 5))
+        DB_HISTORY_RETENTION_DAYS = max(0, check_setting_int(CFG, 'Database', 'db_history_retention_days', 0))
+        DB_EPISODE_STATUS_CACHE = bool(check_setting_int(CFG, 'Database', 'db_episode_status_cache', 1))
+
+        # the snapshot is only any good if nothing touched the DB since it was written, so check it first
+        if SHOW_SNAPSHOT:
+            snapshot.check()
+
         # initialize the main SB database
-        db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema)
+        mainUpgraded = db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema, mainDB.MAX_DB_VERSION)
+        if mainUpgraded:
+            snapshot.discard()
         
         # initialize the cache database
-        db.upgradeDatabase(db.DBConnection("cache.db"), cache_db.InitialSchema)
+        db.upgradeDatabase(db.DBConnection("cache.db"), cache_db.InitialSchema, cache_db.MAX_DB_VERSION)
         
-        # fix up any db problems
-        db.sanityCheckDatabase(db.DBConnection(), mainDB.MainSanityCheck)
+        # fix up any db problems, a full check is only needed after an upgrade or when it never ran
+        db.sanityCheckDatabase(db.DBConnection(), mainDB.MainSanityCheck, force=mainUpgraded)
 
         currentSearchScheduler = scheduler.Scheduler(searchCurrent.CurrentSearcher(),
                                                      cycleTime=datetime.timedelta(minutes=SEARCH_FREQUENCY),
@@ -706,8 +771,20 @@ def initialize(consoleLogging=True):
                                                                       runImmediately=True)
         backlogSearchScheduler.action.cycleTime = BACKLOG_SEARCH_FREQUENCY
 
+        # the interval for this is stored inside the DBMaintenance class
+        dbMaintenanceInstance = dbMaintenance.DBMaintenance()
+        dbMaintenanceScheduler = scheduler.Scheduler(dbMaintenanceInstance,
+                                                     cycleTime=dbMaintenanceInstance.updateInterval,
+                                                     threadName="DBMAINTENANCE",
+                                                     runImmediately=False)
+
+        folderWatcherScheduler = scheduler.Scheduler(folder_watcher.FolderWatcher(),
+                                                     cycleTime=datetime.timedelta(seconds=2),
+                                                     threadName="FOLDERWATCHER",
+                                                     silent=True)
+
 
-        showList = []
+        showList = show_registry.ShowRegistry()
         loadingShowList = {}
 
         __INITIALIZED__ = True
@@ -718,7 +795,7 @@ def start():
     global __INITIALIZED__, currentSearchScheduler, backlogSearchScheduler, \
             showUpdateScheduler, versionCheckScheduler, showQueueScheduler, \
             properFinderScheduler, autoPostProcesserScheduler, searchQueueScheduler, \
-            started
+            dbMaintenanceScheduler, folderWatcherScheduler, started
 
     with INIT_LOCK:
 
@@ -747,6 +824,12 @@ def start():
 
             # start the proper finder
             autoPostProcesserScheduler.thread.start()
+
+            # start the database maintenance
+            dbMaintenanceScheduler.thread.start()
+
+            # start the folder watcher
+            folderWatcherScheduler.thread.start()
             
             started = True
 
@@ -754,7 +837,7 @@ def halt ():
 
     global __INITIALIZED__, currentSearchScheduler, backlogSearchScheduler, showUpdateScheduler, \
             showQueueScheduler, properFinderScheduler, autoPostProcesserScheduler, searchQueueScheduler, \
-            started
+            dbMaintenanceScheduler, folderWatcherScheduler, started
 
     with INIT_LOCK:
 
@@ -820,6 +903,26 @@ def halt ():
             except:
                 pass
 
+            dbMaintenanceScheduler.abort = True
+            logger.log(u"Waiting for the DBMAINTENANCE thread to exit")
+            try:
+                dbMaintenanceScheduler.thread.join(10)
+            except:
+                pass
+
+            folderWatcherScheduler.abort = True
+            logger.log(u"Waiting for the FOLDERWATCHER thread to exit")
+            try:
+                folderWatcherScheduler.thread.join(10)
+            except:
+                pass
+            folderWatcherScheduler.action.stop()
+
+            # all the threads are gone so their DB connections can go too
+            db.writeQueue.flush()
+            logger.log(u"Closing all database connections")
+            db.connectionPool.closeAll()
+
 
             __INITIALIZED__ = False
 
@@ -839,6 +942,13 @@ def saveAll():
     for show in showList:
         show.saveToDB()
 
+    # make sure nothing is left in the write-behind queue
+    db.writeQueue.flush()
+
+    if SHOW_SNAPSHOT:
+        logger.log(u"Writing the show snapshot")
+        snapshot.save()
+
     # save config
     logger.log(u"Saving config file to disk")
     save_config()
@@ -967,6 +1077,12 @@ def save_config():
     new_config['General']['extra_scripts'] = '|'.join(EXTRA_SCRIPTS)
     new_config['General']['git_path'] = GIT_PATH
     new_config['General']['ignore_words'] = IGNORE_WORDS
+    new_config['General']['episode_cache_size'] = int(EPISODE_CACHE_SIZE)
+    new_config['General']['lazy_show_loading'] = int(LAZY_SHOW_LOADING)
+    new_config['General']['show_snapshot'] = int(SHOW_SNAPSHOT)
+    new_config['General']['folder_watcher'] = int(FOLDER_WATCHER)
+    new_config['General']['folder_watcher_max_watches'] = int(FOLDER_WATCHER_MAX_WATCHES)
+    new_config['General']['folder_watcher_poll_interval'] = int(FOLDER_WATCHER_POLL_INTERVAL)
 
     new_config['Blackhole'] = {}
     new_config['Blackhole']['nzb_dir'] = NZB_DIR
@@ -1081,6 +1197,20 @@ def save_config():
     new_config['Newznab'] = {}
     new_config['Newznab']['newznab_data'] = '!!!'.join([x.configStr() for x in newznabProviderList])
 
+    new_config['Database'] = {}
+    new_config['Database']['db_journal_mode'] = DB_JOURNAL_MODE
+    new_config['Database']['db_synchronous'] = DB_SYNCHRONOUS
+    new_config['Database']['db_cache_size'] = int(DB_CACHE_SIZE)
+    new_config['Database']['db_mmap_size'] = int(DB_MMAP_SIZE)
+    new_config['Database']['db_temp_store'] = DB_TEMP_STORE
+    new_config['Database']['db_query_stats'] = int(DB_QUERY_STATS)
+    new_config['Database']['db_slow_query_ms'] = int(DB_SLOW_QUERY_MS)
+    new_config['Database']['db_write_behind'] = int(DB_WRITE_BEHIND)
+    new_config['Database']['db_write_behind_size'] = int(DB_WRITE_BEHIND_SIZE)
+    new_config['Database']['db_write_behind_seconds'] = int(DB_WRITE_BEHIND_SECONDS)
+    new_config['Database']['db_history_retention_days'] = int(DB_HISTORY_RETENTION_DAYS)
+    new_config['Database']['db_episode_status_cache'] = int(DB_EPISODE_STATUS_CACHE)
+
     new_config['GUI'] = {}
     new_config['GUI']['coming_eps_layout'] = COMING_EPS_LAYOUT
     new_config['GUI']['coming_eps_display_paused'] = int(COMING_EPS_DISPLAY_PAUSED)
@@ -19,6 +19,9 @@
 from sickbeard import db
 
 # Add new migrations at the bottom of the list; subclass the previous migration.
+# Bump MAX_DB_VERSION with every new migration, startup skips all the checks when db_version has reached it.
+MAX_DB_VERSION = 2
+
 class InitialSchema (db.SchemaUpgrade):
     def test(self):
         return self.hasTable("lastUpdate")
@@ -48,4 +51,45 @@ class AddSceneNameCache(AddSceneExceptions):
         return self.hasTable("scene_names")
 
     def execute(self):
-        self.connection.action("CREATE TABLE scene_names (tvdb_id INTEGER, name TEXT)")
\ No newline at end of file
+        self.connection.action("CREATE TABLE scene_names (tvdb_id INTEGER, name TEXT)")
+
+class AddLookupIndexes(AddSceneNameCache):
+    def test(self):
+        return self.hasColumn("scene_exceptions", "show_name_lower") and self.hasTable("idx_scene_exceptions_show_name_lower") and \
+               self.hasTable("idx_scene_exceptions_tvdb_id") and self.hasTable("idx_scene_names_name")
+
+    def execute(self):
+
+        # sqlite's LOWER() only knows ascii so the lower case names are filled in from python
+        if not self.hasColumn("scene_exceptions", "show_name_lower"):
+            self.connection.action("ALTER TABLE scene_exceptions ADD show_name_lower TEXT")
+            exceptions = self.connection.select("SELECT exception_id, show_name FROM scene_exceptions")
+            self.connection.mass_action([["UPDATE scene_exceptions SET show_name_lower = ? WHERE exception_id = ?", [cur_exception["show_name"].lower(), cur_exception["exception_id"]]]
+                                         for cur_exception in exceptions if cur_exception["show_name"]])
+
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_scene_exceptions_show_name_lower ON scene_exceptions(show_name_lower);")
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_scene_exceptions_tvdb_id ON scene_exceptions(tvdb_id);")
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_scene_names_name ON scene_names(name);")
+
+class AddProviderCache(AddLookupIndexes):
+    def test(self):
+        return self.hasTable("provider_cache")
+
+    def execute(self):
+
+        # sqlite commits on its own before DDL so this can't be one transaction, every step is safe
+        # to run again instead and the new tables are there before the old ones go
+        self.connection.action("CREATE TABLE IF NOT EXISTS provider_cache (cache_id INTEGER PRIMARY KEY, provider TEXT, name TEXT, season NUMERIC, tvrid NUMERIC, tvdbid NUMERIC, url TEXT, time NUMERIC, quality TEXT)")
+        self.connection.action("CREATE TABLE IF NOT EXISTS provider_cache_episodes (cache_id INTEGER, season NUMERIC, episode NUMERIC)")
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_provider_cache_tvdbid_season ON provider_cache(provider,tvdbid,season);")
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_provider_cache_episodes ON provider_cache_episodes(cache_id,season,episode);")
+
+        # make sure every provider refreshes its cache on the next search
+        self.connection.action("DELETE FROM lastUpdate")
+
+        # the old per-provider cache tables are replaced by provider_cache, they only hold the last rss feed so just drop them
+        tables = self.connection.select("SELECT name FROM sqlite_master WHERE type = 'table'")
+        for cur_table in tables:
+            columns = self.connection.tableInfo(cur_table["name"])
+            if "episodes" in columns and "url" in columns:
+                self.connection.action("DROP TABLE IF EXISTS [" + cur_table["name"] + "]")
\ No newline at end of file
@@ -55,6 +55,8 @@ class MainSanityCheck(db.DBSanityCheck):
 # = Main DB Migrations =
 # ======================
 # Add new migrations at the bottom of the list; subclass the previous migration.
+# Bump MAX_DB_VERSION with every new migration, startup skips all the checks when db_version has reached it.
+MAX_DB_VERSION = 11
 
 class InitialSchema (db.SchemaUpgrade):
     def test(self):
@@ -412,3 +414,56 @@ class AddAbsoluteEpisodeTVEpisode(AddAbsoluteEpisodeTVShow):
 
     def execute(self):
         self.addColumn("tv_episodes", "absolute_number", "NUMERIC", "NULL")
+
+class AddUniqueEpisodeIndex(AddAbsoluteEpisodeTVEpisode):
+    def test(self):
+        return self.hasTable("idx_tv_episodes_unique") and self.hasTable("idx_tv_shows_unique")
+
+    def execute(self):
+
+        with self.connection.transaction():
+
+            # keep the oldest row of every duplicate, the unique indexes can't be created otherwise
+            dupeEpisodes = self.connection.select("SELECT COUNT(*) FROM tv_episodes WHERE episode_id NOT IN (SELECT MIN(episode_id) FROM tv_episodes GROUP BY showid, season, episode)")[0][0]
+            if dupeEpisodes:
+                logger.log(u"Deleting "+str(dupeEpisodes)+" duplicate episodes before adding the unique episode index")
+                self.connection.action("DELETE FROM tv_episodes WHERE episode_id NOT IN (SELECT MIN(episode_id) FROM tv_episodes GROUP BY showid, season, episode)")
+
+            dupeShows = self.connection.select("SELECT COUNT(*) FROM tv_shows WHERE show_id NOT IN (SELECT MIN(show_id) FROM tv_shows GROUP BY tvdb_id)")[0][0]
+            if dupeShows:
+                logger.log(u"Deleting "+str(dupeShows)+" duplicate shows before adding the unique show index")
+                self.connection.action("DELETE FROM tv_shows WHERE show_id NOT IN (SELECT MIN(show_id) FROM tv_shows GROUP BY tvdb_id)")
+
+            self.connection.action("CREATE UNIQUE INDEX IF NOT EXISTS idx_tv_episodes_unique ON tv_episodes(showid,season,episode);")
+            self.connection.action("CREATE UNIQUE INDEX IF NOT EXISTS idx_tv_shows_unique ON tv_shows(tvdb_id);")
+
+class AddLookupIndexes(AddUniqueEpisodeIndex):
+    def test(self):
+        return self.hasTable("idx_tv_episodes_status_airdate") and self.hasTable("idx_tv_episodes_showid_absolute") and self.hasTable("idx_history_resource")
+
+    def execute(self):
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_tv_episodes_status_airdate ON tv_episodes(status,airdate);")
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_tv_episodes_showid_absolute ON tv_episodes(showid,absolute_number);")
+        # history is searched with LIKE which is case insensitive, sqlite only uses a NOCASE index for that
+        self.connection.action("CREATE INDEX IF NOT EXISTS idx_history_resource ON history(resource COLLATE NOCASE);")
+
+class AddSanityCheckTime(AddLookupIndexes):
+    def test(self):
+        return self.checkDBVersion() >= 10
+
+    def execute(self):
+        if not self.hasColumn("db_version", "last_sanity_check"):
+            self.addColumn("db_version", "last_sanity_check", "NUMERIC", 0)
+
+        self.incDBVersion()
+
+class AddFileIndex(AddSanityCheckTime):
+    def test(self):
+        return self.checkDBVersion() >= 11
+
+    def execute(self):
+        # what every media file in a show folder looked like when it was last parsed, rescans skip the ones that didn't change
+        self.connection.action("CREATE TABLE IF NOT EXISTS file_index (showid NUMERIC, path TEXT, size NUMERIC, mtime NUMERIC, season NUMERIC, episodes TEXT);")
+        self.connection.action("CREATE UNIQUE INDEX IF NOT EXISTS idx_file_index_showid_path ON file_index(showid,path);")
+
+        self.incDBVersion()
@@ -18,6 +18,9 @@
 
 from __future__ import with_statement 
 
+import collections
+import contextlib
+import datetime
 import os.path
 import re
 import sqlite3
@@ -29,55 +32,542 @@ import sickbeard
 from sickbeard import logger
 from sickbeard.exceptions import ex
 
-db_lock = threading.Lock()
+# reentrant so that statements run inside a transaction() can take it again
+# in WAL mode only writes take it, readers don't have to wait for a writer
+db_lock = threading.RLock()
+
+# per thread: db path -> how many transaction() blocks are currently open on it
+_transactionState = threading.local()
+
+class DBConnectionPool(object):
+    """
+    Keeps one open sqlite3 connection per thread and database file so that
+    DBConnection objects can be created cheaply and as often as needed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # (thread, full db path) -> sqlite3 connection
+        self._connections = {}
+
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def getConnection(self, dbFileName):
+
+        dbPath = os.path.join(sickbeard.DATA_DIR, dbFileName)
+        curThread = threading.currentThread()
+
+        with self._lock:
+
+            key = (curThread, dbPath)
+
+            if key in self._connections:
+                self.reused += 1
+                return self._connections[key]
+
+            # opening a new connection is a good time to drop the ones left behind by finished threads
+            self._closeDeadThreads()
+
+            # the connection is only ever used by its own thread but it may be closed from another one
+            connection = sqlite3.connect(dbPath, 20, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+
+            self._applyPragmas(connection, dbPath)
+
+            self._connections[key] = connection
+            self.opened += 1
+
+            return connection
+
+    def _applyPragmas(self, connection, dbPath):
+        """
+        Tunes a new connection according to the DB settings from the config
+        """
+
+        pragmas = [('journal_mode', sickbeard.DB_JOURNAL_MODE),
+                   ('synchronous', sickbeard.DB_SYNCHRONOUS),
+                   ('temp_store', sickbeard.DB_TEMP_STORE)]
+
+        # 0 means use the sqlite default
+        if sickbeard.DB_CACHE_SIZE:
+            pragmas.append(('cache_size', sickbeard.DB_CACHE_SIZE))
+        if sickbeard.DB_MMAP_SIZE:
+            pragmas.append(('mmap_size', sickbeard.DB_MMAP_SIZE))
+
+        for (name, value) in pragmas:
+            # pragma values can't be bound so only allow plain words and numbers through
+            if not re.match(r'^-?\w+$', str(value)):
+                logger.log(u"Invalid value "+repr(value)+" for PRAGMA "+name+", ignoring it", logger.WARNING)
+                continue
+
+            try:
+                connection.execute("PRAGMA %s = %s" % (name, value))
+            except sqlite3.OperationalError, e:
+                logger.log(u"Unable to set PRAGMA "+name+" on "+dbPath+": "+ex(e), logger.WARNING)
+
+    def _closeDeadThreads(self):
+        for (curThread, dbPath) in self._connections.keys():
+            if not curThread.isAlive():
+                self._close((curThread, dbPath))
+
+    def _close(self, key):
+        try:
+            self._connections[key].close()
+        except sqlite3.Error, e:
+            logger.log(u"Unable to close connection to "+key[1]+": "+ex(e), logger.WARNING)
+        del self._connections[key]
+        self.closed += 1
+
+    def closeAll(self):
+        """
+        Closes every pooled connection, used on shutdown. Connections will be
+        reopened on demand if the DB is used again afterwards.
+        """
+        # db_lock first so no statement is running on a connection when it's closed
+        with db_lock:
+            with self._lock:
+                for key in self._connections.keys():
+                    self._close(key)
+
+                logger.log(u"Closed all database connections (opened: "+str(self.opened)+", reused: "+str(self.reused)+", closed: "+str(self.closed)+")", logger.DEBUG)
+
+    def stats(self):
+        with self._lock:
+            return {'open': len(self._connections),
+                    'opened': self.opened,
+                    'reused': self.reused,
+                    'closed': self.closed}
+
+connectionPool = DBConnectionPool()
+
+class QueryStats(object):
+    """
+    Optional per-query timing. Queries are grouped by their SQL text with all the literals
+    taken out, for each group the count, total time, recent durations (for percentiles) and
+    rows returned are kept. Queries slower than DB_SLOW_QUERY_MS are logged with their plan.
+    """
+
+    # how many durations to keep per query for the percentiles
+    MAX_SAMPLES = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+        self.since = datetime.datetime.now()
+
+    def isEnabled(self):
+        return sickbeard.DB_QUERY_STATS or sickbeard.DB_SLOW_QUERY_MS > 0
+
+    def normalize(self, query):
+        """
+        >>> queryStats.normalize("SELECT * FROM tv_episodes WHERE showid = 5 AND  name = 'x' AND season IN (?,?, ?)")
+        'SELECT * FROM tv_episodes WHERE showid = ? AND name = ? AND season IN (...)'
+        """
+        query = re.sub(r"'(?:[^']|'')*'", "?", query)
+        query = re.sub(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])", "?", query)
+        query = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(...)", query)
+        return re.sub(r"\s+", " ", query).strip()
+
+    def record(self, connection, query, args, duration, rows=None):
+
+        if sickbeard.DB_SLOW_QUERY_MS > 0 and duration * 1000 >= sickbeard.DB_SLOW_QUERY_MS:
+            self._logSlowQuery(connection, query, args, duration)
+
+        if not sickbeard.DB_QUERY_STATS:
+            return
+
+        key = (connection.dbFileName, self.normalize(query))
+
+        with self._lock:
+            if key not in self._queries:
+                self._queries[key] = {'count': 0, 'total': 0.0, 'max': 0.0, 'rows': 0, 'samples': []}
+
+            curStats = self._queries[key]
+            curStats['count'] += 1
+            curStats['total'] += duration
+            curStats['max'] = max(curStats['max'], duration)
+            if rows != None:
+                curStats['rows'] += rows
+
+            curStats['samples'].append(duration)
+            if len(curStats['samples']) > self.MAX_SAMPLES:
+                del curStats['samples'][0]
+
+    def _logSlowQuery(self, connection, query, args, duration):
+
+        try:
+            if args == None:
+                plan = connection.connection.execute("EXPLAIN QUERY PLAN " + query).fetchall()
+            else:
+                plan = connection.connection.execute("EXPLAIN QUERY PLAN " + query, args).fetchall()
+            planText = "; ".join([str(x[-1]) for x in plan])
+        except sqlite3.Error, e:
+            planText = "unavailable (" + ex(e) + ")"
+
+        logger.log(u"Slow query (%.1f ms) on %s: %s with args %s, query plan: %s" % (duration * 1000, connection.dbFileName, query, str(args), planText), logger.WARNING)
+
+    def getStats(self):
+        """
+        Returns a list of dicts with the stats of each query, most expensive first
+        """
+
+        results = []
+
+        with self._lock:
+            for (dbFileName, query) in self._queries:
+                curStats = self._queries[(dbFileName, query)]
+                samples = sorted(curStats['samples'])
+
+                results.append({'db': dbFileName,
+                                'query': query,
+                                'count': curStats['count'],
+                                'total': curStats['total'],
+                                'avg': curStats['total'] / curStats['count'],
+                                'p50': samples[len(samples) / 2],
+                                'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                                'max': curStats['max'],
+                                'rows': curStats['rows']})
+
+        results.sort(key=lambda x: x['total'], reverse=True)
+
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._queries = {}
+            self.since = datetime.datetime.now()
+
+queryStats = QueryStats()
+
+# INSERT ... ON CONFLICT DO UPDATE needs sqlite 3.24, older versions fall back to UPDATE then INSERT
+UPSERT_SUPPORTED = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+# (dbPath, table, key columns) that are known to have a unique index
+_uniqueKeys = set()
+
+class WriteBehindQueue(object):
+    """
+    Optionally collects upserts and writes them in one transaction once enough of them are waiting
+    or the oldest one has waited long enough. Repeated saves of the same row are merged so only the
+    newest values get written. Any query that mentions a table with pending rows flushes them first
+    so nobody reads stale data.
+
+    A flush that happens inside a transaction() writes its rows as part of that transaction. They're
+    only done with once it commits; if it's rolled back they go back in the queue.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+        # (dbFileName, table, key items) -> [valueDict, keyDict], in the order they were first queued
+        self._pending = collections.OrderedDict()
+        self._tables = set()
+
+        # (thread, dbFileName) -> the rows flushed into that thread's open transaction, same layout as _pending
+        self._uncommitted = {}
+
+        # one writer thread for as long as we run, it keeps using the same pooled connection
+        self._writer = None
+        self._wakeUp = threading.Event()
+
+        self.queued = 0
+        self.merged = 0
+        self.flushed = 0
+
+    def isEnabled(self):
+        return sickbeard.DB_WRITE_BEHIND
+
+    def _merge(self, rows, rowKey, valueDict, keyDict):
+        if rowKey in rows:
+            rows[rowKey][0].update(valueDict)
+        else:
+            rows[rowKey] = [dict(valueDict), dict(keyDict)]
+
+    def _requeue(self, rows):
+        """
+        Puts rows that didn't make it to disk back in the queue, anything queued since is newer so it wins
+        """
+        for rowKey, (valueDict, keyDict) in rows.items():
+            if rowKey in self._pending:
+                newer = self._pending[rowKey][0]
+                self._pending[rowKey][0] = dict(valueDict)
+                self._pending[rowKey][0].update(newer)
+            else:
+                self._pending[rowKey] = [valueDict, keyDict]
+            self._tables.add((rowKey[0], rowKey[1]))
+
+    def _startWriter(self):
+        if self._writer == None or not self._writer.isAlive():
+            self._writer = threading.Thread(target=self._runWriter, name="DBWRITER")
+            self._writer.setDaemon(True)
+            self._writer.start()
+        self._wakeUp.set()
+
+    def _runWriter(self):
+        while True:
+            self._wakeUp.wait()
+            # let the rows pile up for a while, whatever is queued until the flush starts goes with it
+            time.sleep(sickbeard.DB_WRITE_BEHIND_SECONDS)
+            self._wakeUp.clear()
+
+            try:
+                self.flush()
+            except Exception, e:
+                logger.log(u"Unable to write the queued rows, trying again later: "+ex(e), logger.ERROR)
+                self._wakeUp.set()
+
+    def upsert(self, tableName, valueDict, keyDict, dbFileName="sickbeard.db"):
+
+        myDB = DBConnection(dbFileName)
+
+        # a transaction already batches its writes and has to be able to roll them back
+        if not self.isEnabled() or myDB.inTransaction():
+            myDB.upsert(tableName, valueDict, keyDict)
+            return
+
+        rowKey = (dbFileName, tableName, tuple(sorted(keyDict.items())))
+
+        with self._lock:
+            self.queued += 1
+
+            if rowKey in self._pending:
+                self.merged += 1
+            else:
+                self._tables.add((dbFileName, tableName))
+            self._merge(self._pending, rowKey, valueDict, keyDict)
+
+            flushNow = len(self._pending) >= sickbeard.DB_WRITE_BEHIND_SIZE
+
+            if not flushNow:
+                self._startWriter()
+
+        if flushNow:
+            self.flush()
+
+    def hasPending(self, dbFileName, query):
+
+        if not self._tables:
+            return False
+
+        with self._lock:
+            for curDBFileName, curTable in self._tables:
+                if curDBFileName == dbFileName and curTable in query:
+                    return True
+
+        return False
+
+    def flush(self):
+
+        # always take db_lock before our own lock, a thread in a transaction holds db_lock and may end up in here
+        with db_lock:
+            with self._lock:
+
+                if not self._pending:
+                    return
+
+                pending = self._pending
+                self._pending = collections.OrderedDict()
+                self._tables = set()
+
+                try:
+                    for curDBFileName in set([x[0] for x in pending]):
+                        rowKeys = [x for x in pending if x[0] == curDBFileName]
+
+                        myDB = DBConnection(curDBFileName)
+                        inTransaction = myDB.inTransaction()
+
+                        with myDB.transaction():
+                            for curRowKey in rowKeys:
+                                myDB.upsert(curRowKey[1], pending[curRowKey][0], pending[curRowKey][1])
+
+                        # the rows went into the caller's transaction, they're not on disk until it commits
+                        if inTransaction:
+                            uncommitted = self._uncommitted.setdefault((threading.currentThread(), curDBFileName), collections.OrderedDict())
+                            for curRowKey in rowKeys:
+                                self._merge(uncommitted, curRowKey, *pending[curRowKey])
+
+                        for curRowKey in rowKeys:
+                            del pending[curRowKey]
+                        self.flushed += len(rowKeys)
+
+                        logger.log(curDBFileName+u": Wrote "+str(len(rowKeys))+" queued rows", logger.DEBUG)
+
+                except Exception:
+                    self._requeue(pending)
+                    raise
+
+    def transactionDone(self, dbFileName, committed):
+        """
+        DBConnection.transaction calls this once the outermost transaction of the current thread has
+        been committed or rolled back
+        """
+
+        key = (threading.currentThread(), dbFileName)
+        if key not in self._uncommitted:
+            return
+
+        with self._lock:
+            uncommitted = self._uncommitted.pop(key, None)
+            if uncommitted and not committed:
+                logger.log(dbFileName+u": Queueing "+str(len(uncommitted))+" rows again after a rollback", logger.DEBUG)
+                self.flushed -= len(uncommitted)
+                self._requeue(uncommitted)
+                self._startWriter()
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self.queued, 'merged': self.merged, 'flushed': self.flushed, 'pending': len(self._pending)}
+
+writeQueue = WriteBehindQueue()
 
 class DBConnection:
     def __init__(self, dbFileName="sickbeard.db"):
 
         self.dbFileName = dbFileName
+        self.dbPath = os.path.join(sickbeard.DATA_DIR, self.dbFileName)
 
-        self.connection = sqlite3.connect(os.path.join(sickbeard.DATA_DIR, self.dbFileName), 20)
-        self.connection.row_factory = sqlite3.Row
+        self.connection = connectionPool.getConnection(self.dbFileName)
 
-    def action(self, query, args=None):
+    def _getTransactionDepth(self):
+        if not hasattr(_transactionState, 'depth'):
+            _transactionState.depth = {}
+        return _transactionState.depth.get(self.dbPath, 0)
+
+    def _setTransactionDepth(self, depth):
+        self._getTransactionDepth()
+        _transactionState.depth[self.dbPath] = depth
+
+    def inTransaction(self):
+        return self._getTransactionDepth() > 0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Runs every statement executed in the with block (by this or any other DBConnection
+        on the same thread and db file) under a single commit. If the block raises then
+        everything is rolled back. Nested transactions are folded into the outermost one.
+
+        Usage:
+            with myDB.transaction():
+                myDB.action(...)
+        """
 
         with db_lock:
 
-            if query == None:
-                return
-    
-            sqlResult = None
-            attempt = 0
-    
-            while attempt < 5:
-                try:
-                    if args == None:
-                        logger.log(self.dbFileName+": "+query, logger.DEBUG)
-                        sqlResult = self.connection.execute(query)
-                    else:
-                        logger.log(self.dbFileName+": "+query+" with args "+str(args), logger.DEBUG)
-                        sqlResult = self.connection.execute(query, args)
+            depth = self._getTransactionDepth()
+            self._setTransactionDepth(depth + 1)
+
+            try:
+                yield self
+            except:
+                if depth == 0:
+                    logger.log(self.dbFileName+": Rolling back transaction", logger.DEBUG)
+                    self.connection.rollback()
+                    writeQueue.transactionDone(self.dbFileName, False)
+                raise
+            else:
+                if depth == 0:
+                    committed = False
+                    try:
+                        self.connection.commit()
+                        committed = True
+                    finally:
+                        writeQueue.transactionDone(self.dbFileName, committed)
+            finally:
+                self._setTransactionDepth(depth)
+
+    def mass_action(self, querylist):
+        """
+        Executes a list of queries in a single transaction. Each item is a list or tuple
+        containing the query and optionally its args.
+
+        Returns a list with the fetched results of each query.
+        """
+
+        sqlResults = []
+
+        with self.transaction():
+            for curQuery in querylist:
+                if len(curQuery) == 1:
+                    sqlResults.append(self.action(curQuery[0]).fetchall())
+                else:
+                    sqlResults.append(self.action(curQuery[0], curQuery[1]).fetchall())
+
+        logger.log(self.dbFileName+": Transaction with "+str(len(querylist))+" queries executed", logger.DEBUG)
+
+        return sqlResults
+
+    def action(self, query, args=None):
+
+        if query == None:
+            return
+
+        startTime = time.time()
+
+        sqlResult = self._lockedExecute(query, args)
+
+        if queryStats.isEnabled():
+            queryStats.record(self, query, args, time.time() - startTime)
+
+        return sqlResult
+
+    def _lockedExecute(self, query, args=None):
+
+        if writeQueue.hasPending(self.dbFileName, query):
+            writeQueue.flush()
+
+        # with WAL readers see the last committed data while a write is going on so they can skip the lock
+        if isWAL() and isReadOnlyQuery(query):
+            return self._execute(query, args)
+
+        with db_lock:
+            return self._execute(query, args)
+
+    def _execute(self, query, args=None):
+
+        sqlResult = None
+        attempt = 0
+
+        while attempt < 5:
+            try:
+                if args == None:
+                    logger.log(self.dbFileName+": "+query, logger.DEBUG)
+                    sqlResult = self.connection.execute(query)
+                else:
+                    logger.log(self.dbFileName+": "+query+" with args "+str(args), logger.DEBUG)
+                    sqlResult = self.connection.execute(query, args)
+                # inside a transaction the commit is done once the block finishes
+                if not self.inTransaction():
                     self.connection.commit()
-                    # get out of the connection attempt loop since we were successful
-                    break
-                except sqlite3.OperationalError, e:
-                    if "unable to open database file" in e.message or "database is locked" in e.message:
-                        logger.log(u"DB error: "+ex(e), logger.WARNING)
-                        attempt += 1
-                        time.sleep(1)
-                    else:
-                        logger.log(u"DB error: "+ex(e), logger.ERROR)
-                        raise
-                except sqlite3.DatabaseError, e:
-                    logger.log(u"Fatal error executing query: " + ex(e), logger.ERROR)
+                # get out of the connection attempt loop since we were successful
+                break
+            except sqlite3.OperationalError, e:
+                if "unable to open database file" in e.message or "database is locked" in e.message:
+                    logger.log(u"DB error: "+ex(e), logger.WARNING)
+                    attempt += 1
+                    time.sleep(1)
+                else:
+                    logger.log(u"DB error: "+ex(e), logger.ERROR)
                     raise
-    
-            return sqlResult
+            except sqlite3.DatabaseError, e:
+                logger.log(u"Fatal error executing query: " + ex(e), logger.ERROR)
+                raise
+
+        return sqlResult
 
 
     def select(self, query, args=None):
 
-        sqlResults = self.action(query, args).fetchall()
+        startTime = time.time()
+
+        sqlResults = self._lockedExecute(query, args).fetchall()
+
+        # the time spent fetching counts too since sqlite only steps through the rows as they're fetched
+        if queryStats.isEnabled():
+            queryStats.record(self, query, args, time.time() - startTime, len(sqlResults))
 
         if sqlResults == None:
             return []
@@ -86,19 +576,53 @@ class DBConnection:
 
     def upsert(self, tableName, valueDict, keyDict):
 
-        changesBefore = self.connection.total_changes
+        # when the key columns are backed by a unique index sqlite can do the whole thing in one statement
+        if UPSERT_SUPPORTED and self.hasUniqueKey(tableName, keyDict.keys()):
+            if valueDict:
+                onConflict = "DO UPDATE SET " + ", ".join([x + " = excluded." + x for x in valueDict.keys()])
+            else:
+                onConflict = "DO NOTHING"
+
+            query = "INSERT INTO "+tableName+" (" + ", ".join(valueDict.keys() + keyDict.keys()) + ")" + \
+                     " VALUES (" + ", ".join(["?"] * len(valueDict.keys() + keyDict.keys())) + ")" + \
+                     " ON CONFLICT (" + ", ".join(keyDict.keys()) + ") " + onConflict
+            self.action(query, valueDict.values() + keyDict.values())
+            return
 
         genParams = lambda myDict : [x + " = ?" for x in myDict.keys()]
 
-        query = "UPDATE "+tableName+" SET " + ", ".join(genParams(valueDict)) + " WHERE " + " AND ".join(genParams(keyDict))
+        with self.transaction():
+            changesBefore = self.connection.total_changes
 
-        self.action(query, valueDict.values() + keyDict.values())
+            query = "UPDATE "+tableName+" SET " + ", ".join(genParams(valueDict)) + " WHERE " + " AND ".join(genParams(keyDict))
 
-        if self.connection.total_changes == changesBefore:
-            query = "INSERT INTO "+tableName+" (" + ", ".join(valueDict.keys() + keyDict.keys()) + ")" + \
-                     " VALUES (" + ", ".join(["?"] * len(valueDict.keys() + keyDict.keys())) + ")"
             self.action(query, valueDict.values() + keyDict.values())
 
+            if self.connection.total_changes == changesBefore:
+                query = "INSERT INTO "+tableName+" (" + ", ".join(valueDict.keys() + keyDict.keys()) + ")" + \
+                         " VALUES (" + ", ".join(["?"] * len(valueDict.keys() + keyDict.keys())) + ")"
+                self.action(query, valueDict.values() + keyDict.values())
+
+    def hasUniqueKey(self, tableName, columns):
+        """
+        Returns True if tableName has a unique index covering exactly the given columns.
+        Only positive answers are cached since a migration can add the index later on.
+        """
+
+        cacheKey = (self.dbPath, tableName, frozenset(columns))
+        if cacheKey in _uniqueKeys:
+            return True
+
+        for curIndex in self.connection.execute("PRAGMA index_list(%s)" % tableName):
+            if not curIndex['unique']:
+                continue
+            indexColumns = [x['name'] for x in self.connection.execute("PRAGMA index_info(%s)" % curIndex['name'])]
+            if frozenset(indexColumns) == cacheKey[2]:
+                _uniqueKeys.add(cacheKey)
+                return True
+
+        return False
+
     def tableInfo(self, tableName):
         # FIXME ? binding is not supported here, but I cannot find a way to escape a string manually
         cursor = self.connection.execute("PRAGMA table_info(%s)" % tableName)
@@ -107,9 +631,63 @@ class DBConnection:
             columns[column['name']] = { 'type': column['type'] }
         return columns
 
-def sanityCheckDatabase(connection, sanity_check):
+def isWAL():
+    return str(sickbeard.DB_JOURNAL_MODE).lower() == 'wal'
+
+def isReadOnlyQuery(query):
+    return query.lstrip()[:6].upper() == 'SELECT'
+
+def likePrefixRange(pattern):
+    """
+    Returns the (lower, upper) bounds of the literal prefix of a LIKE pattern, or None if there isn't one.
+
+    sqlite only uses a NOCASE index for LIKE when the pattern is a literal in the query, adding
+    "col >= ? COLLATE NOCASE AND col < ? COLLATE NOCASE" with these bounds lets it use the index for bound parameters too.
+    """
+
+    prefix = re.split("[_%]", pattern)[0]
+
+    # NOCASE only folds ascii
+    prefix = "".join([x.lower() if ord(x) < 128 else x for x in prefix])
+
+    if not prefix or ord(prefix[-1]) >= 127:
+        return None
+
+    return (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+def sanityCheckDatabase(connection, sanity_check, force=True):
+    """
+    Runs the sanity check and, if the database has somewhere to keep it, records when it ran.
+    Unless forced the check is skipped when it has run before, callers force it after an upgrade.
+    """
+
+    canRecord = "last_sanity_check" in connection.tableInfo("db_version")
+
+    if not force and canRecord:
+        lastCheck = getLastSanityCheck(connection)
+        if lastCheck:
+            logger.log(u"Skipping the database sanity check, it last ran on "+str(lastCheck), logger.DEBUG)
+            return
+
     sanity_check(connection).check()
 
+    if canRecord:
+        connection.action("UPDATE db_version SET last_sanity_check = ?", [int(time.time())])
+
+def getLastSanityCheck(connection):
+    """
+    Returns the datetime of the last sanity check or None if it never ran
+    """
+
+    if "last_sanity_check" not in connection.tableInfo("db_version"):
+        return None
+
+    sqlResults = connection.select("SELECT last_sanity_check FROM db_version")
+    if not sqlResults or not sqlResults[0]["last_sanity_check"]:
+        return None
+
+    return datetime.datetime.fromtimestamp(int(sqlResults[0]["last_sanity_check"]))
+
 class DBSanityCheck(object):
     def __init__(self, connection):
         self.connection = connection
@@ -121,17 +699,60 @@ class DBSanityCheck(object):
 # = Upgrade API =
 # ===============
 
-def upgradeDatabase(connection, schema):
+def upgradeDatabase(connection, schema, latestVersion=None):
+    """
+    Runs every migration in the schema's chain whose test() fails. If latestVersion is given and db_version
+    is already at least that high none of the test()s are run, after a full walk db_version is raised to it.
+
+    Returns True if any migration was executed.
+    """
+
+    if latestVersion:
+        curVersion = getDBVersion(connection)
+        if curVersion >= latestVersion:
+            logger.log(connection.dbFileName+u" is at version "+str(curVersion)+", no upgrade checks needed", logger.DEBUG)
+            return False
+
     logger.log(u"Checking database structure...", logger.MESSAGE)
-    _processUpgrade(connection, schema)
+    upgraded = _processUpgrade(connection, schema)
+
+    if latestVersion and getDBVersion(connection) < latestVersion:
+        setDBVersion(connection, latestVersion)
+
+    return upgraded
+
+def getDBVersion(connection):
+    if not connection.select("SELECT 1 FROM sqlite_master WHERE name = 'db_version'"):
+        return 0
+
+    sqlResults = connection.select("SELECT db_version FROM db_version")
+    if sqlResults:
+        return int(sqlResults[0]["db_version"])
+    else:
+        return 0
+
+def setDBVersion(connection, version):
+    """
+    Sets db_version, for a schema whose migrations left the table or its row out it's created first
+    """
+
+    with connection.transaction():
+        connection.action("CREATE TABLE IF NOT EXISTS db_version (db_version INTEGER)")
+
+        if connection.select("SELECT 1 FROM db_version"):
+            connection.action("UPDATE db_version SET db_version = ?", [version])
+        else:
+            connection.action("INSERT INTO db_version (db_version) VALUES (?)", [version])
 
 def prettyName(str):
     return ' '.join([x.group() for x in re.finditer("([A-Z])([a-z0-9]+)", str)])
 
 def _processUpgrade(connection, upgradeClass):
+    upgraded = False
     instance = upgradeClass(connection)
     logger.log(u"Checking " + prettyName(upgradeClass.__name__) + " database upgrade", logger.DEBUG)
     if not instance.test():
+        upgraded = True
         logger.log(u"Database upgrade required: " + prettyName(upgradeClass.__name__), logger.MESSAGE)
         try:
             instance.execute()
@@ -143,7 +764,9 @@ def _processUpgrade(connection, upgradeClass):
         logger.log(upgradeClass.__name__ + " upgrade not required", logger.DEBUG)
 
     for upgradeSubClass in upgradeClass.__subclasses__():
-        _processUpgrade(connection, upgradeSubClass)
+        upgraded = _processUpgrade(connection, upgradeSubClass) or upgraded
+
+    return upgraded
 
 # Base migration class. All future DB changes should be subclassed from this class
 class SchemaUpgrade (object):
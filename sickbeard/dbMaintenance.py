@@ -0,0 +1,154 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import with_statement
+
+import datetime
+import os.path
+import sqlite3
+
+import sickbeard
+
+from sickbeard import db
+from sickbeard import history
+from sickbeard import logger
+
+class DBMaintenance():
+    """
+    Keeps sickbeard.db and cache.db in shape: trims the history, removes duplicate scene names,
+    gives free pages back to the file system and refreshes the statistics the query planner uses.
+
+    The scheduler checks in every hour but the work is only done once a day and only while
+    no show or search queue item is running.
+    """
+
+    # free pages given back per incremental vacuum, the rest waits for the next run
+    VACUUM_PAGES = 2000
+
+    def __init__(self):
+        self.updateInterval = datetime.timedelta(hours=1)
+        self.maintenanceInterval = datetime.timedelta(days=1)
+
+        self.amActive = False
+        self.lastMaintenance = None
+        self.lastReport = []
+
+    def run(self, force=False):
+
+        if not force:
+            if self.lastMaintenance and datetime.datetime.now() - self.lastMaintenance < self.maintenanceInterval:
+                return
+
+            # stay out of the way of anything that's actually doing work
+            if sickbeard.showQueueScheduler.action.currentItem or sickbeard.searchQueueScheduler.action.currentItem: #@UndefinedVariable
+                logger.log(u"Queues are busy, postponing database maintenance", logger.DEBUG)
+                return
+
+        self.amActive = True
+
+        try:
+            logger.log(u"Starting database maintenance")
+
+            report = []
+            for dbFileName in ("sickbeard.db", "cache.db"):
+                before = getSizes(dbFileName)
+
+                if dbFileName == "sickbeard.db":
+                    self._trimHistory()
+                else:
+                    self._dedupeSceneNames()
+
+                self._vacuum(dbFileName)
+                db.DBConnection(dbFileName).action("ANALYZE")
+
+                report.append({'db': dbFileName, 'before': before, 'after': getSizes(dbFileName)})
+
+            self.lastReport = report
+            self.lastMaintenance = datetime.datetime.now()
+
+            logger.log(u"Database maintenance finished")
+
+        finally:
+            self.amActive = False
+
+    def _trimHistory(self):
+
+        if not sickbeard.DB_HISTORY_RETENTION_DAYS:
+            return
+
+        cutoff = datetime.datetime.today() - datetime.timedelta(days=sickbeard.DB_HISTORY_RETENTION_DAYS)
+
+        myDB = db.DBConnection()
+        deleted = myDB.action("DELETE FROM history WHERE date < ?", [int(cutoff.strftime(history.dateFormat))]).rowcount
+        logger.log(u"Removed "+str(deleted)+" history entries older than "+str(sickbeard.DB_HISTORY_RETENTION_DAYS)+" days", logger.DEBUG)
+
+    def _dedupeSceneNames(self):
+
+        # lookups use the oldest row for a name so that's the one to keep
+        myDB = db.DBConnection("cache.db")
+        deleted = myDB.action("DELETE FROM scene_names WHERE rowid NOT IN (SELECT MIN(rowid) FROM scene_names GROUP BY name)").rowcount
+        logger.log(u"Removed "+str(deleted)+" duplicate scene names", logger.DEBUG)
+
+    def _vacuum(self, dbFileName):
+
+        myDB = db.DBConnection(dbFileName)
+
+        with db.db_lock:
+            # incremental vacuum only works if the database was built for it, converting takes one full VACUUM
+            if myDB.select("PRAGMA auto_vacuum")[0][0] != 2:
+                logger.log(u"Converting "+dbFileName+" to incremental vacuum, this can take a while")
+                myDB.action("PRAGMA auto_vacuum = INCREMENTAL")
+                myDB.action("VACUUM")
+            else:
+                # the pragma frees one page per step so it has to be stepped to the end before anything commits
+                myDB.connection.execute("PRAGMA incremental_vacuum(%d)" % self.VACUUM_PAGES).fetchall()
+                myDB.connection.commit()
+
+            # with WAL the freed space only shows up once the log is written back and truncated
+            if db.isWAL():
+                myDB.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+def getSizes(dbFileName):
+    """
+    Returns the file size, the unused space and the rows and bytes of every table of the given database.
+    Bytes are None when sqlite was built without the dbstat table.
+    """
+
+    myDB = db.DBConnection(dbFileName)
+
+    fileSize = 0
+    for curPath in (myDB.dbPath, myDB.dbPath + "-wal"):
+        if os.path.isfile(curPath):
+            fileSize += os.path.getsize(curPath)
+
+    pageSize = myDB.select("PRAGMA page_size")[0][0]
+    freePages = myDB.select("PRAGMA freelist_count")[0][0]
+
+    try:
+        tableBytes = dict(myDB.connection.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    except sqlite3.OperationalError:
+        tableBytes = {}
+
+    tables = []
+    for curTable in myDB.select("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"):
+        tableName = curTable["name"]
+        tables.append({'name': tableName,
+                       'rows': myDB.select("SELECT COUNT(*) FROM [" + tableName + "]")[0][0],
+                       'bytes': tableBytes.get(tableName)})
+
+    return {'file': fileSize, 'free': freePages * pageSize, 'tables': tables}
@@ -0,0 +1,86 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import with_statement
+
+import collections
+import threading
+
+import sickbeard
+
+class EpisodeCache(object):
+    """
+    Keeps the episode objects of the shows alive, in the order they were last used. TVShow.episodes
+    only holds weak references so this is what decides how many episodes stay in memory. Once there
+    are more than EPISODE_CACHE_SIZE of them the least recently used ones are let go of.
+
+    An episode that's let go of but still used somewhere else (a search result, a queue item, another
+    episode's relatedEps) stays in its show until that's done with it, so there's never a second object
+    for the same episode. Episodes that are dirty or locked are always kept.
+    """
+
+    # how many episodes one eviction pass looks at before giving up until the next one
+    MAX_SCAN = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # id(episode) -> episode, least recently used first
+        self._episodes = collections.OrderedDict()
+
+        self.evicted = 0
+
+    def touch(self, ep):
+        """
+        Marks the episode as just used, adding it to the cache if it's new
+        """
+        with self._lock:
+            self._episodes.pop(id(ep), None)
+            self._episodes[id(ep)] = ep
+            self._evict()
+
+    def remove(self, ep):
+        with self._lock:
+            self._episodes.pop(id(ep), None)
+
+    def _evict(self):
+
+        limit = sickbeard.EPISODE_CACHE_SIZE
+        if not limit:
+            return
+
+        scanned = 0
+        while len(self._episodes) > limit and scanned < self.MAX_SCAN:
+            curKey, curEp = self._episodes.popitem(last=False)
+            scanned += 1
+
+            # it's in use so it counts as recently used
+            if curEp.dirty or curEp.isLocked():
+                self._episodes[curKey] = curEp
+                continue
+
+            # the show forgets it on its own once nobody else holds it either
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {'resident': len(self._episodes),
+                    'limit': sickbeard.EPISODE_CACHE_SIZE,
+                    'evicted': self.evicted}
+
+episodeCache = EpisodeCache()
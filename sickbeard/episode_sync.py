@@ -0,0 +1,196 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import with_statement
+
+import datetime
+import os.path
+
+import sickbeard
+
+from lib.tvdb_api import tvdb_api
+
+from sickbeard import db, logger
+from sickbeard import episode_cache
+from sickbeard import encodingKludge as ek
+from sickbeard.common import UNKNOWN
+from sickbeard.tv import statusFromTVDB
+
+def _valuesFromTVDB(show, season, episode, tvdbEp):
+    """
+    Returns the tv_episodes values TVDB has for an episode (the airdate still as a date), or None if
+    TVDB's episode is incomplete, in which case we don't keep it either
+    """
+
+    if not tvdbEp["episodename"]:
+        logger.log(u"This episode ("+show.name+" - "+str(season)+"x"+str(episode)+") has no name on TVDB")
+        return None
+
+    airdate = datetime.date.fromordinal(1)
+    if tvdbEp["firstaired"]:
+        try:
+            rawAirdate = [int(x) for x in tvdbEp["firstaired"].split("-")]
+            airdate = datetime.date(rawAirdate[0], rawAirdate[1], rawAirdate[2])
+        except (ValueError, IndexError):
+            logger.log(u"Malformed air date retrieved from TVDB ("+show.name+" - "+str(season)+"x"+str(episode)+")", logger.ERROR)
+            return None
+
+    values = {"tvdbid": int(tvdbEp["id"]),
+              "name": tvdbEp["episodename"],
+              "description": tvdbEp["overview"] or "",
+              "airdate": airdate}
+
+    # an episode without one on TVDB keeps whatever it had
+    if tvdbEp["absolute_number"]:
+        values["absolute_number"] = int(tvdbEp["absolute_number"])
+
+    return values
+
+def _comparable(value):
+    """
+    Returns a value from a row or from TVDB in a form the two can be compared in: NULLs are the same as
+    empty strings and numbers are the same as the text TVDB has them in
+    """
+
+    if value == None:
+        return u""
+
+    if type(value) == str:
+        return value.decode('utf-8', 'replace')
+
+    return unicode(value)
+
+def syncEpisodes(show, cache=True):
+    """
+    Brings the show's episodes in the DB up to date with TVDB. The episode list is fetched from TVDB
+    once and compared with the tv_episodes rows field by field, only the inserts, updates and deletes
+    that are needed are written, all in one transaction. Episodes TVDB doesn't have (or has without a
+    name or with a broken air date) are deleted.
+
+    Statuses change the same way TVEpisode.loadFromTVDB changes them. TVDB errors are passed on.
+
+    Returns {'inserted': n, 'updated': n, 'deleted': n, 'unchanged': n}
+    """
+
+    # There's gotta be a better way of doing this but we don't wanna
+    # change the cache value elsewhere
+    ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
+
+    if not cache:
+        ltvdb_api_parms['cache'] = 'recache'
+
+    if show.lang:
+        ltvdb_api_parms['language'] = show.lang
+
+    tvdbShow = tvdb_api.Tvdb(**ltvdb_api_parms)[show.tvdbid]
+
+    # saves still waiting in the write-behind queue have to be in the rows we compare with
+    db.writeQueue.flush()
+
+    myDB = db.DBConnection()
+    sqlResults = myDB.select("SELECT * FROM tv_episodes WHERE showid = ?", [show.tvdbid])
+    dbRows = dict([((int(x["season"]), int(x["episode"])), x) for x in sqlResults])
+
+    # like loadFromTVDB, without the show dir the statuses would probably be wrong so they're left alone
+    showDirGood = ek.ek(os.path.isdir, show._location)
+
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    queries = []
+
+    # (season, episode) -> the new row, for updating the episodes in memory afterwards
+    updatedRows = {}
+
+    for season in tvdbShow:
+        for episode in tvdbShow[season]:
+            # need some examples of wtf episode 0 means to decide if we want it or not
+            if episode == 0:
+                continue
+
+            values = _valuesFromTVDB(show, season, episode, tvdbShow[season][episode])
+            if values == None:
+                continue
+
+            key = (int(season), int(episode))
+            curRow = dbRows.pop(key, None)
+
+            status = UNKNOWN
+            location = ""
+            if curRow != None:
+                status = int(curRow["status"])
+                location = curRow["location"] or ""
+
+            if showDirGood:
+                status = statusFromTVDB(status, values["airdate"], location)
+
+            values["status"] = status
+            values["airdate"] = values["airdate"].toordinal()
+
+            if curRow == None:
+                newRow = {"showid": show.tvdbid, "season": key[0], "episode": key[1], "location": "",
+                          "hasnfo": 0, "hastbn": 0, "absolute_number": 0}
+                newRow.update(values)
+                queries.append(["INSERT INTO tv_episodes (" + ", ".join(newRow.keys()) + ") VALUES (" + ", ".join(["?"] * len(newRow)) + ")",
+                                newRow.values()])
+                counts['inserted'] += 1
+                continue
+
+            changes = dict([(x, values[x]) for x in values if _comparable(curRow[x]) != _comparable(values[x])])
+            if not changes:
+                counts['unchanged'] += 1
+                continue
+
+            logger.log(str(show.tvdbid) + ": " + str(key[0]) + "x" + str(key[1]) + " changed on TVDB: " + ", ".join(sorted(changes.keys())), logger.DEBUG)
+            queries.append(["UPDATE tv_episodes SET " + ", ".join([x + " = ?" for x in changes.keys()]) + " WHERE showid = ? AND season = ? AND episode = ?",
+                            changes.values() + [show.tvdbid, key[0], key[1]]])
+            counts['updated'] += 1
+
+            updatedRows[key] = dict(zip(curRow.keys(), curRow))
+            updatedRows[key].update(changes)
+
+    # whatever is left isn't on TVDB any more
+    for season, episode in dbRows:
+        logger.log(u"Permanently deleting episode "+str(season)+"x"+str(episode)+" from the database", logger.MESSAGE)
+        queries.append(["DELETE FROM tv_episodes WHERE showid = ? AND season = ? AND episode = ?", [show.tvdbid, season, episode]])
+        counts['deleted'] += 1
+
+    if queries:
+        myDB.mass_action(queries)
+
+        # the episodes we're holding have to match the DB again, unless they have changes of their own
+        # that aren't saved yet, those are newer than anything we just wrote
+        for (season, episode), curRow in updatedRows.items():
+            curEp = show.episodes.get(season, {}).get(episode)
+            if curEp != None:
+                with curEp.lock:
+                    if curEp.dirty:
+                        logger.log(str(show.tvdbid) + ": " + str(season) + "x" + str(episode) + " has unsaved changes, not reloading it", logger.DEBUG)
+                        continue
+                    curEp.loadFromDBRow(curRow, season, episode)
+
+        for season, episode in dbRows:
+            curEp = show.episodes.get(season, {}).pop(episode, None)
+            if curEp != None:
+                episode_cache.episodeCache.remove(curEp)
+
+        show.resetEpisodeStatus()
+        show.resetEpisodeNumbers()
+
+    logger.log(str(show.tvdbid) + ": Synced the episodes with TVDB, " + str(counts['inserted']) + " added, " + str(counts['updated']) + " updated, " +
+               str(counts['deleted']) + " deleted and " + str(counts['unchanged']) + " unchanged")
+
+    return counts
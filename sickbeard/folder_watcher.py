@@ -0,0 +1,513 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import time
+
+import sickbeard
+
+from sickbeard import exceptions, helpers, logger
+from sickbeard import encodingKludge as ek
+from sickbeard.exceptions import ex
+
+# besides the media files these say something about an episode (nfo, thumbnails)
+METADATA_EXTENSIONS = ('nfo', 'tbn', 'jpg', 'xml', 'metathumb')
+
+def _isWatchedFile(name):
+    return helpers.isMediaFile(name) or name.rpartition(".")[2].lower() in METADATA_EXTENSIONS
+
+def _isWatchedDir(name):
+    # the same folders listMediaFiles looks in
+    return not name.startswith('.') and name != 'Extras'
+
+def _listDirs(dir):
+    """
+    Returns dir and every folder under it that can hold episodes
+    """
+
+    dirs = [dir]
+    for curName in ek.ek(os.listdir, dir):
+        curPath = ek.ek(os.path.join, dir, curName)
+        if _isWatchedDir(curName) and ek.ek(os.path.isdir, curPath):
+            dirs += _listDirs(curPath)
+
+    return dirs
+
+def _fileState(path):
+    """
+    Returns (size, mtime) of path or None if it's gone
+    """
+
+    try:
+        curStat = ek.ek(os.stat, path)
+    except OSError:
+        return None
+
+    return (curStat.st_size, curStat.st_mtime)
+
+def _listFiles(dir):
+    """
+    Returns {path: (size, mtime)} for the media and metadata files in dir and the folders under it
+    """
+
+    files = {}
+    for curDir in _listDirs(dir):
+        for curName in ek.ek(os.listdir, curDir):
+            if not _isWatchedFile(curName):
+                continue
+            curPath = ek.ek(os.path.join, curDir, curName)
+            curState = _fileState(curPath)
+            if curState != None:
+                files[curPath] = curState
+
+    return files
+
+class Inotify(object):
+    """
+    Just enough of the Linux inotify API to watch folders, through ctypes so nothing has to be installed.
+    Raises OSError when inotify isn't available.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    IN_NONBLOCK = 0x00000800
+    IN_CLOEXEC = 0x00080000
+
+    # no IN_MODIFY, there'd be one for every write while a file is copied in. FolderWatcher checks a
+    # file has stopped changing before it's refreshed instead.
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    # struct inotify_event without the name that follows it
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+
+        libcName = ctypes.util.find_library('c')
+        if not libcName:
+            raise OSError(errno.ENOSYS, "Unable to find libc")
+
+        self._libc = ctypes.CDLL(libcName, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify isn't supported on this system")
+
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            self._raiseErrno()
+
+    def _raiseErrno(self):
+        curErrno = ctypes.get_errno()
+        raise OSError(curErrno, os.strerror(curErrno))
+
+    def addWatch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, path, self.WATCH_MASK)
+        if wd < 0:
+            self._raiseErrno()
+        return wd
+
+    def removeWatch(self, wd):
+        # the kernel may have dropped it already, that's fine
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def readEvents(self):
+        """
+        Returns the waiting events as (wd, mask, name) without blocking
+        """
+
+        events = []
+
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError, e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+
+            if not data:
+                break
+
+            pos = 0
+            while pos + self._EVENT.size <= len(data):
+                wd, mask, cookie, nameLength = self._EVENT.unpack_from(data, pos)
+                pos += self._EVENT.size
+                events.append((wd, mask, data[pos:pos + nameLength].rstrip('\0')))
+                pos += nameLength
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class FolderWatcher():
+    """
+    Notices changes in the show folders and queues a refresh of just the files that changed, so new,
+    renamed or deleted episodes show up without waiting for the nightly refresh.
+
+    On Linux the folders are watched with inotify, one watch per folder and never more than
+    FOLDER_WATCHER_MAX_WATCHES of them. Shows that can't be watched (no inotify, or the limit was
+    reached) are polled every FOLDER_WATCHER_POLL_INTERVAL seconds instead.
+
+    Events for a file are collected until it has been quiet for SETTLE_SECONDS so a burst of renames
+    ends up as a single refresh. Writes don't cause events and neither poll may see the end of a copy,
+    so a file is only refreshed once its size and mtime are the same as when it was last seen; if they
+    aren't it waits another SETTLE_SECONDS.
+    """
+
+    SETTLE_SECONDS = 10
+
+    # how often the show list is checked for shows that were added, removed or moved
+    RECONCILE_SECONDS = 60
+
+    def __init__(self):
+        self.amActive = False
+
+        self._inotify = None
+        self._inotifyFailed = False
+
+        # wd -> (tvdbid, folder)
+        self._watches = {}
+        # tvdbid -> (location, [wd, ...])
+        self._showWatches = {}
+        # tvdbid -> (location, {path: (size, mtime)}), the files are None until the first poll
+        self._polled = {}
+
+        # path -> (tvdbid, time of the last event for it, (size, mtime) or None when the file is gone)
+        self._pending = {}
+        # tvdbids that need a full refresh
+        self._fullRefresh = set()
+
+        self._lastReconcile = 0
+        self._lastPoll = 0
+
+        self.events = 0
+        self.coalesced = 0
+        self.overflows = 0
+        self.queuedFiles = 0
+        self.queuedRefreshes = 0
+
+    def run(self):
+
+        if not sickbeard.FOLDER_WATCHER:
+            if self._inotify or self._polled:
+                self.stop()
+            return
+
+        self.amActive = True
+
+        try:
+            now = time.time()
+
+            if now - self._lastReconcile >= self.RECONCILE_SECONDS:
+                self._lastReconcile = now
+                self._reconcile()
+
+            if self._inotify:
+                self._readEvents(now)
+
+            if self._polled and now - self._lastPoll >= sickbeard.FOLDER_WATCHER_POLL_INTERVAL:
+                self._lastPoll = now
+                self._poll(now)
+
+            self._queueSettled(now)
+
+        finally:
+            self.amActive = False
+
+    def stop(self):
+        """
+        Drops every watch and everything that was waiting to be queued
+        """
+
+        if self._inotify:
+            self._inotify.close()
+
+        self._inotify = None
+        self._watches = {}
+        self._showWatches = {}
+        self._polled = {}
+        self._pending = {}
+        self._fullRefresh = set()
+        self._lastReconcile = 0
+
+    def _reconcile(self):
+
+        shows = dict([(x.tvdbid, x) for x in sickbeard.showList if not x.loading])
+
+        for tvdbid, (location, wds) in self._showWatches.items():
+            if tvdbid not in shows or shows[tvdbid]._location != location:
+                self._unwatchShow(tvdbid)
+
+        for tvdbid, (location, files) in self._polled.items():
+            if tvdbid not in shows or shows[tvdbid]._location != location:
+                del self._polled[tvdbid]
+
+        for tvdbid, curShow in shows.items():
+            if tvdbid in self._showWatches or tvdbid in self._polled:
+                continue
+
+            if not ek.ek(os.path.isdir, curShow._location):
+                continue
+
+            if not self._watchShow(curShow):
+                self._polled[tvdbid] = (curShow._location, None)
+
+    def _watchShow(self, show):
+
+        if not self._inotify:
+            if self._inotifyFailed:
+                return False
+
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError), e:
+                logger.log(u"Unable to use inotify, polling the show folders every "+str(sickbeard.FOLDER_WATCHER_POLL_INTERVAL)+" seconds instead: "+ex(e), logger.WARNING)
+                self._inotifyFailed = True
+                return False
+
+        try:
+            dirs = _listDirs(show._location)
+        except OSError, e:
+            logger.log(u"Unable to list the folders in "+show._location+": "+ex(e), logger.WARNING)
+            return False
+
+        if len(self._watches) + len(dirs) > sickbeard.FOLDER_WATCHER_MAX_WATCHES:
+            logger.log(u"Watching the "+str(len(dirs))+" folders of "+show.name+" would go over the limit of "+str(sickbeard.FOLDER_WATCHER_MAX_WATCHES)+", polling it instead", logger.DEBUG)
+            return False
+
+        self._showWatches[show.tvdbid] = (show._location, [])
+
+        for curDir in dirs:
+            if not self._addWatch(show.tvdbid, curDir):
+                self._unwatchShow(show.tvdbid)
+                return False
+
+        return True
+
+    def _addWatch(self, tvdbid, dir):
+
+        if len(self._watches) >= sickbeard.FOLDER_WATCHER_MAX_WATCHES:
+            return False
+
+        try:
+            wd = ek.ek(self._inotify.addWatch, dir)
+        except OSError, e:
+            logger.log(u"Unable to watch "+dir+": "+ex(e), logger.DEBUG)
+            return False
+
+        self._watches[wd] = (tvdbid, dir)
+        self._showWatches[tvdbid][1].append(wd)
+
+        return True
+
+    def _unwatchShow(self, tvdbid):
+
+        location, wds = self._showWatches.pop(tvdbid, (None, []))
+        for wd in wds:
+            if self._watches.pop(wd, None):
+                self._inotify.removeWatch(wd)
+
+    def _pollInstead(self, tvdbid):
+        """
+        For a show that can't be watched completely any more, a full refresh catches up on what was missed
+        """
+
+        location = self._showWatches[tvdbid][0]
+        self._unwatchShow(tvdbid)
+        self._polled[tvdbid] = (location, None)
+        self._fullRefresh.add(tvdbid)
+
+    def _addPending(self, path, tvdbid, now, state=False):
+
+        if path in self._pending:
+            self.coalesced += 1
+
+        if state == False:
+            state = _fileState(path)
+
+        self._pending[path] = (tvdbid, now, state)
+
+    def _readEvents(self, now):
+
+        try:
+            events = self._inotify.readEvents()
+        except OSError, e:
+            logger.log(u"Unable to read the folder events: "+ex(e), logger.ERROR)
+            return
+
+        for wd, mask, name in events:
+
+            self.events += 1
+
+            if mask & Inotify.IN_Q_OVERFLOW:
+                logger.log(u"Too many changes in the show folders to keep track of, refreshing all watched shows", logger.WARNING)
+                self.overflows += 1
+                self._fullRefresh.update(self._showWatches.keys())
+                continue
+
+            if wd not in self._watches:
+                continue
+
+            tvdbid, curDir = self._watches[wd]
+
+            if mask & Inotify.IN_IGNORED:
+                # the kernel dropped the watch, the folder is gone
+                del self._watches[wd]
+                location, wds = self._showWatches[tvdbid]
+                wds.remove(wd)
+                # without its show folder the show gets watched again once the folder is back
+                if curDir == location:
+                    self._unwatchShow(tvdbid)
+                continue
+
+            if mask & (Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF):
+                # a folder that moved away would still be watched under its old name
+                if mask & Inotify.IN_MOVE_SELF:
+                    self._inotify.removeWatch(wd)
+                self._fullRefresh.add(tvdbid)
+                continue
+
+            name = ek.fixStupidEncodings(name)
+            if not name:
+                continue
+
+            curPath = ek.ek(os.path.join, curDir, name)
+
+            if mask & Inotify.IN_ISDIR:
+                if not _isWatchedDir(name):
+                    continue
+
+                # a new folder may already have files in it if it was moved in
+                if mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                    try:
+                        newDirs = _listDirs(curPath)
+                        newFiles = _listFiles(curPath)
+                    except OSError:
+                        continue
+
+                    for curNewDir in newDirs:
+                        if not self._addWatch(tvdbid, curNewDir):
+                            self._pollInstead(tvdbid)
+                            break
+
+                    for curFile, curState in newFiles.items():
+                        self._addPending(curFile, tvdbid, now, curState)
+
+                # the files of a folder that moved away have no events of their own
+                elif mask & Inotify.IN_MOVED_FROM:
+                    self._fullRefresh.add(tvdbid)
+
+                continue
+
+            if _isWatchedFile(name):
+                self._addPending(curPath, tvdbid, now)
+
+    def _poll(self, now):
+
+        for tvdbid, (location, knownFiles) in self._polled.items():
+            try:
+                curFiles = _listFiles(location)
+            except OSError, e:
+                logger.log(u"Unable to check the files in "+location+": "+ex(e), logger.DEBUG)
+                continue
+
+            # the first look only tells us what's there
+            if knownFiles != None:
+                for curPath in set(curFiles) | set(knownFiles):
+                    if curFiles.get(curPath) != knownFiles.get(curPath):
+                        self._addPending(curPath, tvdbid, now, curFiles.get(curPath))
+
+            self._polled[tvdbid] = (location, curFiles)
+
+    def _queueSettled(self, now):
+
+        settled = {}
+        for curPath, (tvdbid, lastEvent, state) in self._pending.items():
+            if now - lastEvent < self.SETTLE_SECONDS:
+                continue
+
+            # still being written
+            curState = _fileState(curPath)
+            if curState != state:
+                self._pending[curPath] = (tvdbid, now, curState)
+                continue
+
+            settled.setdefault(tvdbid, []).append(curPath)
+            del self._pending[curPath]
+
+        fullRefresh, self._fullRefresh = self._fullRefresh, set()
+
+        for tvdbid in fullRefresh:
+            settled.pop(tvdbid, None)
+
+            curShow = helpers.findCertainShow(sickbeard.showList, tvdbid)
+            if not curShow:
+                continue
+
+            try:
+                sickbeard.showQueueScheduler.action.refreshShow(curShow) #@UndefinedVariable
+                self.queuedRefreshes += 1
+            except exceptions.CantRefreshException:
+                pass
+
+        for tvdbid, paths in settled.items():
+            curShow = helpers.findCertainShow(sickbeard.showList, tvdbid)
+            if not curShow:
+                continue
+
+            logger.log(u"Files changed in the folder of "+curShow.name+": "+", ".join(paths), logger.DEBUG)
+            sickbeard.showQueueScheduler.action.refreshShowFiles(curShow, paths) #@UndefinedVariable
+            self.queuedFiles += len(paths)
+
+    def stats(self):
+        if not sickbeard.FOLDER_WATCHER:
+            backend = 'off'
+        elif self._inotify:
+            backend = 'inotify'
+        elif self._inotifyFailed:
+            backend = 'polling'
+        else:
+            backend = 'starting'
+
+        return {'backend': backend,
+                'watches': len(self._watches),
+                'max_watches': sickbeard.FOLDER_WATCHER_MAX_WATCHES,
+                'watched_shows': len(self._showWatches),
+                'polled_shows': len(self._polled),
+                'events': self.events,
+                'coalesced': self.coalesced,
+                'overflows': self.overflows,
+                'pending': len(self._pending),
+                'queued_files': self.queuedFiles,
+                'queued_refreshes': self.queuedRefreshes}
@@ -19,6 +19,7 @@
 import datetime
 import threading
 
+from sickbeard import db
 from sickbeard import logger
 
 class QueuePriorities:
@@ -129,6 +130,9 @@ class QueueItem:
     def finish(self):
         """Implementing Classes should call this"""
 
+        # write out anything the item left in the write-behind queue
+        db.writeQueue.flush()
+
         self.inProgress = False
 
 
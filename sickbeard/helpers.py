@@ -37,7 +37,14 @@ from sickbeard.exceptions import ex
 from lib.tvdb_api import tvdb_api, tvdb_exceptions
 
 import xml.etree.cElementTree as etree
-from sickbeard.name_parser.parser import NameParser, InvalidNameException
+from sickbeard.name_parser.parser import NameParser, InvalidNameException, ParseCache
+
+# parse_result_wrapper's results, keyed on the name and the anime flag of the show it was given. The
+# ones for names without a show depend on the show list, update_anime_support clears them when it changes.
+parseResultCache = ParseCache()
+
+# the shows' ids, names and anime flags the last time update_anime_support looked
+_animeSignature = None
 
 urllib._urlopener = classes.SickBeardURLopener()
 
@@ -141,7 +148,11 @@ def getURL (url, headers=[]):
     return result
 
 def findCertainShow (showList, tvdbid):
-    results = filter(lambda x: x.tvdbid == tvdbid, showList)
+    # sickbeard.showList keeps an index, any other list has to be searched
+    if showList is sickbeard.showList:
+        results = showList.getByTvdbid(tvdbid)
+    else:
+        results = filter(lambda x: x.tvdbid == tvdbid, showList)
     if len(results) == 0:
         return None
     elif len(results) > 1:
@@ -154,7 +165,10 @@ def findCertainTVRageShow (showList, tvrid):
     if tvrid == 0:
         return None
 
-    results = filter(lambda x: x.tvrid == tvrid, showList)
+    if showList is sickbeard.showList:
+        results = showList.getByTvrid(tvrid)
+    else:
+        results = filter(lambda x: x.tvrid == tvrid, showList)
 
     if len(results) == 0:
         return None
@@ -484,8 +498,15 @@ def is_anime_in_show_list():
     return False
 
 def update_anime_support():
+    global _animeSignature
+
     sickbeard.ANIMESUPPORT = is_anime_in_show_list()
 
+    signature = [(show.tvdbid, show.name, bool(show.is_anime)) for show in sickbeard.showList]
+    if signature != _animeSignature:
+        _animeSignature = signature
+        parseResultCache.clear()
+
 def get_all_episodes_from_absolute_number(show, tvdb_id, absolute_numbers):
     if len(absolute_numbers) == 0:
         raise EpisodeNotFoundByAbsoluteNumerException()
@@ -509,6 +530,14 @@ def get_all_episodes_from_absolute_number(show, tvdb_id, absolute_numbers):
     
     return (season, episodes)
 
+def _parse_result_modes(show):
+    if show and show.is_anime:
+        return [NameParser.ANIME_REGEX,NameParser.NORMAL_REGEX]
+    elif show and not show.is_anime:
+        return [NameParser.NORMAL_REGEX]
+    else: # this will be chosen if no show is given so in cache-,rss-,pp search
+        return [NameParser.ANIME_REGEX,NameParser.NORMAL_REGEX]
+
 def parse_result_wrapper(show,toParse,tvdbActiveLookUp=False):
     """Retruns a parse result or a InvalidNameException
         it will try to take the correct regex for the show if given
@@ -517,14 +546,21 @@ def parse_result_wrapper(show,toParse,tvdbActiveLookUp=False):
         only if both is true we will consider it an anime
         
         to get the tvdbid the tvdbapi might be used if tvdbActiveLookUp is True
+
+        results are cached in parseResultCache, except for the ones that might have come from the tvdbapi
     """
-    if show and show.is_anime:
-        modeList = [NameParser.ANIME_REGEX,NameParser.NORMAL_REGEX]    
-    elif show and not show.is_anime:
-        modeList = [NameParser.NORMAL_REGEX]
-    else: # this will be chosen if no show is given so in cache-,rss-,pp search
-        modeList = [NameParser.ANIME_REGEX,NameParser.NORMAL_REGEX]    
-        
+    if show:
+        cacheKey = (toParse, bool(show.is_anime))
+    else:
+        cacheKey = (toParse, None)
+
+    if not tvdbActiveLookUp:
+        parse_result = parseResultCache.get(cacheKey)
+        if parse_result:
+            return parse_result
+
+    modeList = _parse_result_modes(show)
+
     for mode in modeList:
         try:
             myParser = NameParser(regexMode=mode)                
@@ -540,9 +576,51 @@ def parse_result_wrapper(show,toParse,tvdbActiveLookUp=False):
                     break
             break
     else:
-        raise InvalidNameException("Unable to parse "+toParse)
+        e = InvalidNameException("Unable to parse "+toParse)
+        if not tvdbActiveLookUp:
+            parseResultCache.put(cacheKey, e)
+        raise e
+
+    if not tvdbActiveLookUp:
+        parseResultCache.put(cacheKey, parse_result)
+
     return parse_result
 
+def parse_result_wrapper_many(show, names, tvdbActiveLookUp=False):
+    """
+    parse_result_wrapper for a lot of names at once, each regex mode parses all the names that are
+    left with NameParser.parse_many. Returns a parse result for every name, in the same order, or an
+    InvalidNameException for the ones that couldn't be parsed.
+    """
+
+    results = [InvalidNameException("Unable to parse "+x) for x in names]
+
+    # the indexes of the names that haven't been parsed yet
+    remaining = range(len(names))
+
+    for mode in _parse_result_modes(show):
+        if not remaining:
+            break
+
+        parse_results = NameParser(regexMode=mode).parse_many([names[i] for i in remaining])
+
+        stillRemaining = []
+        for i, parse_result in zip(remaining, parse_results):
+            # same as parse_result_wrapper, it's only an anime if we have it as one
+            if parse_result and mode == NameParser.ANIME_REGEX and not (show and show.is_anime):
+                tvdbid = get_tvdbid(parse_result.series_name, tvdbActiveLookUp)
+                if not tvdbid or not check_for_anime(tvdbid):
+                    parse_result = None
+
+            if parse_result:
+                results[i] = parse_result
+            else:
+                stillRemaining.append(i)
+
+        remaining = stillRemaining
+
+    return results
+
 def get_tvdbid(name, useTvdb=False):
     logger.log(u"Trying to get the tvdbid for "+str(name), logger.DEBUG)
             
@@ -600,14 +678,14 @@ def get_tvdbid(name, useTvdb=False):
  
 def check_for_anime(tvdb_id):
     """
-    Check if the show is a anime
+    Check if the show is a anime. This goes by the shows in the show list, not the DB, so the answer
+    changes together with what update_anime_support sees.
     """
     if tvdb_id:
-        myDB = db.DBConnection()
-        isAbsoluteNumberSQlResult = myDB.select("SELECT anime,show_name FROM tv_shows WHERE tvdb_id = ?", [tvdb_id])
-        if isAbsoluteNumberSQlResult and int(isAbsoluteNumberSQlResult[0][0]) > 0:
-            logger.log(u"This show (tvdbid:"+str(tvdb_id)+") is flaged as an anime", logger.DEBUG)
-            return True
+        for show in sickbeard.showList:
+            if str(show.tvdbid) == str(tvdb_id) and show.is_anime:
+                logger.log(u"This show (tvdbid:"+str(tvdb_id)+") is flaged as an anime", logger.DEBUG)
+                return True
     return False 
     
 
@@ -34,7 +34,8 @@ def addNameToCache(name, tvdb_id):
         tvdb_id = 0
     
     cacheDB = db.DBConnection('cache.db')
-    cacheDB.action("INSERT INTO scene_names (tvdb_id, name) VALUES (?, ?)", [tvdb_id, name])
+    # only the first row of a name is ever looked at so don't bother adding it again
+    cacheDB.action("INSERT INTO scene_names (tvdb_id, name) SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM scene_names WHERE name = ?)", [tvdb_id, name, name])
 
 def retrieveNameFromCache(name):
     """
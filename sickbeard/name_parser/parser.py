@@ -16,15 +16,147 @@
 # You should have received a copy of the GNU General Public License
 # along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
 
+from __future__ import with_statement
+
+import collections
 import datetime
+import multiprocessing
 import os.path
 import re
+import sys
+import threading
 
 import regexes
 
 import sickbeard
 
 from sickbeard import logger
+from sickbeard.exceptions import ex
+
+# parse_many hands the names to a pool of processes when there are at least this many of them
+PARSE_POOL_THRESHOLD = 2000
+
+# how many names a pool process gets at a time
+PARSE_POOL_CHUNK_SIZE = 500
+
+# regex mode -> (the patterns they were compiled from, [(name, compiled regex), ...], [(name, compiled regex, compiled token), ...]),
+# shared by every NameParser
+_compiled_regexes = {}
+_compiled_regexes_lock = threading.Lock()
+
+def _uncompiled_regexes(regexMode):
+    if regexMode <= NameParser.ALL_REGEX:
+        return regexes.anime_ep_regexes+regexes.ep_regexes
+    elif regexMode == NameParser.ANIME_REGEX:
+        return regexes.anime_ep_regexes
+    else:
+        return regexes.ep_regexes
+
+def _get_registry_entry(regexMode):
+
+    if regexMode <= NameParser.ALL_REGEX:
+        regexMode = NameParser.ALL_REGEX
+
+    uncompiled_regex = (tuple(_uncompiled_regexes(regexMode)), tuple(sorted(regexes.required_tokens.items())))
+
+    cached = _compiled_regexes.get(regexMode)
+    if cached and cached[0] == uncompiled_regex:
+        return cached
+
+    with _compiled_regexes_lock:
+        cached = _compiled_regexes.get(regexMode)
+        if cached and cached[0] == uncompiled_regex:
+            return cached
+
+        if regexMode not in (NameParser.ALL_REGEX, NameParser.NORMAL_REGEX, NameParser.ANIME_REGEX):
+            logger.log(u"This is a programing ERROR. Fallback Using NORMAL regexs" , logger.ERROR)
+
+        compiled_regexes = []
+        for (cur_pattern_name, cur_pattern) in uncompiled_regex[0]:
+            try:
+                cur_regex = re.compile(cur_pattern, re.VERBOSE | re.IGNORECASE)
+            except re.error, errormsg:
+                logger.log(u"WARNING: Invalid episode_pattern %s, %s" % (cur_pattern_name, errormsg))
+            else:
+                compiled_regexes.append((cur_pattern_name, cur_regex))
+
+        logger.log(u"Compiled "+str(len(compiled_regexes))+" regexs for regex mode "+str(regexMode), logger.DEBUG)
+
+        _compiled_regexes[regexMode] = (uncompiled_regex, compiled_regexes, _route_regexes(compiled_regexes))
+
+        # names may parse differently with the new patterns
+        parseCache.clear()
+
+        return _compiled_regexes[regexMode]
+
+def get_compiled_regexes(regexMode):
+    """
+    Returns the compiled patterns for a regex mode. They're compiled the first time a mode is used and
+    again only when the tables in regexes.py were changed, don't change the list that's returned.
+    """
+
+    return _get_registry_entry(regexMode)[1]
+
+def get_regex_routes(regexMode):
+    """
+    Returns the compiled patterns of a regex mode together with the tokens a name needs to have for
+    them to match, see regexes.required_tokens. Don't change the list that's returned either.
+    """
+
+    return _get_registry_entry(regexMode)[2]
+
+def _route_regexes(compiled_regexes):
+    """
+    Pairs every compiled pattern with its compiled token from regexes.required_tokens, or None if it
+    hasn't got one. Patterns with the same token share the compiled token.
+    """
+
+    compiled_tokens = {}
+    routes = []
+
+    for (cur_regex_name, cur_regex) in compiled_regexes:
+        cur_token = regexes.required_tokens.get(cur_regex_name)
+
+        if cur_token and cur_token not in compiled_tokens:
+            try:
+                compiled_tokens[cur_token] = re.compile(cur_token, re.IGNORECASE)
+            except re.error, errormsg:
+                logger.log(u"WARNING: Invalid required token for %s, %s" % (cur_regex_name, errormsg))
+                compiled_tokens[cur_token] = None
+
+        routes.append((cur_regex_name, cur_regex, compiled_tokens.get(cur_token)))
+
+    return routes
+
+def _parse_chunk(args):
+    """
+    Parses a list of names with a NameParser(file_name, regex_mode), for parse_many. This runs in the
+    pool processes, so it returns the InvalidNameException for a name that can't be parsed instead of
+    raising it.
+    """
+
+    (file_name, regex_mode, names) = args
+
+    name_parser = NameParser(file_name, regex_mode)
+
+    results = []
+    for cur_name in names:
+        try:
+            results.append(name_parser._parse(cur_name))
+        except InvalidNameException, e:
+            results.append(e)
+
+    return results
+
+def refresh_compiled_regexes():
+    """
+    Forgets the compiled patterns so they're compiled again from regexes.py the next time they're used
+    """
+
+    with _compiled_regexes_lock:
+        _compiled_regexes.clear()
+
+    parseCache.clear()
 
 class NameParser(object):
     
@@ -35,8 +167,9 @@ class NameParser(object):
     def __init__(self, file_name=True, regexMode=0):
         
         self.file_name = file_name
-        self.compiled_regexes = []
-        self._compile_regexes(regexMode)
+        self.regex_mode = regexMode
+        self.compiled_regexes = get_compiled_regexes(regexMode)
+        self.regex_routes = get_regex_routes(regexMode)
 
     def clean_series_name(self, series_name):
         """Cleans up series name by removing any . and _
@@ -61,40 +194,22 @@ class NameParser(object):
         series_name = re.sub("-$", "", series_name)
         return series_name.strip()
 
-    def _compile_regexes(self,regexMode):
-        
-        
-        if regexMode <= self.ALL_REGEX:
-            logger.log(u"Using ALL regexs" , logger.DEBUG)
-            uncompiled_regex = regexes.anime_ep_regexes+regexes.ep_regexes
-        
-        elif regexMode == self.NORMAL_REGEX:
-            logger.log(u"Using NORMAL regexs" , logger.DEBUG)
-            uncompiled_regex = regexes.ep_regexes
-            
-        elif regexMode == self.ANIME_REGEX:
-            logger.log(u"Using ANIME regexs" , logger.DEBUG)
-            uncompiled_regex = regexes.anime_ep_regexes
-        
-        else:
-            logger.log(u"This is a programing ERROR. Fallback Using NORMAL regexs" , logger.ERROR)
-            uncompiled_regex = regexes.ep_regexes
-            
-            
-        for (cur_pattern_name, cur_pattern) in uncompiled_regex:
-            try:
-                cur_regex = re.compile(cur_pattern, re.VERBOSE | re.IGNORECASE)
-            except re.error, errormsg:
-                logger.log(u"WARNING: Invalid episode_pattern, %s. %s" % (errormsg, cur_regex.pattern))
-            else:
-                self.compiled_regexes.append((cur_pattern_name, cur_regex))
-
     def _parse_string(self, name):
         
         if not name:
             return None
-        
-        for (cur_regex_name, cur_regex) in self.compiled_regexes:
+
+        # a pattern is only tried if the name has its token, looking for each token once at most. Most
+        # names have an S01E02, 1x02, date or [720p] that rules out all but a few of the patterns.
+        found_tokens = {}
+
+        for (cur_regex_name, cur_regex, cur_token) in self.regex_routes:
+            if cur_token:
+                if cur_token not in found_tokens:
+                    found_tokens[cur_token] = cur_token.search(name) != None
+                if not found_tokens[cur_token]:
+                    continue
+
             match = cur_regex.match(name)
 
             if not match:
@@ -216,9 +331,85 @@ class NameParser(object):
         return int(number)
 
     def parse(self, name):
-        
+        """
+        Returns a ParseResult for name or raises InvalidNameException. Names that were parsed in the same
+        regex mode before are answered from parseCache, either way the result is the caller's to change.
+        """
+
         name = self._unicodify(name)
 
+        cache_key = (name, bool(self.file_name), self.regex_mode)
+
+        cached_result = parseCache.get(cache_key)
+        if cached_result:
+            return cached_result
+
+        try:
+            final_result = self._parse(name)
+        except InvalidNameException, e:
+            parseCache.put(cache_key, e)
+            raise
+
+        parseCache.put(cache_key, final_result)
+
+        return final_result
+
+    def parse_many(self, names, processes=None):
+        """
+        Parses a lot of names at once, like the files of a show dir. Returns a ParseResult for every name,
+        in the same order, or None for the ones that can't be parsed.
+
+        When there are PARSE_POOL_THRESHOLD names or more they're shared out between a pool of processes,
+        as many as there are CPUs unless processes says otherwise. These names are usually only parsed the
+        once so they're kept out of parseCache.
+        """
+
+        names = [self._unicodify(x) for x in names]
+
+        if processes == None:
+            try:
+                processes = multiprocessing.cpu_count()
+            except NotImplementedError:
+                processes = 1
+
+        # a frozen Windows build can't start the processes
+        if len(names) < PARSE_POOL_THRESHOLD or processes < 2 or getattr(sys, 'frozen', False):
+            results = _parse_chunk((self.file_name, self.regex_mode, names))
+        else:
+            results = self._parse_in_pool(names, processes)
+
+        return [None if isinstance(x, InvalidNameException) else x for x in results]
+
+    def _parse_in_pool(self, names, processes):
+
+        chunks = [(self.file_name, self.regex_mode, names[i:i + PARSE_POOL_CHUNK_SIZE]) for i in range(0, len(names), PARSE_POOL_CHUNK_SIZE)]
+
+        logger.log(u"Parsing "+str(len(names))+" names with "+str(processes)+" processes", logger.DEBUG)
+
+        try:
+            pool = multiprocessing.Pool(processes)
+        except OSError, e:
+            logger.log(u"Unable to start the processes to parse with, parsing the names one by one instead: "+ex(e), logger.WARNING)
+            return _parse_chunk((self.file_name, self.regex_mode, names))
+
+        try:
+            try:
+                chunk_results = pool.map(_parse_chunk, chunks)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+        finally:
+            pool.join()
+
+        results = []
+        for cur_results in chunk_results:
+            results += cur_results
+
+        return results
+
+    def _parse(self, name):
+
         # break it into parts if there are any (dirname, file name, extension)
         dir_name, file_name = os.path.split(name)
         ext_match = re.match('(.*)\.\w{3,4}$', file_name)
@@ -303,7 +494,14 @@ class ParseResult(object):
         self.air_date = air_date
         
         self.which_regex = None
-        
+
+    def copy(self):
+        result = ParseResult(self.original_name, self.series_name, self.season_number, list(self.episode_numbers),
+                             self.extra_info, self.release_group, self.air_date, list(self.ab_episode_numbers))
+        if self.which_regex != None:
+            result.which_regex = list(self.which_regex)
+        return result
+
     def __eq__(self, other):
         if not other:
             return False
@@ -363,3 +561,68 @@ class ParseResult(object):
 
 class InvalidNameException(Exception):
     "The given name is not valid"
+
+class ParseCache(object):
+    """
+    Keeps the last max_size parse results, the least recently used ones are dropped first. A name that
+    couldn't be parsed is kept as the InvalidNameException it raised.
+
+    What goes in and what comes out are copies, nobody gets to change the results the cache holds.
+    """
+
+    def __init__(self, max_size=5000):
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+
+        # key -> ParseResult or InvalidNameException, least recently used first
+        self._results = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns a copy of the ParseResult kept for key, or None if there isn't one. If the name couldn't
+        be parsed the InvalidNameException is raised again.
+        """
+
+        with self._lock:
+            if key not in self._results:
+                self.misses += 1
+                return None
+
+            result = self._results.pop(key)
+            self._results[key] = result
+            self.hits += 1
+
+        if isinstance(result, InvalidNameException):
+            raise InvalidNameException(*result.args)
+
+        return result.copy()
+
+    def put(self, key, result):
+
+        if isinstance(result, ParseResult):
+            result = result.copy()
+
+        with self._lock:
+            self._results.pop(key, None)
+            self._results[key] = result
+
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._results),
+                    'limit': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses}
+
+# the results of every NameParser.parse, keyed on the name, the file_name flag and the regex mode
+parseCache = ParseCache()
@@ -304,3 +304,31 @@ anime_ep_regexes = [
                .*?                                                         # Separator and EOL
                ''')
                ]
+
+# A name can only match one of the regexes above if it has the token given here for it somewhere in it,
+# the parser skips the regexes whose token isn't in the name (case insensitive, like the regexes).
+# Regexes without a token are always tried. A token has to follow from its regex, one that's stricter
+# than the regex changes how names are parsed; tests/name_parser_tests.py checks they don't.
+required_tokens = {
+              'standard_repeat':            r's\d+[. _-]*e\d',                      # S01E02
+              'fov_repeat':                 r'\dx\d',                               # 1x02
+              'standard':                   r's\d+[. _-]*e\d',
+              'fov':                        r'\dx\d',
+              'scene_date_format':          r'\d{4}[. _-]+\d{2}[. _-]+\d{2}',        # 2010.11.23
+              'stupid':                     r'\d{3}$',                              # abc102 at the end
+              'verbose':                    r'season[. _-]+\d+[. _-]+episode',      # Season 1 Episode
+              'season_only':                r's(eason[. _-])?\d',                   # S01/Season 01
+              'no_season_multi_ep':         r'(e(p(isode)?)?|part|pt)[. _-]?[\divx]', # E02, Part.1, Pt.II
+              'no_season_general':          r'(e(p(isode)?)?|part|pt)[. _-]?[\divx]',
+              'bare':                       r'[. _-]\d{3,4}([. _-]|$)',             # .102.
+              'no_season':                  r'(^|[. _-])\d{2}[. _-]',               # - 01 -
+              'anime_standard':             r'[ ._-]\[(\d{3}|xvid)',                # [720p]/[XviD]
+              'anime_standard_round':       r'[ ._-]\((cx[ ._-]?)*\d{3}',           # (1280x720
+              'anime_slash':                r'[ ._-]\[\d{3,4}p$',                   # [720p at the end
+              'anime_standard_codec':       r'\[\d{3}',                             # [720p]
+              'anime_standard_codec2':      r'\[h264-\d{3}',                        # [h264-720p]
+              'anime_and_normal':           r's\d+[. _-]*e\d',
+              'anime_and_normal_reverse':   r's\d+[. _-]*e\d',
+              'anime_and_normal_front':     r's\d+[. _-]*e\d',
+              'anime_bare':                 r'[ ._-]\d{3}',                         # - 102
+              }
@@ -284,7 +284,12 @@ class PostProcessor(object):
         myDB = db.DBConnection()
     
         for curName in names:
-            sql_results = myDB.select("SELECT * FROM history WHERE resource LIKE ?", [re.sub("[\.\-\ ]", "_", curName)])
+            resource = re.sub("[\.\-\ ]", "_", curName)
+            resourceRange = db.likePrefixRange(resource)
+            if resourceRange:
+                sql_results = myDB.select("SELECT * FROM history WHERE resource LIKE ? AND resource >= ? COLLATE NOCASE AND resource < ? COLLATE NOCASE", [resource] + list(resourceRange))
+            else:
+                sql_results = myDB.select("SELECT * FROM history WHERE resource LIKE ?", [resource])
     
             self._log("Found NO result in history for '"+str(curName)+"'", logger.DEBUG)
             if len(sql_results) == 0:
@@ -473,17 +478,21 @@ class PostProcessor(object):
                     raise #TODO: later I'll just log this, for now I want to know about it ASAP
 
                 try:
-                    # There's gotta be a better way of doing this but we don't wanna
-                    # change the language value elsewhere
-                    ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
-
-                    if tvdb_lang and not tvdb_lang == 'en':
-                        ltvdb_api_parms['language'] = tvdb_lang
-
-                    t = tvdb_api.Tvdb(**ltvdb_api_parms)
-                    epObj = t[tvdb_id].airedOn(episodes[0])[0]
-                    season = int(epObj["seasonnumber"])
-                    episodes = [int(epObj["episodenumber"])]
+                    if showObj != None:
+                        season, episode = showObj.findEpisodeByAirdate(episodes[0])
+                        episodes = [episode]
+                    else:
+                        # There's gotta be a better way of doing this but we don't wanna
+                        # change the language value elsewhere
+                        ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
+
+                        if tvdb_lang and not tvdb_lang == 'en':
+                            ltvdb_api_parms['language'] = tvdb_lang
+
+                        t = tvdb_api.Tvdb(**ltvdb_api_parms)
+                        epObj = t[tvdb_id].airedOn(episodes[0])[0]
+                        season = int(epObj["seasonnumber"])
+                        episodes = [int(epObj["episodenumber"])]
                     self._log(u"Got season "+str(season)+" episodes "+str(episodes), logger.DEBUG)
                 except tvdb_exceptions.tvdb_episodenotfound, e:
                     self._log(u"Unable to find episode with date "+str(episodes[0])+u" for show "+str(tvdb_id)+u", skipping", logger.DEBUG)
@@ -29,7 +29,7 @@ from sickbeard import history
 
 from sickbeard.common import DOWNLOADED, SNATCHED, SNATCHED_PROPER, Quality
 
-from lib.tvdb_api import tvdb_api, tvdb_exceptions
+from lib.tvdb_api import tvdb_exceptions
 
 from name_parser.parser import InvalidNameException
 from sickbeard.helpers import parse_result_wrapper
@@ -157,19 +157,9 @@ class ProperFinder():
                     logger.log(u"This should never have happened, post a bug about this!", logger.ERROR)
                     raise Exception("BAD STUFF HAPPENED")
 
-                tvdb_lang = showObj.lang
-                # There's gotta be a better way of doing this but we don't wanna
-                # change the language value elsewhere
-                ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
-
-                if tvdb_lang and not tvdb_lang == 'en':
-                    ltvdb_api_parms['language'] = tvdb_lang
-
                 try:
-                    t = tvdb_api.Tvdb(**ltvdb_api_parms)
-                    epObj = t[curProper.tvdbid].airedOn(curProper.episode)[0]
-                    curProper.season = int(epObj["seasonnumber"])
-                    curProper.episodes = [int(epObj["episodenumber"])]
+                    curProper.season, episode = showObj.findEpisodeByAirdate(curProper.episode)
+                    curProper.episodes = [episode]
                 except tvdb_exceptions.tvdb_episodenotfound:
                     logger.log(u"Unable to find episode with date "+str(curProper.episode)+" for show "+parse_result.series_name+", skipping", logger.WARNING)
                     continue
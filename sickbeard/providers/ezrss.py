@@ -193,6 +193,6 @@ class EZRSSCache(tvcache.TVCache):
 
         logger.log(u"Adding item from RSS to cache: "+title, logger.DEBUG)
 
-        self._addCacheEntry(title, url)
+        return self._addCacheEntry(title, url)
 
 provider = EZRSSProvider()
\ No newline at end of file
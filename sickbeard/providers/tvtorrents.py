@@ -83,6 +83,6 @@ class TvTorrentsCache(tvcache.TVCache):
 
         logger.log(u"Adding item from RSS to cache: "+title, logger.DEBUG)
 
-        self._addCacheEntry(title, url)
+        return self._addCacheEntry(title, url)
 
 provider = TvTorrentsProvider()
\ No newline at end of file
@@ -42,7 +42,7 @@ def get_scene_exception_by_name(show_name):
     myDB = db.DBConnection("cache.db")
     
     # try the obvious case first
-    exception_result = myDB.select("SELECT tvdb_id FROM scene_exceptions WHERE LOWER(show_name) = ?", [show_name.lower()])
+    exception_result = myDB.select("SELECT tvdb_id FROM scene_exceptions WHERE show_name_lower = ?", [show_name.lower()])
     if exception_result:
         return int(exception_result[0]["tvdb_id"])
 
@@ -71,13 +71,16 @@ def retrieve_exceptions():
     exception_dict = retrieve_exceptions_fetcher(url)
     exception_dict.update(retrieve_exceptions_fetcher(url2))
 
-    myDB = db.DBConnection("cache.db")
-    myDB.action("DELETE FROM scene_exceptions WHERE 1=1")
+    queries = [["DELETE FROM scene_exceptions WHERE 1=1"]]
 
     # write all the exceptions we got off the net into the database
     for cur_tvdb_id in exception_dict:
         for cur_exception in exception_dict[cur_tvdb_id]:
-            myDB.action("INSERT INTO scene_exceptions (tvdb_id, show_name) VALUES (?,?)", [cur_tvdb_id, cur_exception])
+            queries.append(["INSERT INTO scene_exceptions (tvdb_id, show_name, show_name_lower) VALUES (?,?,?)", [cur_tvdb_id, cur_exception, cur_exception.lower()]])
+
+    # replace the old list with the new one in a single transaction
+    myDB = db.DBConnection("cache.db")
+    myDB.mass_action(queries)
 
     # since this could invalidate the results of the cache we clear it out after updating
     name_cache.clearCache()
@@ -0,0 +1,61 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+import Queue
+import threading
+import traceback
+
+from sickbeard import logger
+from sickbeard.exceptions import ex
+
+# checking a folder on a network share can take a while, a few at a time keeps that from adding up
+LOADER_THREADS = 4
+
+def finishLoading(shows, threads=LOADER_THREADS):
+    """
+    Runs validateLocation for every show in the background and returns right away. Each show is
+    marked as loading until its turn has come.
+    """
+
+    showQueue = Queue.Queue()
+    for curShow in shows:
+        showQueue.put(curShow)
+
+    workers = []
+    for i in range(min(threads, len(shows))):
+        curWorker = threading.Thread(target=_loadShows, args=(showQueue,), name="SHOWLOADER-" + str(i + 1))
+        curWorker.setDaemon(True)
+        curWorker.start()
+        workers.append(curWorker)
+
+    return workers
+
+def _loadShows(showQueue):
+
+    while True:
+        try:
+            curShow = showQueue.get_nowait()
+        except Queue.Empty:
+            return
+
+        try:
+            curShow.validateLocation()
+        except Exception, e:
+            logger.log(u"Error while loading " + curShow.name + ": " + ex(e), logger.ERROR)
+            logger.log(traceback.format_exc(), logger.DEBUG)
+            curShow.loading = False
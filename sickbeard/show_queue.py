@@ -29,6 +29,7 @@ from sickbeard.common import SKIPPED, WANTED
 from sickbeard.tv import TVShow
 from sickbeard import exceptions, logger, ui, db
 from sickbeard import generic_queue
+from sickbeard import episode_sync
 from sickbeard import name_cache
 from sickbeard.exceptions import ex
 
@@ -107,6 +108,26 @@ class ShowQueue(generic_queue.GenericQueue):
 
         return queueItemObj
 
+    def refreshShowFiles(self, show, paths):
+        """
+        Queues a refresh of just these files in the show dir. If one is already waiting for the show the
+        files are added to it instead, and if a full refresh or update is waiting it'll see them anyway.
+        """
+
+        if self.isBeingAdded(show) or self._isInQueue(show, (ShowQueueActions.REFRESH, ShowQueueActions.UPDATE, ShowQueueActions.FORCEUPDATE)):
+            return None
+
+        for curItem in self.queue:
+            if curItem.action_id == ShowQueueActions.FILEREFRESH and curItem.show == show:
+                curItem.paths.update(paths)
+                return curItem
+
+        queueItemObj = QueueItemFileRefresh(show, paths)
+
+        self.add_item(queueItemObj)
+
+        return queueItemObj
+
     def renameShowEpisodes(self, show, force=False):
 
         queueItemObj = QueueItemRename(show)
@@ -128,12 +149,14 @@ class ShowQueueActions:
     UPDATE=3
     FORCEUPDATE=4
     RENAME=5
+    FILEREFRESH=6
     
     names = {REFRESH: 'Refresh',
                     ADD: 'Add',
                     UPDATE: 'Update',
                     FORCEUPDATE: 'Force Update',
                     RENAME: 'Rename',
+                    FILEREFRESH: 'File Refresh',
                     }
 
 class ShowQueueItem(generic_queue.QueueItem):
@@ -303,6 +326,7 @@ class QueueItemAdd(ShowQueueItem):
             logger.log(u"Setting all episodes to the specified default status: "+str(self.default_status))
             myDB = db.DBConnection();
             myDB.action("UPDATE tv_episodes SET status = ? WHERE status = ? AND showid = ? AND season != 0", [self.default_status, SKIPPED, self.show.tvdbid])
+            self.show.resetEpisodeStatus()
 
         # if they started with WANTED eps then run the backlog
         if self.default_status == WANTED:
@@ -339,6 +363,25 @@ class QueueItemRefresh(ShowQueueItem):
 
         self.inProgress = False
 
+class QueueItemFileRefresh(ShowQueueItem):
+    def __init__(self, show=None, paths=()):
+        ShowQueueItem.__init__(self, ShowQueueActions.FILEREFRESH, show)
+
+        self.paths = set(paths)
+
+        # only a few files so it's even quicker than a refresh
+        self.priority = generic_queue.QueuePriorities.HIGH
+
+    def execute(self):
+
+        ShowQueueItem.execute(self)
+
+        logger.log(u"Refreshing "+str(len(self.paths))+" changed files of "+self.show.name)
+
+        self.show.refreshFiles(sorted(self.paths))
+
+        self.inProgress = False
+
 class QueueItemRename(ShowQueueItem):
     def __init__(self, show=None):
         ShowQueueItem.__init__(self, ShowQueueActions.RENAME, show)
@@ -371,39 +414,12 @@ class QueueItemUpdate(ShowQueueItem):
             logger.log(u"Unable to contact TVDB, aborting: "+ex(e), logger.WARNING)
             return
 
-        # get episode list from DB
-        logger.log(u"Loading all episodes from the database", logger.DEBUG)
-        DBEpList = self.show.loadEpisodesFromDB()
-
-        # get episode list from TVDB
-        logger.log(u"Loading all episodes from theTVDB", logger.DEBUG)
+        # compare the episode list from TVDB with the DB and write only what changed
+        logger.log(u"Syncing the episodes with theTVDB", logger.DEBUG)
         try:
-            TVDBEpList = self.show.loadEpisodesFromTVDB(cache=not self.force)
+            episode_sync.syncEpisodes(self.show, cache=not self.force)
         except tvdb_exceptions.tvdb_exception, e:
             logger.log(u"Unable to get info from TVDB, the show info will not be refreshed: "+ex(e), logger.ERROR)
-            TVDBEpList = None
-
-        if TVDBEpList == None:
-            logger.log(u"No data returned from TVDB, unable to update this show", logger.ERROR)
-
-        else:
-
-            # for each ep we found on TVDB delete it from the DB list
-            for curSeason in TVDBEpList:
-                for curEpisode in TVDBEpList[curSeason]:
-                    logger.log(u"Removing "+str(curSeason)+"x"+str(curEpisode)+" from the DB list", logger.DEBUG)
-                    if curSeason in DBEpList and curEpisode in DBEpList[curSeason]:
-                        del DBEpList[curSeason][curEpisode]
-
-            # for the remaining episodes in the DB list just delete them from the DB
-            for curSeason in DBEpList:
-                for curEpisode in DBEpList[curSeason]:
-                    logger.log(u"Permanently deleting episode "+str(curSeason)+"x"+str(curEpisode)+" from the database", logger.MESSAGE)
-                    curEp = self.show.getEpisode(curSeason, curEpisode)
-                    try:
-                        curEp.deleteEpisode()
-                    except exceptions.EpisodeDeletedException:
-                        pass
 
         # now that we've updated the DB from TVDB see if there's anything we can add from TVRage
         with self.show.lock:
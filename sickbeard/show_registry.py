@@ -0,0 +1,172 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import with_statement
+
+import threading
+
+from sickbeard import helpers
+
+def _normalizeName(name):
+    return helpers.sanitizeSceneName(name).lower()
+
+class ShowRegistry(list):
+    """
+    The list behind sickbeard.showList. It behaves like a normal list but also keeps dict indexes
+    of the shows by tvdb id, tvrage id and scene name so lookups don't have to walk the whole list.
+
+    The indexes are updated whenever a show is added or removed. A show whose ids or names change
+    has to be reindexed, TVShow.saveToDB takes care of that.
+    """
+
+    def __init__(self, shows=()):
+        list.__init__(self)
+
+        self._lock = threading.RLock()
+
+        self._byTvdbid = {}
+        self._byTvrid = {}
+        self._byName = {}
+
+        # id(show) -> the (tvdbid, tvrid, names) it's currently indexed under
+        self._keys = {}
+
+        self.extend(shows)
+
+    def _addToIndex(self, index, key, show):
+        index[key] = index.get(key, []) + [show]
+
+    def _removeFromIndex(self, index, key, show):
+        shows = [x for x in index.get(key, []) if x is not show]
+        if shows:
+            index[key] = shows
+        elif key in index:
+            del index[key]
+
+    def _index(self, show):
+        # the same object is only indexed once no matter how often it's in the list
+        if id(show) in self._keys:
+            return
+
+        names = set([_normalizeName(x) for x in (show.name, show.tvrname) if x])
+        keys = (show.tvdbid, show.tvrid, names)
+
+        self._addToIndex(self._byTvdbid, show.tvdbid, show)
+        if show.tvrid:
+            self._addToIndex(self._byTvrid, show.tvrid, show)
+        for curName in names:
+            self._addToIndex(self._byName, curName, show)
+
+        self._keys[id(show)] = keys
+
+    def _unindex(self, show):
+        keys = self._keys.pop(id(show), None)
+        if not keys:
+            return
+
+        tvdbid, tvrid, names = keys
+
+        self._removeFromIndex(self._byTvdbid, tvdbid, show)
+        self._removeFromIndex(self._byTvrid, tvrid, show)
+        for curName in names:
+            self._removeFromIndex(self._byName, curName, show)
+
+    def _rebuild(self):
+        self._keys = {}
+        self._byTvdbid = {}
+        self._byTvrid = {}
+        self._byName = {}
+        for curShow in list.__iter__(self):
+            self._index(curShow)
+
+    def reindex(self, show):
+        """
+        Updates the indexes after the show's ids or names changed
+        """
+        with self._lock:
+            if id(show) in self._keys:
+                self._unindex(show)
+                self._index(show)
+
+    def getByTvdbid(self, tvdbid):
+        return list(self._byTvdbid.get(tvdbid, []))
+
+    def getByTvrid(self, tvrid):
+        return list(self._byTvrid.get(tvrid, []))
+
+    def getByName(self, name):
+        return list(self._byName.get(_normalizeName(name), []))
+
+    # the list methods that change what's in the list all keep the indexes up to date
+
+    def append(self, show):
+        with self._lock:
+            list.append(self, show)
+            self._index(show)
+
+    def insert(self, index, show):
+        with self._lock:
+            list.insert(self, index, show)
+            self._index(show)
+
+    def extend(self, shows):
+        with self._lock:
+            for curShow in shows:
+                self.append(curShow)
+
+    def __iadd__(self, shows):
+        self.extend(shows)
+        return self
+
+    def remove(self, show):
+        with self._lock:
+            list.remove(self, show)
+            self._unindex(show)
+            if list.__contains__(self, show):
+                self._index(show)
+
+    def pop(self, index=-1):
+        with self._lock:
+            show = list.pop(self, index)
+            self._unindex(show)
+            if list.__contains__(self, show):
+                self._index(show)
+            return show
+
+    def __contains__(self, show):
+        return id(show) in self._keys
+
+    def __setitem__(self, index, value):
+        with self._lock:
+            list.__setitem__(self, index, value)
+            self._rebuild()
+
+    def __delitem__(self, index):
+        with self._lock:
+            list.__delitem__(self, index)
+            self._rebuild()
+
+    def __setslice__(self, i, j, shows):
+        with self._lock:
+            list.__setslice__(self, i, j, shows)
+            self._rebuild()
+
+    def __delslice__(self, i, j):
+        with self._lock:
+            list.__delslice__(self, i, j)
+            self._rebuild()
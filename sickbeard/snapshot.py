@@ -0,0 +1,234 @@
+# Author: Nic Wolfe <nic@wolfeden.ca>
+# URL: http://code.google.com/p/sickbeard/
+#
+# This file is part of Sick Beard.
+#
+# Sick Beard is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Sick Beard is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Sick Beard.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Warm start snapshot of the show list.
+
+On a clean shutdown the shows and the status of every episode are written to a file in DATA_DIR.
+The next start uses it instead of going through the DB, as long as the DB hasn't been touched in
+between: the snapshot remembers db_version and the change counter, size and mtime of sickbeard.db.
+Anything that doesn't match, or a file that can't be read, just means the shows are loaded from
+the DB like always.
+"""
+
+import marshal
+import os
+import struct
+import zlib
+
+import sickbeard
+
+from sickbeard import db
+from sickbeard import logger
+from sickbeard.exceptions import ex
+from sickbeard.tv import TVShow
+
+SNAPSHOT_FILE = "shows.snapshot"
+
+# bump this when what's in the snapshot changes
+SNAPSHOT_VERSION = 1
+
+_MAGIC = "SBSNAP"
+
+# the snapshot check() accepted, waiting for restore()
+_snapshot = None
+
+def _snapshotPath():
+    return os.path.join(sickbeard.DATA_DIR, SNAPSHOT_FILE)
+
+def _fingerprint(dbFileName="sickbeard.db"):
+    """
+    Returns what the DB file says about its last change: the file change counter from the sqlite
+    header, the size and the mtime. A WAL file with anything in it holds changes the main file
+    doesn't have yet, there's no fingerprint (None) then.
+    """
+
+    dbPath = os.path.join(sickbeard.DATA_DIR, dbFileName)
+    if not os.path.isfile(dbPath):
+        return None
+
+    walPath = dbPath + "-wal"
+    if os.path.isfile(walPath) and os.path.getsize(walPath) > 0:
+        return None
+
+    dbFile = open(dbPath, 'rb')
+    try:
+        header = dbFile.read(100)
+    finally:
+        dbFile.close()
+
+    if len(header) < 100:
+        return None
+
+    dbStat = os.stat(dbPath)
+
+    return [struct.unpack(">I", header[24:28])[0], dbStat.st_size, dbStat.st_mtime]
+
+def save():
+    """
+    Writes the snapshot, saveAll calls this once everything has been written to the DB. The web
+    server may still be running so nothing is closed, the DB is only kept from changing until the
+    fingerprint has been taken.
+    """
+
+    db.writeQueue.flush()
+
+    myDB = db.DBConnection()
+
+    # a write between reading the rows and taking the fingerprint would make the snapshot look current when it isn't
+    with db.db_lock:
+        dbVersion = db.getDBVersion(myDB)
+        shows = [dict(zip(x.keys(), x)) for x in myDB.select("SELECT * FROM tv_shows")]
+
+        # tvdbid -> [season, episode, status, season, episode, status, ...]
+        episodeStatus = {}
+        for curResult in myDB.select("SELECT showid, season, episode, status FROM tv_episodes"):
+            episodeStatus.setdefault(int(curResult["showid"]), []).extend([int(curResult["season"]), int(curResult["episode"]), int(curResult["status"])])
+
+        # with WAL the changes have to be written back to the main file for the fingerprint to see them
+        if db.isWAL():
+            myDB.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+        fingerprint = _fingerprint()
+    if fingerprint == None:
+        logger.log(u"The database has changes that aren't in the main file yet, not writing a snapshot", logger.DEBUG)
+        return False
+
+    payload = zlib.compress(marshal.dumps({'version': SNAPSHOT_VERSION,
+                                           'db_version': dbVersion,
+                                           'fingerprint': fingerprint,
+                                           'shows': shows,
+                                           'episode_status': episodeStatus}, 2))
+
+    snapshotPath = _snapshotPath()
+    tempPath = snapshotPath + ".tmp"
+
+    try:
+        tempFile = open(tempPath, 'wb')
+        try:
+            tempFile.write(_MAGIC + struct.pack(">I", zlib.crc32(payload) & 0xffffffff) + payload)
+        finally:
+            tempFile.close()
+
+        if os.path.isfile(snapshotPath):
+            os.remove(snapshotPath)
+        os.rename(tempPath, snapshotPath)
+    except (IOError, OSError), e:
+        logger.log(u"Unable to write the show snapshot "+snapshotPath+": "+ex(e), logger.WARNING)
+        return False
+
+    logger.log(u"Wrote a snapshot of "+str(len(shows))+" shows to "+snapshotPath, logger.DEBUG)
+    return True
+
+def _read(snapshotPath):
+
+    snapshotFile = open(snapshotPath, 'rb')
+    try:
+        data = snapshotFile.read()
+    finally:
+        snapshotFile.close()
+
+    if not data.startswith(_MAGIC) or len(data) < len(_MAGIC) + 4:
+        raise ValueError("not a snapshot file")
+
+    (crc,) = struct.unpack(">I", data[len(_MAGIC):len(_MAGIC) + 4])
+    payload = data[len(_MAGIC) + 4:]
+    if zlib.crc32(payload) & 0xffffffff != crc:
+        raise ValueError("checksum mismatch")
+
+    snapshot = marshal.loads(zlib.decompress(payload))
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError("unknown snapshot version")
+
+    return snapshot
+
+def check():
+    """
+    Reads the snapshot from the last clean shutdown and keeps it if it still matches the DB. This has
+    to run before anything writes to the DB. The file is removed either way, it's only good once.
+    """
+
+    global _snapshot
+
+    _snapshot = None
+
+    snapshotPath = _snapshotPath()
+    if not os.path.isfile(snapshotPath):
+        return False
+
+    fingerprint = _fingerprint()
+
+    try:
+        try:
+            snapshot = _read(snapshotPath)
+        finally:
+            os.remove(snapshotPath)
+    except (IOError, OSError, EOFError, ValueError, TypeError, zlib.error, struct.error), e:
+        logger.log(u"Ignoring the show snapshot, it couldn't be read: "+ex(e), logger.WARNING)
+        return False
+
+    if fingerprint == None or snapshot['fingerprint'] != fingerprint:
+        logger.log(u"The database changed since the show snapshot was written, ignoring it", logger.DEBUG)
+        return False
+
+    if snapshot['db_version'] != db.getDBVersion(db.DBConnection()):
+        logger.log(u"The show snapshot is for a different database version, ignoring it", logger.DEBUG)
+        return False
+
+    _snapshot = snapshot
+    return True
+
+def discard():
+    """
+    Forgets the snapshot check() accepted, for when the DB was changed after all (an upgrade)
+    """
+
+    global _snapshot
+
+    _snapshot = None
+
+def restore(showList):
+    """
+    Adds the shows from the accepted snapshot to showList, their episode statuses are already in
+    memory. Returns False if there is no snapshot, the shows have to come from the DB then.
+    """
+
+    global _snapshot
+
+    snapshot, _snapshot = _snapshot, None
+    if not snapshot:
+        return False
+
+    shows = []
+
+    try:
+        for sqlShow in snapshot['shows']:
+            curShow = TVShow.fromDBRow(sqlShow)
+
+            flatStatus = snapshot['episode_status'].get(curShow.tvdbid, [])
+            curShow.primeEpisodeStatus(dict([((flatStatus[i], flatStatus[i + 1]), flatStatus[i + 2]) for i in range(0, len(flatStatus), 3)]))
+
+            shows.append(curShow)
+    except Exception, e:
+        logger.log(u"Unable to build the shows from the snapshot, loading them from the database instead: "+ex(e), logger.WARNING)
+        return False
+
+    showList.extend(shows)
+
+    logger.log(u"Loaded "+str(len(shows))+" shows from the snapshot")
+    return True
@@ -23,6 +23,7 @@ import datetime
 import threading
 import re
 import glob
+import weakref
 
 import sickbeard
 
@@ -39,6 +40,7 @@ from sickbeard import tvrage
 from sickbeard import config
 from sickbeard import image_cache
 from sickbeard import postProcessor
+from sickbeard import episode_cache
 
 from sickbeard import encodingKludge as ek
 
@@ -46,10 +48,54 @@ from sickbeard.helpers import parse_result_wrapper
 from common import Quality, Overview
 from common import DOWNLOADED, SNATCHED, SNATCHED_PROPER, ARCHIVED, IGNORED, UNAIRED, WANTED, SKIPPED, UNKNOWN
 
+def _episodeNumberOrder(numbers):
+    # specials last, the rest in order
+    return sorted(numbers, key=lambda x: (x[0] == 0, x))
+
+def _indexEpisodeNumbers(index, key, airdate, absolute_number):
+
+    index['episodes'][key] = (airdate, absolute_number)
+
+    # ordinal 1 is what an episode without an air date gets
+    if airdate > 1:
+        index['airdate'][airdate] = _episodeNumberOrder(index['airdate'].get(airdate, []) + [key])
+
+    if absolute_number > 0 and key[0] != 0:
+        index['absolute'][absolute_number] = _episodeNumberOrder(index['absolute'].get(absolute_number, []) + [key])
+
+def _fileIndexPath(path):
+    """
+    Returns path the way it's stored in and looked up in file_index
+    """
+
+    return ek.ek(os.path.normpath, path)
+
+def _unindexEpisodeNumbers(index, key):
+
+    if key not in index['episodes']:
+        return
+
+    airdate, absolute_number = index['episodes'].pop(key)
+
+    for curIndex, curKey in ((index['airdate'], airdate), (index['absolute'], absolute_number)):
+        numbers = [x for x in curIndex.get(curKey, []) if x != key]
+        if numbers:
+            curIndex[curKey] = numbers
+        elif curKey in curIndex:
+            del curIndex[curKey]
+
 class TVShow(object):
 
     def __init__ (self, tvdbid, lang=""):
 
+        self._initFields(tvdbid, lang)
+
+        self.loadFromDB()
+        
+        self.saveToDB()
+
+    def _initFields(self, tvdbid, lang=""):
+
         self.tvdbid = tvdbid
 
         self._location = ""
@@ -73,15 +119,52 @@ class TVShow(object):
         self.lock = threading.Lock()
         self._isDirGood = False
 
+        # set while a show built by fromDBRow is still waiting for its folder to be checked
+        self.loading = False
+
+        # season -> episode -> episode object, only weakly: episode_cache keeps the ones in use alive
         self.episodes = {}
+
+        # (season, episode) -> status of every episode in the DB, loaded the first time it's needed
+        self._episodeStatus = None
+        self._episodeStatusChanges = 0
+        self._episodeStatusLock = threading.Lock()
+
+        # episode numbers by air date and absolute number, built the first time one is looked up
+        self._episodeNumbers = None
+        self._episodeNumbersChanges = 0
+        self._episodeNumbersLock = threading.Lock()
         
         otherShow = helpers.findCertainShow(sickbeard.showList, self.tvdbid)
         if otherShow != None:
             raise exceptions.MultipleShowObjectsException("Can't create a show if it already exists")
 
-        self.loadFromDB()
-        
-        self.saveToDB()
+    @classmethod
+    def fromDBRow(cls, sqlResult):
+        """
+        Builds a show straight from its tv_shows row. Unlike the constructor this doesn't select the
+        row again or write it back, the show is marked as loading until validateLocation has run.
+        """
+
+        show = cls.__new__(cls)
+        show._initFields(int(sqlResult["tvdb_id"]))
+        show.loadFromDBRow(sqlResult)
+        show.loading = True
+
+        return show
+
+    def validateLocation(self):
+        """
+        Checks the show folder once so a missing folder is reported right after startup
+        """
+
+        if ek.ek(os.path.isdir, self._location):
+            self._isDirGood = True
+        else:
+            self._isDirGood = False
+            logger.log(str(self.tvdbid) + u": Show dir " + self._location + " doesn't exist", logger.WARNING)
+
+        self.loading = False
     
     def _is_anime(self):
         if(self.anime > 0):
@@ -111,29 +194,33 @@ class TVShow(object):
 
     location = property(_getLocation, _setLocation)
 
-    # delete references to anything that's not in the internal lists
+    # drop the episode objects we're holding, they're loaded again when they're needed
     def flushEpisodes(self):
 
         for curSeason in self.episodes:
-            for curEp in self.episodes[curSeason]:
-                myEp = self.episodes[curSeason][curEp]
-                self.episodes[curSeason][curEp] = None
-                del myEp
+            for curEp in self.episodes[curSeason].values():
+                if curEp != None:
+                    episode_cache.episodeCache.remove(curEp)
 
+        self.episodes = {}
+
+    def _getSeasonEpisodes(self, season):
+        seasonEps = self.episodes.get(season)
+        if seasonEps == None:
+            # setdefault so two threads can't each put their own season in
+            seasonEps = self.episodes.setdefault(season, weakref.WeakValueDictionary())
+        return seasonEps
 
     def getEpisode(self, season, episode, file=None, noCreate=False, absolute_number=None):
         """Return TVEpisode(self, season, episode) | None
         """
         # if we get an anime get the real season and episode
         if self.anime and absolute_number != None and season == None and episode == None:
-            myDB = db.DBConnection()
-            sql = "SELECT * FROM tv_episodes WHERE showid = ? and absolute_number = ? and season <> 0"
-            sqlResults = myDB.select(sql, [self.tvdbid,absolute_number])
-            if len(sqlResults) == 1:
-                episode = int(sqlResults[0]["episode"])
-                season = int(sqlResults[0]["season"])
+            numbers = self.getEpisodesByAbsoluteNumber(absolute_number)
+            if len(numbers) == 1:
+                season, episode = numbers[0]
                 logger.log("Found episode by absolute_number:"+str(absolute_number)+" which is "+str(season)+"x"+str(episode), logger.DEBUG)  
-            elif len(sqlResults) > 1:
+            elif len(numbers) > 1:
                 logger.log("Multiple entries for absolute number: "+str(absolute_number)+" in show: "+self.name+" found ", logger.ERROR)
                 return None
             else:
@@ -142,12 +229,12 @@ class TVShow(object):
                 season = 1
                 episode = absolute_number
         
-        if not season in self.episodes:
-            self.episodes[season] = {}
+        seasonEps = self._getSeasonEpisodes(season)
 
-        ep = None
-        
-        if not episode in self.episodes[season] or self.episodes[season][episode] == None:
+        # hold on to the episode ourselves, once another thread's touch() evicts it nothing else might
+        ep = seasonEps.get(episode)
+
+        if ep == None:
             if noCreate:
                 return None
 
@@ -158,10 +245,41 @@ class TVShow(object):
             else:
                 ep = TVEpisode(self, season, episode)
 
-            if ep != None:
-                self.episodes[season][episode] = ep
-        
-        return self.episodes[season][episode]
+            seasonEps[episode] = ep
+
+        episode_cache.episodeCache.touch(ep)
+
+        return ep
+
+    def hydrateEpisodes(self, sqlResults, refresh=False, loadDescription=False):
+        """
+        Returns the episode objects for a list of tv_episodes rows of this show. Episodes that aren't
+        in memory yet are built straight from their row instead of being loaded one query at a time.
+
+        refresh: also update the episodes that were already in memory from their row
+        loadDescription: keep the descriptions from the rows instead of reading them when they're used
+        """
+
+        episodes = []
+
+        for curResult in sqlResults:
+            season = int(curResult["season"])
+            episode = int(curResult["episode"])
+
+            seasonEps = self._getSeasonEpisodes(season)
+
+            curEp = seasonEps.get(episode)
+
+            if curEp == None:
+                curEp = TVEpisode.fromDBRow(self, curResult, loadDescription)
+                seasonEps[episode] = curEp
+            elif refresh:
+                curEp.loadFromDBRow(curResult, season, episode, loadDescription)
+
+            episode_cache.episodeCache.touch(curEp)
+            episodes.append(curEp)
+
+        return episodes
 
     def writeShowNFO(self):
 
@@ -199,84 +317,217 @@ class TVShow(object):
         myDB = db.DBConnection()
         sqlResults = myDB.select("SELECT * FROM tv_episodes WHERE showid = ? AND location != ''", [self.tvdbid])
 
-        for epResult in sqlResults:
-            logger.log(str(self.tvdbid) + ": Retrieving/creating episode " + str(epResult["season"]) + "x" + str(epResult["episode"]), logger.DEBUG)
-            curEp = self.getEpisode(epResult["season"], epResult["episode"])
+        for curEp in self.hydrateEpisodes(sqlResults):
+            logger.log(str(self.tvdbid) + ": Retrieving/creating episode " + str(curEp.season) + "x" + str(curEp.episode), logger.DEBUG)
             curEp.createMetaFiles()
 
 
-    # find all media files in the show folder and create episodes for as many as possible
+    # find all media files in the show folder and create episodes for as many as possible, returns the files it found
     def loadEpisodesFromDir (self):
 
         if not ek.ek(os.path.isdir, self._location):
             logger.log(str(self.tvdbid) + ": Show dir doesn't exist, not loading episodes from disk")
-            return
+            return set()
 
         logger.log(str(self.tvdbid) + ": Loading all episodes from the show directory " + self._location)
 
         # get file list
         mediaFiles = helpers.listMediaFiles(self._location)
 
-        # create TVEpisodes from each media file (if possible)
-        for mediaFile in mediaFiles:
+        myDB = db.DBConnection()
+
+        # the size and mtime every file had when it was last parsed and what it was parsed to
+        fileIndex = {}
+        for curResult in myDB.select("SELECT path, size, mtime, season, episodes FROM file_index WHERE showid = ?", [self.tvdbid]):
+            fileIndex[_fileIndexPath(curResult["path"])] = curResult
+
+        epResults = myDB.select("SELECT * FROM tv_episodes WHERE showid = ?", [self.tvdbid])
+        epByNumber = dict([((int(x["season"]), int(x["episode"])), x) for x in epResults])
 
-            curEpisode = None
+        presentFiles = set()
+        changedFiles = []
 
-            logger.log(str(self.tvdbid) + ": Creating episode from " + mediaFile, logger.DEBUG)
+        for mediaFile in mediaFiles:
             try:
-                curEpisode = self.makeEpFromFile(os.path.join(self._location, mediaFile))
-            except (exceptions.ShowNotFoundException, exceptions.EpisodeNotFoundException), e:
-                logger.log(u"Episode "+mediaFile+" returned an exception: "+ex(e), logger.ERROR)
-            except exceptions.EpisodeDeletedException:
-                logger.log(u"The episode deleted itself when I tried making an object for it", logger.DEBUG)
+                fileStat = ek.ek(os.stat, mediaFile)
+            except OSError, e:
+                logger.log(u"Unable to check "+mediaFile+", skipping it: "+ex(e), logger.WARNING)
+                continue
 
-            # store the reference in the show
-            if curEpisode != None:
-                curEpisode.saveToDB()
+            indexPath = _fileIndexPath(mediaFile)
+            presentFiles.add(indexPath)
 
+            indexed = fileIndex.get(indexPath)
+            if indexed and indexed["size"] == fileStat.st_size and indexed["mtime"] == fileStat.st_mtime \
+                    and self._indexedFileIsCurrent(indexPath, indexed, epByNumber):
+                continue
 
-    def loadEpisodesFromDB(self):
+            changedFiles.append((mediaFile, fileStat))
 
-        logger.log(u"Loading all episodes from the DB")
+        logger.log(str(self.tvdbid) + ": " + str(len(changedFiles)) + " of " + str(len(mediaFiles)) + " files are new or changed", logger.DEBUG)
 
-        myDB = db.DBConnection()
-        sql = "SELECT * FROM tv_episodes WHERE showid = ?"
-        sqlResults = myDB.select(sql, [self.tvdbid])
+        # get all the episodes we already know about in one go so makeEpFromFile finds them in memory
+        if changedFiles:
+            self.hydrateEpisodes(epResults)
 
-        scannedEps = {}
+        indexQueries = []
 
-        ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
+        # parse all the file names in one go, with a lot of them that's shared out between processes
+        parseResults = helpers.parse_result_wrapper_many(self, [os.path.join(self._location, x[0]) for x in changedFiles])
 
-        if self.lang:
-            ltvdb_api_parms['language'] = self.lang
+        # create TVEpisodes from each media file (if possible)
+        for (mediaFile, fileStat), parseResult in zip(changedFiles, parseResults):
+            indexQuery = self._episodeFromFile(mediaFile, fileStat, parseResult)
+            if indexQuery:
+                indexQueries.append(indexQuery)
 
-        t = tvdb_api.Tvdb(**ltvdb_api_parms)
+        # files that are gone don't need to be remembered
+        for curPath in set(fileIndex) - presentFiles:
+            indexQueries.append(["DELETE FROM file_index WHERE showid = ? AND path = ?", [self.tvdbid, fileIndex[curPath]["path"]]])
 
-        cachedShow = t[self.tvdbid]
-        cachedSeasons = {}
+        if indexQueries:
+            myDB.mass_action(indexQueries)
 
-        for curResult in sqlResults:
+        return presentFiles
 
-            curSeason = int(curResult["season"])
-            curEpisode = int(curResult["episode"])
-            if curSeason not in cachedSeasons:
-                cachedSeasons[curSeason] = cachedShow[curSeason]
+    def _episodeFromFile(self, mediaFile, fileStat, parseResult=None):
+        """
+        Makes the episode for one media file in the show dir and returns the query that remembers the file
+        in file_index, or None if the file isn't an episode. parseResult is passed on to makeEpFromFile.
+        """
 
-            if not curSeason in scannedEps:
-                scannedEps[curSeason] = {}
+        curEpisode = None
 
-            logger.log(u"Loading episode "+str(curSeason)+"x"+str(curEpisode)+" from the DB", logger.DEBUG)
+        logger.log(str(self.tvdbid) + ": Creating episode from " + mediaFile, logger.DEBUG)
+        try:
+            curEpisode = self.makeEpFromFile(os.path.join(self._location, mediaFile), parseResult)
+        except (exceptions.ShowNotFoundException, exceptions.EpisodeNotFoundException), e:
+            logger.log(u"Episode "+mediaFile+" returned an exception: "+ex(e), logger.ERROR)
+        except exceptions.EpisodeDeletedException:
+            logger.log(u"The episode deleted itself when I tried making an object for it", logger.DEBUG)
 
-            try:
-                curEp = self.getEpisode(curSeason, curEpisode)
-                curEp.loadFromDB(curSeason, curEpisode)
-                curEp.loadFromTVDB(tvapi=t, cachedSeason=cachedSeasons[curSeason])
-                scannedEps[curSeason][curEpisode] = True
-            except exceptions.EpisodeDeletedException:
-                logger.log(u"Tried loading an episode from the DB that should have been deleted, skipping it", logger.DEBUG)
+        if curEpisode == None:
+            return None
+
+        # store the reference in the show
+        curEpisode.saveToDB()
+
+        episodes = ",".join([str(x.episode) for x in [curEpisode] + curEpisode.relatedEps])
+        return ["INSERT OR REPLACE INTO file_index (showid, path, size, mtime, season, episodes) VALUES (?,?,?,?,?,?)",
+                [self.tvdbid, _fileIndexPath(mediaFile), fileStat.st_size, fileStat.st_mtime, curEpisode.season, episodes]]
+
+    def _indexedFileIsCurrent(self, indexPath, indexed, epByNumber):
+        """
+        A file whose size and mtime haven't changed only needs parsing again if its episodes no longer
+        point to it, e.g. because the episodes were deleted and fetched from TVDB again.
+        """
+
+        for curEpisode in indexed["episodes"].split(","):
+            epResult = epByNumber.get((int(indexed["season"]), int(curEpisode)))
+            if not epResult or not epResult["location"]:
+                return False
+            if _fileIndexPath(epResult["location"]) != indexPath:
+                return False
+
+        return True
+
+    def clearFileIndex(self):
+        """
+        Makes the next rescan parse every file again, needed when something that changes how files
+        are parsed (anime, air by date) was changed
+        """
+
+        myDB = db.DBConnection()
+        myDB.action("DELETE FROM file_index WHERE showid = ?", [self.tvdbid])
+
+    def refreshFiles(self, paths):
+        """
+        Brings the episodes for just these files in the show dir up to date, for when we know exactly which
+        media or metadata files appeared, changed or went away. Anything outside the show dir is ignored.
+        """
+
+        if not ek.ek(os.path.isdir, self._location):
+            return False
+
+        showDir = ek.ek(os.path.normpath, self._location)
+
+        mediaFiles = []
+        goneFiles = set()
+        metaFiles = []
+
+        for curPath in paths:
+            if not ek.ek(os.path.normpath, curPath).startswith(showDir + os.sep):
                 continue
 
-        return scannedEps
+            if not helpers.isMediaFile(ek.ek(os.path.basename, curPath)):
+                metaFiles.append(curPath)
+                continue
+
+            try:
+                mediaFiles.append((curPath, ek.ek(os.stat, curPath)))
+            except OSError:
+                goneFiles.add(curPath)
+
+        logger.log(str(self.tvdbid) + ": Refreshing " + str(len(mediaFiles)) + " new or changed, " + str(len(goneFiles)) + " removed and " + str(len(metaFiles)) + " metadata files", logger.DEBUG)
+
+        myDB = db.DBConnection()
+
+        # new files first, a renamed file then takes its episode over before the old name is looked at
+        indexQueries = []
+        for mediaFile, fileStat in mediaFiles:
+            indexQuery = self._episodeFromFile(mediaFile, fileStat)
+            if indexQuery:
+                indexQueries.append(indexQuery)
+
+        for curPath in goneFiles:
+            indexQueries.append(["DELETE FROM file_index WHERE showid = ? AND path = ?", [self.tvdbid, _fileIndexPath(curPath)]])
+
+        if indexQueries:
+            myDB.mass_action(indexQueries)
+
+        if not goneFiles and not metaFiles:
+            return True
+
+        sqlResults = myDB.select("SELECT * FROM tv_episodes WHERE showid = ? AND location != ''", [self.tvdbid])
+
+        goneLocations = set([os.path.normpath(x) for x in goneFiles])
+        goneResults = [x for x in sqlResults if os.path.normpath(x["location"]) in goneLocations]
+        for curEp in self.hydrateEpisodes(goneResults):
+            if not ek.ek(os.path.isfile, curEp.location):
+                self._clearEpisodeLocation(curEp)
+
+        # metadata sits next to the episode file or in a metadata folder beside it and starts with its name
+        metaResults = []
+        for curResult in sqlResults:
+            epDir, epFile = os.path.split(os.path.normpath(curResult["location"]))
+            epName = os.path.splitext(epFile)[0]
+            for curPath in metaFiles:
+                metaDir, metaFile = os.path.split(os.path.normpath(curPath))
+                if metaFile.startswith(epName) and metaDir in (epDir, os.path.join(epDir, 'metadata')):
+                    metaResults.append(curResult)
+                    break
+
+        for curEp in self.hydrateEpisodes(metaResults):
+            with curEp.lock:
+                if curEp.checkForMetaFiles():
+                    curEp.saveToDB()
+
+        return True
+
+    def _clearEpisodeLocation(self, curEp):
+        """
+        Forgets the file of an episode whose file is gone
+        """
+
+        with curEp.lock:
+            # if it used to have a file associated with it and it doesn't anymore then set it to IGNORED
+            if curEp.location and curEp.status in Quality.DOWNLOADED:
+                logger.log(str(self.tvdbid) + ": Location for " + str(curEp.season) + "x" + str(curEp.episode) + " doesn't exist, removing it and changing our status to IGNORED", logger.DEBUG)
+                curEp.status = IGNORED
+            curEp.location = ''
+            curEp.hasnfo = False
+            curEp.hastbn = False
+            curEp.saveToDB()
 
 
     def loadEpisodesFromTVDB(self, cache=True):
@@ -302,6 +553,9 @@ class TVShow(object):
 
         scannedEps = {}
 
+        # the episodes that changed, they're written together once TVDB is done with
+        dirtyEps = []
+
         for season in showObj:
             scannedEps[season] = {}
             for episode in showObj[season]:
@@ -325,10 +579,18 @@ class TVShow(object):
                     logger.log(str(self.tvdbid) + ": Loading info from theTVDB for episode " + str(season) + "x" + str(episode), logger.DEBUG)
                     ep.loadFromTVDB(season, episode, tvapi=t)
                     if ep.dirty:
-                        ep.saveToDB()
+                        dirtyEps.append(ep)
 
                 scannedEps[season][episode] = True
 
+        # only hold the DB for the writes themselves, not for the TVDB and NFO reads
+        if dirtyEps:
+            myDB = db.DBConnection()
+            with myDB.transaction():
+                for curEp in dirtyEps:
+                    with curEp.lock:
+                        curEp.saveToDB()
+
         return scannedEps
 
     def setTVRID(self, force=False):
@@ -378,7 +640,12 @@ class TVShow(object):
 
 
     # make a TVEpisode object from a media file
-    def makeEpFromFile(self, file):
+    def makeEpFromFile(self, file, parse_result=None):
+        """
+        Makes (or updates) the episodes a media file in the show dir is for. The file name is parsed unless
+        the parse result for it is passed in as parse_result, an InvalidNameException from
+        parse_result_wrapper_many means it has been parsed already and couldn't be.
+        """
 
         if not ek.ek(os.path.isfile, file):
             logger.log(str(self.tvdbid) + ": That isn't even a real file dude... " + file)
@@ -386,12 +653,17 @@ class TVShow(object):
 
         logger.log(str(self.tvdbid) + ": Creating episode object from " + file, logger.DEBUG)
 
-        try:
-            parse_result = parse_result_wrapper(self,file)
-        except InvalidNameException:
+        if isinstance(parse_result, InvalidNameException):
             logger.log(u"tv: Unable to parse the filename "+file+" into a valid episode", logger.ERROR)
             return None
 
+        if not parse_result:
+            try:
+                parse_result = parse_result_wrapper(self,file)
+            except InvalidNameException:
+                logger.log(u"tv: Unable to parse the filename "+file+" into a valid episode", logger.ERROR)
+                return None
+
         if len(parse_result.episode_numbers) == 0 and not parse_result.air_by_date and not parse_result.is_anime:
             logger.log("parse_result: "+str(parse_result))
             logger.log(u"No episode number found in "+file+", ignoring it", logger.ERROR)
@@ -405,20 +677,10 @@ class TVShow(object):
         # if we have an air-by-date show then get the real season/episode numbers
         if parse_result.air_by_date:
             try:
-                # There's gotta be a better way of doing this but we don't wanna
-                # change the cache value elsewhere
-                ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
-
-                if self.lang:
-                    ltvdb_api_parms['language'] = self.lang
-
-                t = tvdb_api.Tvdb(**ltvdb_api_parms)
-
-                epObj = t[self.tvdbid].airedOn(parse_result.air_date)[0]
-                season = int(epObj["seasonnumber"])
-                episodes = [int(epObj["episodenumber"])]
+                season, episode = self.findEpisodeByAirdate(parse_result.air_date)
+                episodes = [episode]
             except tvdb_exceptions.tvdb_episodenotfound:
-                logger.log(u"Unable to find episode with date "+str(episodes[0])+" for show "+self.name+", skipping", logger.WARNING)
+                logger.log(u"Unable to find episode with date "+str(parse_result.air_date)+" for show "+self.name+", skipping", logger.WARNING)
                 return None
             except tvdb_exceptions.tvdb_error, e:
                 logger.log(u"Unable to contact TVDB: "+ex(e), logger.WARNING)
@@ -536,45 +798,52 @@ class TVShow(object):
             logger.log(str(self.tvdbid) + ": Unable to find the show in the database")
             return
         else:
-            if self.name == "":
-                self.name = sqlResults[0]["show_name"]
-            self.tvrname = sqlResults[0]["tvr_name"]
-            if self.network == "":
-                self.network = sqlResults[0]["network"]
-            if self.genre == "":
-                self.genre = sqlResults[0]["genre"]
-
-            self.runtime = sqlResults[0]["runtime"]
-
-            self.status = sqlResults[0]["status"]
-            if self.status == None:
-                self.status = ""
-            self.airs = sqlResults[0]["airs"]
-            if self.airs == None:
-                self.airs = ""
-            self.startyear = sqlResults[0]["startyear"]
-            if self.startyear == None:
-                self.startyear = 0
-
-            self.air_by_date = sqlResults[0]["air_by_date"]
-            if self.air_by_date == None:
-                self.air_by_date = 0
-
-            self.quality = int(sqlResults[0]["quality"])
-            self.seasonfolders = int(sqlResults[0]["seasonfolders"])
-            self.paused = int(sqlResults[0]["paused"])
-
-            self._location = sqlResults[0]["location"]
-
-            if self.tvrid == 0:
-                self.tvrid = int(sqlResults[0]["tvr_id"])
-
-            if self.lang == "":
-                self.lang = sqlResults[0]["lang"]
-            
-            self.anime = sqlResults[0]["anime"]
-            if self.anime == None:
-                self.anime = 0
+            self.loadFromDBRow(sqlResults[0])
+
+    def loadFromDBRow(self, sqlResult):
+        """
+        Fills in the show from a tv_shows row that has already been selected
+        """
+
+        if self.name == "":
+            self.name = sqlResult["show_name"]
+        self.tvrname = sqlResult["tvr_name"]
+        if self.network == "":
+            self.network = sqlResult["network"]
+        if self.genre == "":
+            self.genre = sqlResult["genre"]
+
+        self.runtime = sqlResult["runtime"]
+
+        self.status = sqlResult["status"]
+        if self.status == None:
+            self.status = ""
+        self.airs = sqlResult["airs"]
+        if self.airs == None:
+            self.airs = ""
+        self.startyear = sqlResult["startyear"]
+        if self.startyear == None:
+            self.startyear = 0
+
+        self.air_by_date = sqlResult["air_by_date"]
+        if self.air_by_date == None:
+            self.air_by_date = 0
+
+        self.quality = int(sqlResult["quality"])
+        self.seasonfolders = int(sqlResult["seasonfolders"])
+        self.paused = int(sqlResult["paused"])
+
+        self._location = sqlResult["location"]
+
+        if self.tvrid == 0:
+            self.tvrid = int(sqlResult["tvr_id"])
+
+        if self.lang == "":
+            self.lang = sqlResult["lang"]
+        
+        self.anime = sqlResult["anime"]
+        if self.anime == None:
+            self.anime = 0
 
 
     def loadFromTVDB(self, cache=True, tvapi=None, cachedSeason=None):
@@ -709,9 +978,16 @@ class TVShow(object):
         myDB = db.DBConnection()
         myDB.action("DELETE FROM tv_episodes WHERE showid = ?", [self.tvdbid])
         myDB.action("DELETE FROM tv_shows WHERE tvdb_id = ?", [self.tvdbid])
+        myDB.action("DELETE FROM file_index WHERE showid = ?", [self.tvdbid])
+        self.resetEpisodeStatus()
+        self.resetEpisodeNumbers()
 
         # remove self from show list
-        sickbeard.showList = [x for x in sickbeard.showList if x.tvdbid != self.tvdbid]
+        for curShow in [x for x in sickbeard.showList if x.tvdbid == self.tvdbid]:
+            sickbeard.showList.remove(curShow)
+        helpers.update_anime_support()
+
+        self.flushEpisodes()
         
         # clear the cache
         image_cache_dir = ek.ek(os.path.join, sickbeard.CACHE_DIR, 'images')
@@ -732,7 +1008,7 @@ class TVShow(object):
             return False
 
         # load from dir
-        self.loadEpisodesFromDir()
+        presentFiles = self.loadEpisodesFromDir()
 
         # run through all locations from DB, check that they exist
         logger.log(str(self.tvdbid) + ": Loading all episodes with a location from the database")
@@ -740,29 +1016,15 @@ class TVShow(object):
         myDB = db.DBConnection()
         sqlResults = myDB.select("SELECT * FROM tv_episodes WHERE showid = ? AND location != ''", [self.tvdbid])
 
-        for ep in sqlResults:
-            curLoc = os.path.normpath(ep["location"])
-            season = int(ep["season"])
-            episode = int(ep["episode"])
+        # the files we just found in the show dir are there, no need to look for them again
+        sqlResults = [x for x in sqlResults if os.path.normpath(x["location"]) not in presentFiles]
 
-            try:
-                curEp = self.getEpisode(season, episode)
-            except exceptions.EpisodeDeletedException:
-                logger.log(u"The episode was deleted while we were refreshing it, moving on to the next one", logger.DEBUG)
-                continue
+        for ep, curEp in zip(sqlResults, self.hydrateEpisodes(sqlResults)):
+            curLoc = os.path.normpath(ep["location"])
 
             # if the path doesn't exist or if it's not in our show dir
             if not ek.ek(os.path.isfile, curLoc) or not os.path.normpath(curLoc).startswith(os.path.normpath(self.location)):
-
-                with curEp.lock:
-                    # if it used to have a file associated with it and it doesn't anymore then set it to IGNORED
-                    if curEp.location and curEp.status in Quality.DOWNLOADED:
-                        logger.log(str(self.tvdbid) + ": Location for " + str(season) + "x" + str(episode) + " doesn't exist, removing it and changing our status to IGNORED", logger.DEBUG)
-                        curEp.status = IGNORED
-                    curEp.location = ''
-                    curEp.hasnfo = False
-                    curEp.hastbn = False
-                    curEp.saveToDB()
+                self._clearEpisodeLocation(curEp)
 
 
 
@@ -791,6 +1053,8 @@ class TVShow(object):
             else:
                 fileLocations[goodLoc] = [(goodSeason, goodEpisode)]
 
+        episodes = dict([((x.season, x.episode), x) for x in self.hydrateEpisodes(sqlResults)])
+
         logger.log(u"File results: " + str(fileLocations), logger.DEBUG)
 
         for curLocation in fileLocations:
@@ -800,7 +1064,7 @@ class TVShow(object):
             # get the root episode and add all related episodes to it
             rootEp = None
             for myEp in epList:
-                curEp = self.getEpisode(myEp[0], myEp[1])
+                curEp = episodes[myEp]
                 if rootEp == None:
                     rootEp = curEp
                     rootEp.relatedEps = []
@@ -842,8 +1106,6 @@ class TVShow(object):
 
         logger.log(str(self.tvdbid) + ": Saving show info to database", logger.DEBUG)
 
-        myDB = db.DBConnection()
-
         controlValueDict = {"tvdb_id": self.tvdbid}
         newValueDict = {"show_name": self.name,
                         "tvr_id": self.tvrid,
@@ -863,9 +1125,12 @@ class TVShow(object):
                         "anime": self.anime
                         }
 
-        myDB.upsert("tv_shows", newValueDict, controlValueDict)
+        db.writeQueue.upsert("tv_shows", newValueDict, controlValueDict)
         helpers.update_anime_support()
 
+        # the ids or names may have changed so the show list's indexes need updating
+        sickbeard.showList.reindex(self)
+
 
     def __str__(self):
         toReturn = ""
@@ -885,6 +1150,163 @@ class TVShow(object):
         return toReturn
 
 
+    def getEpisodeStatus(self, season, episode):
+        """
+        Returns the status the episode has in the DB or None if it isn't there. The answer comes from
+        memory unless DB_EPISODE_STATUS_CACHE is turned off.
+        """
+
+        if not sickbeard.DB_EPISODE_STATUS_CACHE:
+            myDB = db.DBConnection()
+            sqlResults = myDB.select("SELECT status FROM tv_episodes WHERE showid = ? AND season = ? AND episode = ?", [self.tvdbid, season, episode])
+            if not sqlResults:
+                return None
+            return int(sqlResults[0]["status"])
+
+        statusMap = self._episodeStatus
+
+        # the DB is read without holding our lock since a thread saving an episode might hold the DB lock,
+        # if an episode changed in the meantime the result is stale and the next call tries again
+        if statusMap == None:
+            changesBefore = self._episodeStatusChanges
+
+            myDB = db.DBConnection()
+            sqlResults = myDB.select("SELECT season, episode, status FROM tv_episodes WHERE showid = ?", [self.tvdbid])
+            statusMap = dict([((int(x["season"]), int(x["episode"])), int(x["status"])) for x in sqlResults])
+
+            with self._episodeStatusLock:
+                if self._episodeStatus == None and self._episodeStatusChanges == changesBefore:
+                    self._episodeStatus = statusMap
+
+        return statusMap.get((int(season), int(episode)))
+
+    def setEpisodeStatus(self, season, episode, status):
+        """
+        Keeps the in-memory status of an episode in sync with the DB, a status of None means it was deleted
+        """
+
+        with self._episodeStatusLock:
+            self._episodeStatusChanges += 1
+
+            if self._episodeStatus == None:
+                return
+
+            if status == None:
+                self._episodeStatus.pop((int(season), int(episode)), None)
+            else:
+                self._episodeStatus[(int(season), int(episode))] = int(status)
+
+    def primeEpisodeStatus(self, statusMap):
+        """
+        Fills in the in-memory statuses from somewhere other than the DB, the startup snapshot
+        """
+
+        with self._episodeStatusLock:
+            if self._episodeStatus == None:
+                self._episodeStatus = statusMap
+
+    def resetEpisodeStatus(self):
+        """
+        Forgets the in-memory statuses, needed after the DB was changed without going through TVEpisode
+        """
+
+        with self._episodeStatusLock:
+            self._episodeStatusChanges += 1
+            self._episodeStatus = None
+
+    def _getEpisodeNumbers(self):
+        """
+        Returns the episode number index: {'episodes': (season, episode) -> (airdate, absolute number),
+        'airdate': ordinal -> [(season, episode), ...], 'absolute': number -> [(season, episode), ...]}.
+        It's built like the status map, the lists in it are replaced rather than changed.
+        """
+
+        index = self._episodeNumbers
+
+        if index == None:
+            changesBefore = self._episodeNumbersChanges
+
+            myDB = db.DBConnection()
+            sqlResults = myDB.select("SELECT season, episode, airdate, absolute_number FROM tv_episodes WHERE showid = ?", [self.tvdbid])
+
+            index = {'episodes': {}, 'airdate': {}, 'absolute': {}}
+            for curResult in sqlResults:
+                _indexEpisodeNumbers(index, (int(curResult["season"]), int(curResult["episode"])), int(curResult["airdate"] or 0), int(curResult["absolute_number"] or 0))
+
+            with self._episodeNumbersLock:
+                if self._episodeNumbers == None and self._episodeNumbersChanges == changesBefore:
+                    self._episodeNumbers = index
+
+        return index
+
+    def getEpisodesByAirdate(self, airdate):
+        """
+        Returns [(season, episode), ...] for the episodes in the DB that aired on the given date, specials last
+        """
+
+        return self._getEpisodeNumbers()['airdate'].get(airdate.toordinal(), [])
+
+    def getEpisodesByAbsoluteNumber(self, absolute_number):
+        """
+        Returns [(season, episode), ...] for the episodes in the DB with this absolute number, specials aren't included
+        """
+
+        return self._getEpisodeNumbers()['absolute'].get(int(absolute_number), [])
+
+    def findEpisodeByAirdate(self, airdate):
+        """
+        Returns (season, episode) for an air-by-date release. TVDB is only asked when the DB doesn't know
+        the date (an episode newer than our last update), its exceptions are passed on.
+        """
+
+        numbers = self.getEpisodesByAirdate(airdate)
+        if numbers:
+            return numbers[0]
+
+        logger.log(str(self.tvdbid) + ": No episode aired on " + str(airdate) + " in the DB, asking TVDB", logger.DEBUG)
+
+        # There's gotta be a better way of doing this but we don't wanna
+        # change the language value elsewhere
+        ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
+
+        if self.lang and self.lang != 'en':
+            ltvdb_api_parms['language'] = self.lang
+
+        t = tvdb_api.Tvdb(**ltvdb_api_parms)
+        epObj = t[self.tvdbid].airedOn(airdate)[0]
+
+        return (int(epObj["seasonnumber"]), int(epObj["episodenumber"]))
+
+    def setEpisodeNumbers(self, season, episode, airdate, absolute_number):
+        """
+        Keeps the episode number index in sync with the DB, an airdate of None means the episode was deleted
+        """
+
+        key = (int(season), int(episode))
+
+        with self._episodeNumbersLock:
+            self._episodeNumbersChanges += 1
+
+            index = self._episodeNumbers
+            if index == None:
+                return
+
+            if airdate != None and index['episodes'].get(key) == (int(airdate), int(absolute_number or 0)):
+                return
+
+            _unindexEpisodeNumbers(index, key)
+            if airdate != None:
+                _indexEpisodeNumbers(index, key, int(airdate), int(absolute_number or 0))
+
+    def resetEpisodeNumbers(self):
+        """
+        Forgets the episode number index, it's built again the next time it's used
+        """
+
+        with self._episodeNumbersLock:
+            self._episodeNumbersChanges += 1
+            self._episodeNumbers = None
+
     def wantEpisode(self, season, episode, quality, manualSearch=False):
 
         logger.log(u"Checking if we want episode "+str(season)+"x"+str(episode)+" at quality "+Quality.qualityStrings[quality], logger.DEBUG)
@@ -897,15 +1319,12 @@ class TVShow(object):
             logger.log(u"I know for sure I don't want this episode, saying no", logger.DEBUG)
             return False
 
-        myDB = db.DBConnection()
-        sqlResults = myDB.select("SELECT status FROM tv_episodes WHERE showid = ? AND season = ? AND episode = ?", [self.tvdbid, season, episode])
+        epStatus = self.getEpisodeStatus(season, episode)
 
-        if not sqlResults or not len(sqlResults):
+        if epStatus == None:
             logger.log(u"Unable to find the episode", logger.DEBUG)
             return False
 
-        epStatus = int(sqlResults[0]["status"])
-
         logger.log(u"current episode status: "+str(epStatus), logger.DEBUG)
 
         # if we know we don't want it then just say no
@@ -965,6 +1384,52 @@ class TVShow(object):
             else:
                 return Overview.GOOD
 
+def statusFromTVDB(status, airdate, location):
+    """
+    Returns the status an episode gets once its air date is known, going by the status it had and
+    whether its file (location) exists
+    """
+
+    if not ek.ek(os.path.isfile, location):
+
+        # if we don't have the file
+        if airdate >= datetime.date.today() and status not in Quality.SNATCHED + Quality.SNATCHED_PROPER:
+            # and it hasn't aired yet set the status to UNAIRED
+            logger.log(u"Episode airs in the future, changing status from " + str(status) + " to " + str(UNAIRED), logger.DEBUG)
+            status = UNAIRED
+        # if there's no airdate then set it to skipped (and respect ignored)
+        elif airdate == datetime.date.fromordinal(1):
+            if status == IGNORED:
+                logger.log(u"Episode has no air date, but it's already marked as ignored", logger.DEBUG)
+            else:
+                logger.log(u"Episode has no air date, automatically marking it skipped", logger.DEBUG)
+                status = SKIPPED
+        # if we don't have the file and the airdate is in the past
+        else:
+            if status == UNAIRED:
+                status = WANTED
+
+            # if we somehow are still UNKNOWN then just skip it
+            elif status == UNKNOWN:
+                status = SKIPPED
+
+            else:
+                logger.log(u"Not touching status because we have no ep file, the airdate is in the past, and the status is "+str(status), logger.DEBUG)
+
+    # if we have a media file then it's downloaded
+    elif sickbeard.helpers.isMediaFile(location):
+        # leave propers alone, you have to either post-process them or manually change them back
+        if status not in Quality.SNATCHED_PROPER + Quality.DOWNLOADED + Quality.SNATCHED + [ARCHIVED]:
+            logger.log(u"5 Status changes from " + str(status) + " to " + str(Quality.statusFromName(location)), logger.DEBUG)
+            status = Quality.statusFromName(location)
+
+    # shouldn't get here probably
+    else:
+        logger.log(u"6 Status changes from " + str(status) + " to " + str(UNKNOWN), logger.DEBUG)
+        status = UNKNOWN
+
+    return status
+
 def dirty_setter(attr_name):
     def wrapper(self, val):
         if getattr(self, attr_name) != val:
@@ -972,10 +1437,26 @@ def dirty_setter(attr_name):
             self.dirty = True
     return wrapper
 
+# used to create the episode locks on demand without two threads each making their own
+_episodeLockLock = threading.Lock()
+
 class TVEpisode(object):
 
+    # a large library keeps a lot of these around so they don't get a __dict__, the shows only hold weak references
+    __slots__ = ("_name", "_season", "_episode", "_absolute_number", "_description", "_airdate",
+                 "_hasnfo", "_hastbn", "_status", "_tvdbid", "_location", "_lock",
+                 "dirty", "show", "relatedEps", "__weakref__")
+
     def __init__(self, show, season, episode, file=""):
 
+        self._initFields(show, season, episode, file)
+
+        self.specifyEpisode(self.season, self.episode)
+
+        self.checkForMetaFiles()
+
+    def _initFields(self, show, season, episode, file=""):
+
         self._name = ""
         self._season = season
         self._episode = episode
@@ -993,19 +1474,44 @@ class TVEpisode(object):
         self.show = show
         self._location = file
 
-        self.lock = threading.Lock()
-
-        self.specifyEpisode(self.season, self.episode)
+        # most episodes are never locked so the lock is only made when someone asks for it
+        self._lock = None
 
         self.relatedEps = []
 
-        self.checkForMetaFiles()
+    def _getLock(self):
+        if self._lock == None:
+            with _episodeLockLock:
+                if self._lock == None:
+                    self._lock = threading.Lock()
+        return self._lock
+
+    def isLocked(self):
+        return self._lock != None and self._lock.locked()
+
+    # episodes built from a DB row leave the description in the DB (None) until it's used
+    def _getDescription(self):
+        if self._description == None:
+            myDB = db.DBConnection()
+            sqlResults = myDB.select("SELECT description FROM tv_episodes WHERE showid = ? AND season = ? AND episode = ?", [self.show.tvdbid, self.season, self.episode])
+            if sqlResults and sqlResults[0]["description"] != None:
+                self._description = sqlResults[0]["description"]
+            else:
+                self._description = ""
+        return self._description
 
+    def _setDescription(self, val):
+        # comparing with a description that was never loaded would cost a select, just take the new one
+        if self._description == None or self._description != val:
+            self._description = val
+            self.dirty = True
+
+    lock = property(_getLock)
     name = property(lambda self: self._name, dirty_setter("_name"))
     season = property(lambda self: self._season, dirty_setter("_season"))
     episode = property(lambda self: self._episode, dirty_setter("_episode"))
     absolute_number = property(lambda self: self._absolute_number, dirty_setter("_absolute_number"))
-    description = property(lambda self: self._description, dirty_setter("_description"))
+    description = property(_getDescription, _setDescription)
     airdate = property(lambda self: self._airdate, dirty_setter("_airdate"))
     hasnfo = property(lambda self: self._hasnfo, dirty_setter("_hasnfo"))
     hastbn = property(lambda self: self._hastbn, dirty_setter("_hastbn"))
@@ -1081,7 +1587,9 @@ class TVEpisode(object):
         useInfoFromDB = False
         if self.show.is_anime and len(sqlResults) == 0 :
             logger.log(str(self.show.tvdbid) + ": Loading episode details from DB for absolute number " + str(episode), logger.DEBUG)
-            sqlResults = myDB.select("SELECT * FROM tv_episodes WHERE showid = ? AND season != 0 AND absolute_number = ?", [self.show.tvdbid, episode])
+            sqlResults = []
+            for curSeason, curEpisode in self.show.getEpisodesByAbsoluteNumber(episode):
+                sqlResults += myDB.select("SELECT * FROM tv_episodes WHERE showid = ? AND season = ? AND episode = ?", [self.show.tvdbid, curSeason, curEpisode])
             useInfoFromDB = True
             
         if len(sqlResults) > 1:
@@ -1090,33 +1598,70 @@ class TVEpisode(object):
             logger.log(str(self.show.tvdbid) + ": Episode " + str(self.season) + "x" + str(self.episode) + " not found in the database", logger.DEBUG)
             return False
         else:
-            #NAMEIT logger.log(u"AAAAA from" + str(self.season)+"x"+str(self.episode) + " -" + self.name + " to " + str(sqlResults[0]["name"]))
-            if sqlResults[0]["name"] != None:
-                self.name = sqlResults[0]["name"]
-            # if 
             if not useInfoFromDB:
-                self.season = season
-                self.episode = episode
+                self.loadFromDBRow(sqlResults[0], season, episode)
+            else:
+                self.loadFromDBRow(sqlResults[0])
+            return True
+
+    def loadFromDBRow(self, sqlResult, season=None, episode=None, loadDescription=True):
+        """
+        Fills in the episode from a tv_episodes row that has already been selected. The season and
+        episode are taken from the row unless they're given.
+
+        loadDescription: keep the description from the row, otherwise it's read from the DB when it's used
+        """
+
+        #NAMEIT logger.log(u"AAAAA from" + str(self.season)+"x"+str(self.episode) + " -" + self.name + " to " + str(sqlResult["name"]))
+        if sqlResult["name"] != None:
+            self.name = sqlResult["name"]
+
+        if season == None or episode == None:
+            self.season = int(sqlResult["season"])
+            self.episode = int(sqlResult["episode"])
+        else:
+            self.season = season
+            self.episode = episode
+        # TODO: refactor db
+        self.absolute_number = sqlResult["absolute_number"]
+        if loadDescription:
+            if sqlResult["description"] != None:
+                self.description = sqlResult["description"]
             else:
-                self.season = sqlResults[0]["season"]
-                self.episode = sqlResults[0]["episode"]
-            # TODO: refactor db
-            self.absolute_number = sqlResults[0]["absolute_number"]    
-            self.description = sqlResults[0]["description"]
-            if self.description == None:
                 self.description = ""
-            self.airdate = datetime.date.fromordinal(int(sqlResults[0]["airdate"]))
-            #logger.log(u"1 Status changes from " + str(self.status) + " to " + str(sqlResults[0]["status"]), logger.DEBUG)
-            self.status = int(sqlResults[0]["status"])
+        else:
+            self._description = None
+        self.airdate = datetime.date.fromordinal(int(sqlResult["airdate"]))
+        #logger.log(u"1 Status changes from " + str(self.status) + " to " + str(sqlResult["status"]), logger.DEBUG)
+        self.status = int(sqlResult["status"])
 
-            # don't overwrite my location
-            if sqlResults[0]["location"] != "" and sqlResults[0]["location"] != None:
-                self.location = os.path.normpath(sqlResults[0]["location"])
+        # don't overwrite my location
+        if sqlResult["location"] != "" and sqlResult["location"] != None:
+            self.location = os.path.normpath(sqlResult["location"])
 
-            self.tvdbid = int(sqlResults[0]["tvdbid"])
+        self.tvdbid = int(sqlResult["tvdbid"])
 
-            self.dirty = False
-            return True
+        self.dirty = False
+
+    @classmethod
+    def fromDBRow(cls, show, sqlResult, loadDescription=False):
+        """
+        Builds an episode straight from its tv_episodes row. Unlike the constructor this doesn't go
+        back to the DB, the NFO or TVDB, so a whole show can be loaded from a single select.
+        """
+
+        ep = cls.__new__(cls)
+        ep._initFields(show, int(sqlResult["season"]), int(sqlResult["episode"]))
+        ep._description = None
+
+        ep.loadFromDBRow(sqlResult, loadDescription=loadDescription)
+
+        # the meta file flags were checked when the row was saved, callers that care check them again
+        ep._hasnfo = bool(sqlResult["hasnfo"])
+        ep._hastbn = bool(sqlResult["hastbn"])
+
+        ep.dirty = False
+        return ep
 
 
     def loadFromTVDB(self, season=None, episode=None, cache=True, tvapi=None, cachedSeason=None):
@@ -1213,43 +1758,7 @@ class TVEpisode(object):
 
         logger.log(str(self.show.tvdbid) + ": Setting status for " + str(season) + "x" + str(episode) + " based on status " + str(self.status) + " and existence of " + self.location, logger.DEBUG)
 
-        if not ek.ek(os.path.isfile, self.location):
-
-            # if we don't have the file
-            if self.airdate >= datetime.date.today() and self.status not in Quality.SNATCHED + Quality.SNATCHED_PROPER:
-                # and it hasn't aired yet set the status to UNAIRED
-                logger.log(u"Episode airs in the future, changing status from " + str(self.status) + " to " + str(UNAIRED), logger.DEBUG)
-                self.status = UNAIRED
-            # if there's no airdate then set it to skipped (and respect ignored)
-            elif self.airdate == datetime.date.fromordinal(1):
-                if self.status == IGNORED:
-                    logger.log(u"Episode has no air date, but it's already marked as ignored", logger.DEBUG)
-                else:
-                    logger.log(u"Episode has no air date, automatically marking it skipped", logger.DEBUG)
-                    self.status = SKIPPED
-            # if we don't have the file and the airdate is in the past
-            else:
-                if self.status == UNAIRED:
-                    self.status = WANTED
-
-                # if we somehow are still UNKNOWN then just skip it
-                elif self.status == UNKNOWN:
-                    self.status = SKIPPED
-
-                else:
-                    logger.log(u"Not touching status because we have no ep file, the airdate is in the past, and the status is "+str(self.status), logger.DEBUG)
-
-        # if we have a media file then it's downloaded
-        elif sickbeard.helpers.isMediaFile(self.location):
-            # leave propers alone, you have to either post-process them or manually change them back
-            if self.status not in Quality.SNATCHED_PROPER + Quality.DOWNLOADED + Quality.SNATCHED + [ARCHIVED]:
-                logger.log(u"5 Status changes from " + str(self.status) + " to " + str(Quality.statusFromName(self.location)), logger.DEBUG)
-                self.status = Quality.statusFromName(self.location)
-
-        # shouldn't get here probably
-        else:
-            logger.log(u"6 Status changes from " + str(self.status) + " to " + str(UNKNOWN), logger.DEBUG)
-            self.status = UNKNOWN
+        self.status = statusFromTVDB(self.status, self.airdate, self.location)
 
 
         # hasnfo, hastbn, status?
@@ -1371,13 +1880,16 @@ class TVEpisode(object):
         # remove myself from the show dictionary
         if self.show.getEpisode(self.season, self.episode, noCreate=True) == self:
             logger.log(u"Removing myself from my show's list", logger.DEBUG)
-            del self.show.episodes[self.season][self.episode]
+            self.show.episodes.get(self.season, {}).pop(self.episode, None)
+            episode_cache.episodeCache.remove(self)
 
         # delete myself from the DB
         logger.log(u"Deleting myself from the database", logger.DEBUG)
         myDB = db.DBConnection()
         sql = "DELETE FROM tv_episodes WHERE showid="+str(self.show.tvdbid)+" AND season="+str(self.season)+" AND episode="+str(self.episode)
         myDB.action(sql)
+        self.show.setEpisodeStatus(self.season, self.episode, None)
+        self.show.setEpisodeNumbers(self.season, self.episode, None, None)
 
         raise exceptions.EpisodeDeletedException()
 
@@ -1390,22 +1902,29 @@ class TVEpisode(object):
 
         logger.log(u"STATUS IS " + str(self.status), logger.DEBUG)
 
-        myDB = db.DBConnection()
         newValueDict = {"tvdbid": self.tvdbid,
                         "name": self.name,
-                        "description": self.description,
                         "airdate": self.airdate.toordinal(),
                         "hasnfo": self.hasnfo,
                         "hastbn": self.hastbn,
                         "status": self.status,
                         "location": self.location,
                         "absolute_number": self.absolute_number}
+
+        # a description that was never loaded is still what's in the DB
+        if self._description != None:
+            newValueDict["description"] = self._description
         controlValueDict = {"showid": self.show.tvdbid,
                             "season": self.season,
                             "episode": self.episode}
 
-        # use a custom update/insert method to get the data into the DB
-        myDB.upsert("tv_episodes", newValueDict, controlValueDict)
+        # use a custom update/insert method to get the data into the DB, it may be queued and merged with later saves
+        db.writeQueue.upsert("tv_episodes", newValueDict, controlValueDict)
+        self.show.setEpisodeStatus(self.season, self.episode, self.status)
+        self.show.setEpisodeNumbers(self.season, self.episode, self.airdate.toordinal(), self.absolute_number)
+
+        # what we have now matches the DB (or the write queue) so the episode can be dropped from memory
+        self.dirty = False
 
 
     def fullPath (self):
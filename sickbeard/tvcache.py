@@ -18,7 +18,6 @@
 
 import time
 import datetime
-import sqlite3
 
 import sickbeard
 
@@ -41,26 +40,9 @@ from sickbeard.helpers import parse_result_wrapper
 class CacheDBConnection(db.DBConnection):
 
     def __init__(self, providerName):
+        # the provider_cache and lastUpdate tables are created by the cache_db migrations at startup
         db.DBConnection.__init__(self, "cache.db")
 
-        # Create the table if it's not already there
-        try:
-            sql = "CREATE TABLE "+providerName+" (name TEXT, season NUMERIC, episodes TEXT, tvrid NUMERIC, tvdbid NUMERIC, url TEXT, time NUMERIC, quality TEXT);"
-            self.connection.execute(sql)
-            self.connection.commit()
-        except sqlite3.OperationalError, e:
-            if e.message != "table "+providerName+" already exists":
-                raise
-
-        # Create the table if it's not already there
-        try:
-            sql = "CREATE TABLE lastUpdate (provider TEXT, time NUMERIC);"
-            self.connection.execute(sql)
-            self.connection.commit()
-        except sqlite3.OperationalError, e:
-            if e.message != "table lastUpdate already exists":
-                raise
-
 class TVCache():
 
     def __init__(self, provider):
@@ -77,7 +59,8 @@ class TVCache():
 
         myDB = self._getDB()
 
-        myDB.action("DELETE FROM "+self.providerID+" WHERE 1")
+        myDB.mass_action([["DELETE FROM provider_cache_episodes WHERE cache_id IN (SELECT cache_id FROM provider_cache WHERE provider = ?)", [self.providerID]],
+                          ["DELETE FROM provider_cache WHERE provider = ?", [self.providerID]]])
 
     def _getRSSData(self):
 
@@ -123,17 +106,40 @@ class TVCache():
             logger.log(u"Resulting XML from "+self.provider.name+" isn't RSS, not parsing it", logger.ERROR)
             return []
 
+        cacheEntries = []
+
         for item in items:
 
-            self._parseItem(item)
+            curEntry = self._parseItem(item)
+            if curEntry:
+                cacheEntries.append(curEntry)
+
+        if cacheEntries:
+            self._writeCacheEntries(cacheEntries)
+
+    def _writeCacheEntries(self, cacheEntries):
+        """
+        Writes the entries returned by _addCacheEntry to the cache in a single transaction, each
+        entry's episodes are linked to the row id its provider_cache row was given
+        """
+
+        myDB = self._getDB()
+
+        with myDB.transaction():
+            for cacheValues, cacheEpisodes in cacheEntries:
+                cacheID = myDB.action("INSERT INTO provider_cache (provider, name, season, tvrid, tvdbid, url, time, quality) VALUES (?,?,?,?,?,?,?,?)",
+                                      cacheValues).lastrowid
+
+                for season, episode in cacheEpisodes:
+                    myDB.action("INSERT INTO provider_cache_episodes (cache_id, season, episode) VALUES (?,?,?)", [cacheID, season, episode])
 
     def _translateLinkURL(self, url):
         return url.replace('&amp;','&')
 
 
     def _parseItem(self, item):
-        """Return None
-        parse a single rss feed item and add its info to the chache
+        """Return None|(cache row values, [(season, episode), ...])
+        parse a single rss feed item and return the cache entry for it (see _addCacheEntry)
         will check for needed infos
         """
         title = item.findtext('title')
@@ -150,7 +156,7 @@ class TVCache():
 
         logger.log(u"Adding item from RSS to cache: "+title, logger.DEBUG)
 
-        self._addCacheEntry(title, url)
+        return self._addCacheEntry(title, url)
 
     def _getLastUpdate(self):
         myDB = self._getDB()
@@ -184,13 +190,13 @@ class TVCache():
         return True
 
     def _addCacheEntry(self, name, url, season=None, episodes=None, tvdb_id=0, tvrage_id=0, quality=None, extraNames=[]):
-        """Return False|None
+        """Return False|(cache row values, [(season, episode), ...])
         Parse the name and try to get as much info out of it as we can
         Will use anime regex's if this is called from fanzub
-        On a succesfull parse it will add the parsed infos into the cache.db
+        On a succesfull parse it will return the values of the provider_cache row and the episodes it's for,
+        the caller is responsible for writing them (updateCache batches them all in one transaction with _writeCacheEntries)
         This dosen't mean the parsed result is usefull
         """
-        myDB = self._getDB()
 
         parse_result = None
         
@@ -256,6 +262,13 @@ class TVCache():
                     logger.log(u"Cache lookup found "+repr(tvdb_id)+", using that", logger.DEBUG)
                     from_cache = True
                 
+                # the show list knows the scene names of all our shows
+                if tvdb_id == None:
+                    nameResults = sickbeard.showList.getByName(parse_result.series_name)
+                    if len(nameResults) == 1:
+                        logger.log(parse_result.series_name+" was found to be show "+nameResults[0].name+" ("+str(nameResults[0].tvdbid)+") in our show list.", logger.DEBUG)
+                        tvdb_id = nameResults[0].tvdbid
+
                 # if the cache failed, try looking up the show name in the database
                 if tvdb_id == None:
                     logger.log(u"Trying to look the show up in the show database", logger.DEBUG)
@@ -298,17 +311,22 @@ class TVCache():
         # if we have an air-by-date show then get the real season/episode numbers
         if parse_result.air_by_date and tvdb_id:
             try:
-                # There's gotta be a better way of doing this but we don't wanna
-                # change the language value elsewhere
-                ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
+                showObj = helpers.findCertainShow(sickbeard.showList, tvdb_id)
+                if showObj:
+                    season, episode = showObj.findEpisodeByAirdate(parse_result.air_date)
+                    episodes = [episode]
+                else:
+                    # There's gotta be a better way of doing this but we don't wanna
+                    # change the language value elsewhere
+                    ltvdb_api_parms = sickbeard.TVDB_API_PARMS.copy()
 
-                if not (tvdb_lang == "" or tvdb_lang == "en" or tvdb_lang == None):
-                    ltvdb_api_parms['language'] = tvdb_lang
+                    if not (tvdb_lang == "" or tvdb_lang == "en" or tvdb_lang == None):
+                        ltvdb_api_parms['language'] = tvdb_lang
 
-                t = tvdb_api.Tvdb(**ltvdb_api_parms)
-                epObj = t[tvdb_id].airedOn(parse_result.air_date)[0]
-                season = int(epObj["seasonnumber"])
-                episodes = [int(epObj["episodenumber"])]
+                    t = tvdb_api.Tvdb(**ltvdb_api_parms)
+                    epObj = t[tvdb_id].airedOn(parse_result.air_date)[0]
+                    season = int(epObj["seasonnumber"])
+                    episodes = [int(epObj["episodenumber"])]
             except tvdb_exceptions.tvdb_episodenotfound:
                 logger.log(u"Unable to find episode with date "+str(parse_result.air_date)+" for show "+parse_result.series_name+", skipping", logger.WARNING)
                 return False
@@ -328,16 +346,14 @@ class TVCache():
             else:
                 logger.log(u""+str(name)+" was matched to the show "+str(curShow.name)+" as an anime but the show is not marked as an anime", logger.WARNING)
 
-        episodeText = "|"+"|".join(map(str, episodes))+"|"
-
         # get the current timestamp
         curTimestamp = int(time.mktime(datetime.datetime.today().timetuple()))
 
         if not quality:
             quality = Quality.nameQuality(name, parse_result.is_anime)
 
-        myDB.action("INSERT INTO "+self.providerID+" (name, season, episodes, tvrid, tvdbid, url, time, quality) VALUES (?,?,?,?,?,?,?,?)",
-                    [name, season, episodeText, tvrage_id, tvdb_id, url, curTimestamp, quality])
+        return ([self.providerID, name, season, tvrage_id, tvdb_id, url, curTimestamp, quality],
+                [(season, cur_episode) for cur_episode in episodes])
 
 
     def searchCache(self, episode, manualSearch=False):
@@ -348,13 +364,13 @@ class TVCache():
 
         myDB = self._getDB()
 
-        sql = "SELECT * FROM "+self.providerID+" WHERE name LIKE '%.PROPER.%' OR name LIKE '%.REPACK.%'"
+        sql = "SELECT * FROM provider_cache WHERE provider = ? AND (name LIKE '%.PROPER.%' OR name LIKE '%.REPACK.%')"
 
         if date != None:
             sql += " AND time >= "+str(int(time.mktime(date.timetuple())))
 
         #return filter(lambda x: x['tvdbid'] != 0, myDB.select(sql))
-        return myDB.select(sql)
+        return myDB.select(sql, [self.providerID])
 
     def findNeededEpisodes(self, episode = None, manualSearch=False):
         neededEps = {}
@@ -364,10 +380,19 @@ class TVCache():
 
         myDB = self._getDB()
 
+        # multi-ep results are ignored for now: a full listing only uses their first episode and
+        # an episode search only matches results which contain nothing but that episode
         if not episode:
-            sqlResults = myDB.select("SELECT * FROM "+self.providerID)
+            sqlResults = myDB.select("SELECT provider_cache.*, MIN(provider_cache_episodes.episode) AS episode FROM provider_cache"
+                                     " JOIN provider_cache_episodes ON provider_cache_episodes.cache_id = provider_cache.cache_id"
+                                     " WHERE provider_cache.provider = ? GROUP BY provider_cache.cache_id", [self.providerID])
         else:
-            sqlResults = myDB.select("SELECT * FROM "+self.providerID+" WHERE tvdbid = ? AND season = ? AND episodes LIKE ?", [episode.show.tvdbid, episode.season, "|"+str(episode.episode)+"|"])
+            sqlResults = myDB.select("SELECT provider_cache.*, provider_cache_episodes.episode AS episode FROM provider_cache"
+                                     " JOIN provider_cache_episodes ON provider_cache_episodes.cache_id = provider_cache.cache_id"
+                                     " WHERE provider_cache.provider = ? AND provider_cache.tvdbid = ? AND provider_cache.season = ?"
+                                     " AND provider_cache_episodes.season = ? AND provider_cache_episodes.episode = ?"
+                                     " AND NOT EXISTS (SELECT 1 FROM provider_cache_episodes AS other_episodes WHERE other_episodes.cache_id = provider_cache.cache_id AND other_episodes.episode != ?)",
+                                     [self.providerID, episode.show.tvdbid, episode.season, episode.season, episode.episode, episode.episode])
 
         # for each cache entry
         for curResult in sqlResults:
@@ -385,10 +410,7 @@ class TVCache():
             curSeason = int(curResult["season"])
             if curSeason == -1:
                 continue
-            curEp = curResult["episodes"].split("|")[1]
-            if not curEp:
-                continue
-            curEp = int(curEp)
+            curEp = int(curResult["episode"])
             curQuality = int(curResult["quality"])
 
             # if the show says we want that episode then add it to the list
@@ -329,6 +329,8 @@ class TVRage:
         # insert it
         myDB.action("INSERT INTO tv_episodes (showid, tvdbid, name, season, episode, description, airdate, hasnfo, hastbn, status, location) VALUES (?,?,?,?,?,?,?,?,?,?,?)", \
                     [self.show.tvdbid, -1, self.nextEpInfo['name'], self.nextEpInfo['season'], self.nextEpInfo['episode'], '', self.nextEpInfo['airdate'].toordinal(), 0, 0, UNAIRED, ''])
+        self.show.setEpisodeStatus(self.nextEpInfo['season'], self.nextEpInfo['episode'], UNAIRED)
+        self.show.setEpisodeNumbers(self.nextEpInfo['season'], self.nextEpInfo['episode'], self.nextEpInfo['airdate'].toordinal(), None)
 
         # once it's in the DB make an object and return it
         ep = None
@@ -33,13 +33,15 @@ import sickbeard
 
 from sickbeard import config
 from sickbeard import history, notifiers, processTV
-from sickbeard import tv, ui
+from sickbeard import tv, ui, episode_cache
 from sickbeard import logger, helpers, exceptions, classes, db
 from sickbeard import encodingKludge as ek
 from sickbeard import search_queue
 from sickbeard import image_cache
 
 from sickbeard.providers import newznab
+from sickbeard.databases import mainDB
+from sickbeard.name_parser import parser
 from sickbeard.common import Quality, Overview, statusStrings
 from sickbeard.common import SNATCHED, DOWNLOADED, SKIPPED, UNAIRED, IGNORED, ARCHIVED, WANTED
 from sickbeard.exceptions import ex
@@ -136,6 +138,12 @@ class ManageSearches:
         t.backlogPaused = sickbeard.searchQueueScheduler.action.is_backlog_paused() #@UndefinedVariable
         t.backlogRunning = sickbeard.searchQueueScheduler.action.is_backlog_in_progress() #@UndefinedVariable
         t.searchStatus = sickbeard.currentSearchScheduler.action.amActive #@UndefinedVariable
+        t.dbMaintenanceStatus = sickbeard.dbMaintenanceScheduler.action.amActive #@UndefinedVariable
+        t.dbMaintenanceLastRun = sickbeard.dbMaintenanceScheduler.action.lastMaintenance #@UndefinedVariable
+        t.dbMaintenanceReport = sickbeard.dbMaintenanceScheduler.action.lastReport #@UndefinedVariable
+        t.folderWatcherStats = sickbeard.folderWatcherScheduler.action.stats() #@UndefinedVariable
+        t.parseCacheStats = parser.parseCache.stats()
+        t.parseResultCacheStats = helpers.parseResultCache.stats()
         t.submenu = ManageMenu
 
         return _munge(t)
@@ -161,6 +169,19 @@ class ManageSearches:
 
         redirect("/manage/manageSearches")
 
+    @cherrypy.expose
+    def forceDBMaintenance(self):
+
+        # forget the last run so it happens as soon as the queues are idle
+        sickbeard.dbMaintenanceScheduler.action.lastMaintenance = None #@UndefinedVariable
+        result = sickbeard.dbMaintenanceScheduler.forceRun()
+        if result:
+            logger.log(u"Database maintenance forced")
+            ui.notifications.message('Database maintenance started',
+                          'Note: it waits until no show or search is running')
+
+        redirect("/manage/manageSearches")
+
     @cherrypy.expose
     def forceVersionCheck(self):
 
@@ -1746,6 +1767,7 @@ class NewHomeAddShows:
 ErrorLogsMenu = [
     { 'title': 'Clear Errors', 'path': 'errorlogs/clearerrors' },
     #{ 'title': 'View Log',  'path': 'errorlogs/viewlog'  },
+    { 'title': 'Database Stats', 'path': 'errorlogs/dbStats' },
 ]
 
 
@@ -1765,6 +1787,36 @@ class ErrorLogs:
         classes.ErrorViewer.clear()
         redirect("/errorlogs")
 
+    @cherrypy.expose
+    def dbStats(self):
+
+        t = PageTemplate(file="dbStats.tmpl")
+        t.submenu = ErrorLogsMenu + [{ 'title': 'Reset Database Stats', 'path': 'errorlogs/clearDBStats' },
+                                     { 'title': 'Run Database Sanity Check', 'path': 'errorlogs/dbSanityCheck' }]
+
+        t.statsEnabled = sickbeard.DB_QUERY_STATS
+        t.slowQueryMs = sickbeard.DB_SLOW_QUERY_MS
+        t.statsSince = db.queryStats.since
+        t.queryStats = db.queryStats.getStats()
+        t.poolStats = db.connectionPool.stats()
+        t.writeQueueEnabled = db.writeQueue.isEnabled()
+        t.writeQueueStats = db.writeQueue.stats()
+        t.lastSanityCheck = db.getLastSanityCheck(db.DBConnection())
+        t.episodeCacheStats = episode_cache.episodeCache.stats()
+
+        return _munge(t)
+
+    @cherrypy.expose
+    def clearDBStats(self):
+        db.queryStats.clear()
+        redirect("/errorlogs/dbStats")
+
+    @cherrypy.expose
+    def dbSanityCheck(self):
+        db.sanityCheckDatabase(db.DBConnection(), mainDB.MainSanityCheck)
+        ui.notifications.message('Database sanity check completed')
+        redirect("/errorlogs/dbStats")
+
     @cherrypy.expose
     def viewlog(self, minLevel=logger.MESSAGE, maxLines=500):
 
@@ -2044,6 +2096,9 @@ class Home:
         elif sickbeard.showQueueScheduler.action.isInUpdateQueue(showObj): #@UndefinedVariable
             show_message = 'This show is queued and awaiting an update.'
 
+        elif showObj.loading:
+            show_message = 'This show is still being loaded, its folder hasn\'t been checked yet.'
+
         if not sickbeard.showQueueScheduler.action.isBeingAdded(showObj): #@UndefinedVariable
             if not sickbeard.showQueueScheduler.action.isBeingUpdated(showObj): #@UndefinedVariable
                 t.submenu.append({ 'title': 'Delete',            'path': 'home/deleteShow?show=%d'%showObj.tvdbid, 'confirm': True })
@@ -2168,6 +2223,10 @@ class Home:
                 except exceptions.CantRefreshException, e:
                     errors.append("Unable to refresh this show: "+ex(e))
 
+            # files have to be parsed again if the way they're parsed changes
+            if bool(showObj.air_by_date) != bool(air_by_date) or bool(showObj.anime) != bool(anime):
+                showObj.clearFileIndex()
+
             showObj.paused = paused
             showObj.air_by_date = air_by_date
             showObj.anime = anime
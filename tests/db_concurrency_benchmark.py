@@ -0,0 +1,79 @@
+"""
+Measures how long simple reads take while another thread is busy with a bulk write,
+once with the default rollback journal and once in WAL mode.
+
+Usage: python db_concurrency_benchmark.py [episodes to write]
+"""
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import shutil
+import tempfile
+import threading
+import time
+
+import sickbeard
+from sickbeard import db
+from sickbeard.databases import mainDB
+
+sickbeard.SYS_ENCODING = "UTF-8"
+
+# the migrations want to save the config and read a few settings
+sickbeard.save_config = lambda: None
+sickbeard.QUALITY_DEFAULT = 1
+sickbeard.SAB_HOST = ''
+
+def bulk_writer(num_episodes, done):
+    myDB = db.DBConnection()
+    with myDB.transaction():
+        for cur_ep in range(num_episodes):
+            myDB.upsert("tv_episodes", {"name": "Episode "+str(cur_ep), "status": 1}, {"showid": 1, "season": cur_ep / 100, "episode": cur_ep % 100})
+    done.set()
+
+def measure(journal_mode, num_episodes):
+
+    sickbeard.DATA_DIR = tempfile.mkdtemp()
+    sickbeard.DB_JOURNAL_MODE = journal_mode
+    db.connectionPool.closeAll()
+
+    try:
+        db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema)
+
+        done = threading.Event()
+        writer = threading.Thread(target=bulk_writer, args=(num_episodes, done))
+        writer.start()
+
+        latencies = []
+        myDB = db.DBConnection()
+        while not done.isSet():
+            start = time.time()
+            myDB.select("SELECT COUNT(*) FROM tv_episodes WHERE showid = ?", [1])
+            latencies.append(time.time() - start)
+            time.sleep(0.001)
+
+        writer.join()
+        db.connectionPool.closeAll()
+
+    finally:
+        shutil.rmtree(sickbeard.DATA_DIR)
+
+    latencies.sort()
+    if not latencies:
+        latencies = [0]
+
+    print "%-8s reads: %5d  p50: %8.3f ms  p95: %8.3f ms  max: %8.3f ms" % (journal_mode, len(latencies),
+                                                                          latencies[len(latencies) / 2] * 1000,
+                                                                          latencies[int(len(latencies) * 0.95)] * 1000,
+                                                                          latencies[-1] * 1000)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        num_episodes = int(sys.argv[1])
+    else:
+        num_episodes = 20000
+
+    print "Read latency while writing "+str(num_episodes)+" episodes in one transaction:"
+    for cur_mode in ('delete', 'wal'):
+        measure(cur_mode, num_episodes)
@@ -0,0 +1,55 @@
+import unittest
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import test_lib
+
+from sickbeard import db
+
+# the lookups the app runs all the time, none of them should have to scan a whole table
+main_queries = [
+    ("SELECT * FROM tv_episodes WHERE showid = ? AND season = ? AND episode = ?", [1, 1, 1]),
+    ("SELECT * FROM tv_episodes WHERE status = ? AND airdate < ?", [1, 734000]),
+    ("SELECT * FROM tv_episodes WHERE showid = ? and absolute_number = ? and season <> 0", [1, 1]),
+    ("SELECT * FROM tv_episodes WHERE showid = ? AND season != 0 AND absolute_number = ?", [1, 1]),
+    ("SELECT * FROM tv_episodes WHERE showid = ? AND airdate >= ? AND status = ? ORDER BY airdate ASC LIMIT 1", [1, 734000, 1]),
+    ("SELECT * FROM tv_shows WHERE tvdb_id = ?", [1]),
+    ("SELECT path, size, mtime, season, episodes FROM file_index WHERE showid = ?", [1]),
+    ("DELETE FROM file_index WHERE showid = ? AND path = ?", [1, "/tv/Show/Show.S01E01.avi"]),
+    ("SELECT * FROM history WHERE resource LIKE ? AND resource >= ? COLLATE NOCASE AND resource < ? COLLATE NOCASE", ["Show_Name_S01E02_Source_Quality_Etc-Group"] + list(db.likePrefixRange("Show_Name_S01E02_Source_Quality_Etc-Group"))),
+]
+
+cache_queries = [
+    ("SELECT * FROM scene_names WHERE name = ?", ["show name"]),
+    ("SELECT tvdb_id FROM scene_exceptions WHERE show_name_lower = ?", ["show name"]),
+    ("SELECT show_name FROM scene_exceptions WHERE tvdb_id = ?", [1]),
+    ("SELECT provider_cache.*, provider_cache_episodes.episode AS episode FROM provider_cache"
+     " JOIN provider_cache_episodes ON provider_cache_episodes.cache_id = provider_cache.cache_id"
+     " WHERE provider_cache.provider = ? AND provider_cache.tvdbid = ? AND provider_cache.season = ?"
+     " AND provider_cache_episodes.season = ? AND provider_cache_episodes.episode = ?"
+     " AND NOT EXISTS (SELECT 1 FROM provider_cache_episodes AS other_episodes WHERE other_episodes.cache_id = provider_cache.cache_id AND other_episodes.episode != ?)",
+     ["womble", 1, 1, 1, 2, 2]),
+    ("DELETE FROM provider_cache_episodes WHERE cache_id IN (SELECT cache_id FROM provider_cache WHERE provider = ?)", ["womble"]),
+]
+
+class IndexTests(test_lib.SickbeardDBTestCase):
+
+    def _test_no_scan(self, dbFileName, query, args):
+        myDB = db.DBConnection(dbFileName)
+        plan = [cur_step["detail"] for cur_step in myDB.select("EXPLAIN QUERY PLAN " + query, args)]
+        for cur_detail in plan:
+            self.assertFalse(cur_detail.startswith("SCAN"), query + " does a full scan: " + cur_detail)
+
+    def test_main_db(self):
+        for query, args in main_queries:
+            self._test_no_scan("sickbeard.db", query, args)
+
+    def test_cache_db(self):
+        for query, args in cache_queries:
+            self._test_no_scan("cache.db", query, args)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(IndexTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
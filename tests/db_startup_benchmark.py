@@ -0,0 +1,75 @@
+"""
+Measures the database part of startup on a large library: the migration checks and the sanity check,
+once the way it used to be done (probing every migration, always running the sanity check) and once
+with the db_version fast path.
+
+Usage: python db_startup_benchmark.py [shows] [episodes per show]
+"""
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import shutil
+import tempfile
+import time
+
+import sickbeard
+from sickbeard import db
+from sickbeard.databases import mainDB, cache_db
+
+sickbeard.SYS_ENCODING = "UTF-8"
+
+# the migrations want to save the config and read a few settings
+sickbeard.save_config = lambda: None
+sickbeard.QUALITY_DEFAULT = 1
+
+RUNS = 5
+
+def fill_library(num_shows, num_episodes):
+    myDB = db.DBConnection()
+    queries = []
+    for cur_show in range(num_shows):
+        queries.append(["INSERT INTO tv_shows (tvdb_id, show_name) VALUES (?,?)", [cur_show, "Show "+str(cur_show)]])
+        for cur_ep in range(num_episodes):
+            queries.append(["INSERT INTO tv_episodes (showid, season, episode, name, airdate, status) VALUES (?,?,?,?,?,?)",
+                            [cur_show, cur_ep / 20 + 1, cur_ep % 20 + 1, "Episode "+str(cur_ep), 730000 + cur_ep, 1]])
+    myDB.mass_action(queries)
+
+def startup(fast):
+    if fast:
+        mainUpgraded = db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema, mainDB.MAX_DB_VERSION)
+        db.upgradeDatabase(db.DBConnection("cache.db"), cache_db.InitialSchema, cache_db.MAX_DB_VERSION)
+        db.sanityCheckDatabase(db.DBConnection(), mainDB.MainSanityCheck, force=mainUpgraded)
+    else:
+        db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema)
+        db.upgradeDatabase(db.DBConnection("cache.db"), cache_db.InitialSchema)
+        db.sanityCheckDatabase(db.DBConnection(), mainDB.MainSanityCheck)
+
+def measure(fast):
+    times = []
+    for cur_run in range(RUNS):
+        # every start begins without any open connections
+        db.connectionPool.closeAll()
+        start = time.time()
+        startup(fast)
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) / 2]
+
+if __name__ == '__main__':
+    num_shows = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    num_episodes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    sickbeard.DATA_DIR = tempfile.mkdtemp()
+    try:
+        startup(True)
+        fill_library(num_shows, num_episodes)
+
+        print "Database startup with "+str(num_shows)+" shows and "+str(num_shows * num_episodes)+" episodes (median of "+str(RUNS)+" runs):"
+        print "full checks: %8.1f ms" % (measure(False) * 1000)
+        print "fast path:   %8.1f ms" % (measure(True) * 1000)
+
+        db.connectionPool.closeAll()
+    finally:
+        shutil.rmtree(sickbeard.DATA_DIR)
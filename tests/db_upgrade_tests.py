@@ -0,0 +1,34 @@
+import unittest
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import test_lib
+
+from sickbeard import db
+from sickbeard.databases import cache_db
+
+class UpgradeTests(test_lib.SickbeardDBTestCase):
+
+    def test_missing_version_table(self):
+        # cache.db files from before it had a db_version
+        myDB = db.DBConnection("cache.db")
+        myDB.action("DROP TABLE db_version")
+
+        db.upgradeDatabase(myDB, cache_db.InitialSchema, cache_db.MAX_DB_VERSION)
+
+        self.assertEqual(db.getDBVersion(myDB), cache_db.MAX_DB_VERSION)
+
+    def test_missing_version_row(self):
+        myDB = db.DBConnection("cache.db")
+        myDB.action("DELETE FROM db_version")
+
+        db.upgradeDatabase(myDB, cache_db.InitialSchema, cache_db.MAX_DB_VERSION)
+
+        self.assertEqual(myDB.select("SELECT db_version FROM db_version")[0][0], cache_db.MAX_DB_VERSION)
+        self.assertEqual(len(myDB.select("SELECT * FROM db_version")), 1)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(UpgradeTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
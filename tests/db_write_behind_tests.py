@@ -0,0 +1,105 @@
+import unittest
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import threading
+import time
+
+import test_lib
+
+import sickbeard
+from sickbeard import db
+
+class WriteBehindTests(test_lib.SickbeardDBTestCase):
+
+    def setUp(self):
+        test_lib.SickbeardDBTestCase.setUp(self)
+
+        self.oldSettings = (sickbeard.DB_WRITE_BEHIND, sickbeard.DB_WRITE_BEHIND_SIZE, sickbeard.DB_WRITE_BEHIND_SECONDS)
+        sickbeard.DB_WRITE_BEHIND = True
+        sickbeard.DB_WRITE_BEHIND_SIZE = 100
+        sickbeard.DB_WRITE_BEHIND_SECONDS = 0.05
+
+        db.writeQueue = db.WriteBehindQueue()
+
+        test_lib.addShow()
+
+    def tearDown(self):
+        db.writeQueue.flush()
+        sickbeard.DB_WRITE_BEHIND, sickbeard.DB_WRITE_BEHIND_SIZE, sickbeard.DB_WRITE_BEHIND_SECONDS = self.oldSettings
+        test_lib.SickbeardDBTestCase.tearDown(self)
+
+    def _queueName(self, name):
+        db.writeQueue.upsert("tv_shows", {"show_name": name}, {"tvdb_id": 1})
+
+    def _showName(self):
+        return db.DBConnection().select("SELECT show_name FROM tv_shows WHERE tvdb_id = 1")[0][0]
+
+    def test_rollback_keeps_pending_rows(self):
+        # the writer thread mustn't get to the row before the transaction does
+        sickbeard.DB_WRITE_BEHIND_SECONDS = 60
+        self._queueName("Queued")
+
+        myDB = db.DBConnection()
+        try:
+            with myDB.transaction():
+                # reading the table writes the queued row inside this transaction
+                self.assertEqual(myDB.select("SELECT show_name FROM tv_shows WHERE tvdb_id = 1")[0][0], "Queued")
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual(db.writeQueue.stats()['pending'], 1)
+
+        db.writeQueue.flush()
+        self.assertEqual(db.writeQueue.stats()['pending'], 0)
+        self.assertEqual(self._showName(), "Queued")
+
+    def test_rollback_doesnt_undo_newer_rows(self):
+        sickbeard.DB_WRITE_BEHIND_SECONDS = 60
+        self._queueName("Queued")
+
+        myDB = db.DBConnection()
+        try:
+            with myDB.transaction():
+                myDB.select("SELECT show_name FROM tv_shows WHERE tvdb_id = 1")
+                threading.Thread(target=self._queueName, args=("Newer",)).start()
+                time.sleep(0.1)
+                raise ValueError()
+        except ValueError:
+            pass
+
+        db.writeQueue.flush()
+        self.assertEqual(self._showName(), "Newer")
+
+    def test_commit(self):
+        sickbeard.DB_WRITE_BEHIND_SECONDS = 60
+        self._queueName("Queued")
+
+        myDB = db.DBConnection()
+        with myDB.transaction():
+            myDB.select("SELECT show_name FROM tv_shows WHERE tvdb_id = 1")
+
+        self.assertEqual(db.writeQueue.stats(), {'queued': 1, 'merged': 0, 'flushed': 1, 'pending': 0})
+        self.assertEqual(self._showName(), "Queued")
+
+    def test_one_writer_thread(self):
+        writers = set()
+        for i in range(5):
+            self._queueName("Name " + str(i))
+            for x in range(100):
+                if not db.writeQueue.stats()['pending']:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(self._showName(), "Name " + str(i))
+            writers.add(db.writeQueue._writer)
+
+        self.assertEqual(len(writers), 1)
+        self.assertTrue(writers.pop().isAlive())
+        self.assertEqual(db.writeQueue.stats()['flushed'], 5)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(WriteBehindTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,156 @@
+import unittest
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import linecache
+import random
+import threading
+
+import test_lib
+
+import sickbeard
+from sickbeard import db, episode_cache, tv
+from sickbeard.common import SKIPPED
+
+SEASONS = 3
+EPISODES = 20
+
+def interleave(code, func):
+    """
+    Returns a trace function that calls func whenever a frame of code is about to run a return
+    statement, the same as another thread getting in just before the return
+    """
+
+    def traceLines(frame, event, arg):
+        if event == 'line' and linecache.getline(frame.f_code.co_filename, frame.f_lineno).strip().startswith('return'):
+            func()
+        return traceLines
+
+    def traceCalls(frame, event, arg):
+        if frame.f_code is code:
+            return traceLines
+        return None
+
+    return traceCalls
+
+class EpisodeCacheTests(test_lib.SickbeardDBTestCase):
+
+    def setUp(self):
+        test_lib.SickbeardDBTestCase.setUp(self)
+
+        self.oldCacheSize = sickbeard.EPISODE_CACHE_SIZE
+        self.oldCache = episode_cache.episodeCache
+        episode_cache.episodeCache = episode_cache.EpisodeCache()
+
+        self.show = test_lib.addShow()
+
+        # hasnfo is set so building an episode the slow way doesn't go to TVDB
+        db.DBConnection().mass_action([["INSERT INTO tv_episodes (showid, tvdbid, name, season, episode, description, airdate, hasnfo, hastbn, status, location, absolute_number) VALUES (1, ?, ?, ?, ?, '', 730000, 1, 0, ?, '', 0)",
+                           [season * 100 + episode, "ep" + str(episode), season, episode, SKIPPED]]
+                          for season in range(1, SEASONS + 1) for episode in range(1, EPISODES + 1)])
+
+    def tearDown(self):
+        sickbeard.EPISODE_CACHE_SIZE = self.oldCacheSize
+        episode_cache.episodeCache = self.oldCache
+        test_lib.SickbeardDBTestCase.tearDown(self)
+
+    def _hydrate(self):
+        return self.show.hydrateEpisodes(db.DBConnection().select("SELECT * FROM tv_episodes WHERE showid = 1"))
+
+    def test_set_description_without_loading_it(self):
+        ep = self._hydrate()[0]
+
+        selects = []
+        oldSelect = db.DBConnection.select
+        db.DBConnection.select = lambda myDB, query, args=None: selects.append(query) or oldSelect(myDB, query, args)
+        try:
+            ep.description = "new description"
+        finally:
+            db.DBConnection.select = oldSelect
+
+        self.assertEqual(selects, [])
+        self.assertTrue(ep.dirty)
+
+        ep.saveToDB()
+        self.assertEqual(db.DBConnection().select("SELECT description FROM tv_episodes WHERE showid = 1 AND season = 1 AND episode = 1")[0][0], "new description")
+
+    def test_eviction(self):
+        sickbeard.EPISODE_CACHE_SIZE = 5
+
+        eps = self._hydrate()
+        held = eps[0]
+        dirty = eps[1]
+        dirty.name = "changed"
+        del eps
+
+        self.assertEqual(episode_cache.episodeCache.stats()['resident'], 5)
+
+        # nobody else holds these so they're gone from the show too
+        self.assertEqual(self.show.getEpisode(1, 10, noCreate=True), None)
+        self.assertEqual(self.show.getEpisode(2, 1, noCreate=True), None)
+
+        # still in use or not saved yet, the show has to keep handing out the same objects
+        self.assertTrue(self.show.getEpisode(1, 1, noCreate=True) is held)
+        self.assertTrue(self.show.getEpisode(1, 2, noCreate=True) is dirty)
+        self.assertEqual(dirty.name, "changed")
+
+        # the last ones that were touched
+        self.assertTrue(self.show.getEpisode(3, EPISODES, noCreate=True) != None)
+
+    def test_lookup_survives_eviction(self):
+        sickbeard.EPISODE_CACHE_SIZE = 1
+
+        # these stay in memory, touching them pushes everything else out of the cache
+        others = [x for x in self._hydrate() if x.season == 2]
+
+        def evict():
+            for curEp in others:
+                episode_cache.episodeCache.touch(curEp)
+
+        sys.settrace(interleave(tv.TVShow.getEpisode.im_func.func_code, evict))
+        try:
+            for season in (1, 3):
+                for episode in range(1, EPISODES + 1):
+                    ep = self.show.getEpisode(season, episode)
+                    self.assertEqual((ep.season, ep.episode), (season, episode))
+        finally:
+            sys.settrace(None)
+
+        self.assertTrue(episode_cache.episodeCache.stats()['evicted'] > 0)
+
+    def test_lookups_during_eviction(self):
+        # every lookup pushes something else out of the cache
+        sickbeard.EPISODE_CACHE_SIZE = 5
+        self._hydrate()
+
+        errors = []
+
+        def lookup():
+            try:
+                for i in range(300):
+                    season, episode = random.randint(1, SEASONS), random.randint(1, EPISODES)
+                    ep = self.show.getEpisode(season, episode)
+                    if ep == None or (ep.season, ep.episode) != (season, episode):
+                        errors.append("wrong episode for " + str(season) + "x" + str(episode) + ": " + repr(ep))
+            except Exception, e:
+                errors.append(repr(e))
+
+        oldInterval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [threading.Thread(target=lookup) for i in range(4)]
+            for curThread in threads:
+                curThread.start()
+            for curThread in threads:
+                curThread.join()
+        finally:
+            sys.setcheckinterval(oldInterval)
+
+        self.assertEqual(errors, [])
+        self.assertTrue(episode_cache.episodeCache.stats()['evicted'] > 0)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(EpisodeCacheTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
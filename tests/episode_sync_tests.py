@@ -0,0 +1,177 @@
+import unittest
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import datetime
+
+import test_lib
+
+import sickbeard
+from sickbeard import db, episode_sync
+from sickbeard.common import SKIPPED, UNAIRED, WANTED
+
+PAST = "2005-01-01"
+FUTURE = str(datetime.date.today() + datetime.timedelta(days=30))
+
+def tvdbEpisode(season, episode, name=None, firstaired=PAST):
+    return {"id": str(season * 100 + episode),
+            "episodename": name if name != None else "Episode " + str(episode),
+            "overview": "Overview of " + str(season) + "x" + str(episode),
+            "firstaired": firstaired,
+            "absolute_number": str((season - 1) * 10 + episode)}
+
+class FakeTvdb(object):
+    """
+    Stands in for tvdb_api.Tvdb, every show has the episodes in FakeTvdb.show
+    """
+
+    show = {}
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __getitem__(self, tvdbid):
+        return FakeTvdb.show
+
+class FakeTvdbApi(object):
+    Tvdb = FakeTvdb
+
+class EpisodeSyncTests(test_lib.SickbeardDBTestCase):
+
+    def setUp(self):
+        test_lib.SickbeardDBTestCase.setUp(self)
+
+        self.oldTvdbApi = episode_sync.tvdb_api
+        episode_sync.tvdb_api = FakeTvdbApi
+
+        FakeTvdb.show = {1: dict([(x, tvdbEpisode(1, x)) for x in range(1, 11)]),
+                         2: dict([(x, tvdbEpisode(2, x)) for x in range(1, 5)] + [(5, tvdbEpisode(2, 5, firstaired=FUTURE))])}
+
+        # the statuses are only worked out when the show dir is there
+        self.showDir = os.path.join(sickbeard.DATA_DIR, "Show")
+        os.mkdir(self.showDir)
+
+        self.show = test_lib.addShow(location=self.showDir)
+
+    def tearDown(self):
+        episode_sync.tvdb_api = self.oldTvdbApi
+        test_lib.SickbeardDBTestCase.tearDown(self)
+
+    def _row(self, season, episode):
+        sqlResults = db.DBConnection().select("SELECT * FROM tv_episodes WHERE showid = 1 AND season = ? AND episode = ?", [season, episode])
+        if sqlResults:
+            return sqlResults[0]
+        return None
+
+    def _sync(self):
+        """
+        Returns the counts from syncEpisodes and every statement it wrote to the DB
+        """
+
+        writes = []
+        oldAction = db.DBConnection.action
+        db.DBConnection.action = lambda myDB, query, args=None: writes.append(query) or oldAction(myDB, query, args)
+        try:
+            counts = episode_sync.syncEpisodes(self.show)
+        finally:
+            db.DBConnection.action = oldAction
+
+        return counts, writes
+
+    def test_insert(self):
+        counts, writes = self._sync()
+
+        self.assertEqual(counts, {'inserted': 15, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+        self.assertEqual(len(writes), 15)
+        self.assertEqual(db.DBConnection().select("SELECT COUNT(*) FROM tv_episodes WHERE showid = 1")[0][0], 15)
+
+        row = self._row(1, 3)
+        self.assertEqual(row["name"], "Episode 3")
+        self.assertEqual(row["tvdbid"], 103)
+        self.assertEqual(row["absolute_number"], 3)
+        self.assertEqual(row["airdate"], datetime.date(2005, 1, 1).toordinal())
+        self.assertEqual(row["status"], SKIPPED)
+        self.assertEqual(self._row(2, 5)["status"], UNAIRED)
+
+    def test_unchanged(self):
+        self._sync()
+
+        counts, writes = self._sync()
+
+        self.assertEqual(counts, {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 15})
+        self.assertEqual(writes, [])
+
+    def test_unchanged_with_nulls(self):
+        FakeTvdb.show[1][1]["overview"] = None
+        FakeTvdb.show[1][2]["absolute_number"] = None
+        self._sync()
+
+        # rows written by older versions or by hand
+        myDB = db.DBConnection()
+        myDB.action("UPDATE tv_episodes SET description = NULL WHERE showid = 1 AND season = 1 AND episode = 1")
+        myDB.action("UPDATE tv_episodes SET absolute_number = NULL WHERE showid = 1 AND season = 1 AND episode = 2")
+
+        counts, writes = self._sync()
+
+        self.assertEqual(counts, {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 15})
+        self.assertEqual(writes, [])
+
+    def test_update(self):
+        self._sync()
+        ep = self.show.getEpisode(1, 3)
+
+        FakeTvdb.show[1][3]["episodename"] = "Renamed"
+        FakeTvdb.show[2][5]["firstaired"] = PAST
+
+        counts, writes = self._sync()
+
+        self.assertEqual(counts, {'inserted': 0, 'updated': 2, 'deleted': 0, 'unchanged': 13})
+        self.assertEqual(self._row(1, 3)["name"], "Renamed")
+        self.assertEqual(self._row(2, 5)["status"], WANTED)
+
+        # the episode in memory has to match the DB
+        self.assertEqual(ep.name, "Renamed")
+        self.assertFalse(ep.dirty)
+        self.assertEqual(self.show.getEpisodeStatus(2, 5), WANTED)
+
+    def test_update_keeps_unsaved_changes(self):
+        self._sync()
+        ep = self.show.getEpisode(1, 3)
+        ep.description = "changed here"
+
+        FakeTvdb.show[1][3]["episodename"] = "Renamed"
+
+        counts, writes = self._sync()
+
+        self.assertEqual(counts['updated'], 1)
+        self.assertEqual(ep.description, "changed here")
+        self.assertTrue(ep.dirty)
+
+    def test_delete(self):
+        self._sync()
+        self.show.getEpisode(1, 10)
+
+        del FakeTvdb.show[1][10]
+
+        counts, writes = self._sync()
+
+        self.assertEqual(counts, {'inserted': 0, 'updated': 0, 'deleted': 1, 'unchanged': 14})
+        self.assertEqual(self._row(1, 10), None)
+        self.assertEqual(self.show.getEpisode(1, 10, noCreate=True), None)
+        self.assertEqual(self.show.getEpisodeStatus(1, 10), None)
+
+    def test_nameless_episode_is_deleted(self):
+        self._sync()
+
+        FakeTvdb.show[2][2]["episodename"] = ""
+
+        counts, writes = self._sync()
+
+        self.assertEqual(counts, {'inserted': 0, 'updated': 0, 'deleted': 1, 'unchanged': 14})
+        self.assertEqual(self._row(2, 2), None)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(EpisodeSyncTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,56 @@
+"""
+Measures how many names per second go through a new NameParser for every name, the way
+parse_result_wrapper and the cache use it, once compiling the regexes for every parser the way it
+used to be done, once taking them from the shared compiled pattern registry and once answering
+repeated names from the parse cache.
+
+Usage: python name_parser_benchmark.py [rounds]
+"""
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import time
+
+import sickbeard
+from sickbeard.name_parser import parser
+
+from name_parser_tests import simple_test_cases
+
+sickbeard.SYS_ENCODING = "UTF-8"
+
+def measure(names, rounds, modes, recompile, cache):
+    parsed = 0
+    start = time.time()
+    for cur_round in range(rounds):
+        for cur_name in names:
+            for cur_mode in modes:
+                if recompile:
+                    parser.refresh_compiled_regexes()
+                elif not cache:
+                    parser.parseCache.clear()
+                try:
+                    parser.NameParser(regexMode=cur_mode).parse(cur_name)
+                except parser.InvalidNameException:
+                    continue
+                parsed += 1
+                break
+    return time.time() - start, parsed
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    names = []
+    for cur_section in simple_test_cases.values():
+        names += cur_section.keys()
+
+    total = rounds * len(names)
+
+    print "Parsing "+str(len(names))+" names "+str(rounds)+" times with a new NameParser for every name:"
+    for modes, mode_label in (([parser.NameParser.NORMAL_REGEX], "normal"),
+                              ([parser.NameParser.ANIME_REGEX, parser.NameParser.NORMAL_REGEX], "anime, normal")):
+        for recompile, cache, label in ((True, False, "compile per parser"), (False, False, "shared registry"), (False, True, "parse cache")):
+            parser.parseCache.clear()
+            duration, parsed = measure(names, rounds, modes, recompile, cache)
+            print "%-14s %-19s %8.1f ms  %8.0f names/s  (%d parsed)" % (mode_label, label, duration * 1000, total / duration, parsed)
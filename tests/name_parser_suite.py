@@ -0,0 +1,284 @@
+"""
+Runs the release names in name_parser_corpus.txt through NameParser, Quality.nameQuality and
+show_name_helpers.filterBadReleases, checks what comes out against the corpus and measures how many
+names per second each of them gets through.
+
+The results are compared with name_parser_baseline.json. The run fails (exit status 1) if a name that
+was right in the baseline isn't any more, or if one of them got more than --tolerance slower than the
+baseline. The speeds are scaled by a short calibration loop first, so a baseline from a faster or slower
+machine can still be compared with.
+
+After changing the regexes on purpose (or to start over on another machine) write a new baseline with
+--update-baseline.
+
+Usage: python name_parser_suite.py [--update-baseline] [--tolerance 0.25] [--rounds 5] [-v]
+"""
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import datetime
+import optparse
+import re
+import time
+
+try:
+    import json
+except ImportError:
+    from lib import simplejson as json
+
+import sickbeard
+from sickbeard import helpers, show_name_helpers, show_registry
+from sickbeard.common import Quality
+from sickbeard.name_parser import parser
+
+sickbeard.SYS_ENCODING = "UTF-8"
+sickbeard.IGNORE_WORDS = "german,french,core2hd,dutch,swedish"
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'name_parser_corpus.txt')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'name_parser_baseline.json')
+
+KINDS = ('scene', 'multi_episode', 'air_by_date', 'anime')
+
+CHECKS = ('NameParser', 'nameQuality', 'filterBadReleases')
+
+class CorpusEntry(object):
+    def __init__(self, line):
+        (self.kind, self.name, series_name, season, episodes, ab_episodes, air_date, release_group, quality, good) = line.split('\t')
+
+        if self.kind not in KINDS:
+            raise ValueError("Unknown kind " + self.kind)
+
+        self.anime = self.kind == 'anime'
+
+        self.result = parser.ParseResult(self.name,
+                                         series_name or None,
+                                         int(season) if season else None,
+                                         [int(x) for x in episodes.split(',') if x],
+                                         None,
+                                         release_group or None,
+                                         datetime.date(*[int(x) for x in air_date.split('-')]) if air_date else None,
+                                         [int(x) for x in ab_episodes.split(',') if x])
+        self.quality = getattr(Quality, quality)
+        self.good = good == '1'
+
+class CorpusShow(object):
+    """
+    Stands in for a TVShow in the show list, parse_result_wrapper only needs to know its name, ids and
+    whether it's an anime
+    """
+
+    def __init__(self, tvdbid, name, is_anime):
+        self.tvdbid = tvdbid
+        self.tvrid = 0
+        self.name = name
+        self.tvrname = ""
+        self.is_anime = is_anime
+
+def load_corpus():
+    corpus = []
+    for cur_line in open(CORPUS_FILE):
+        cur_line = cur_line.rstrip('\r\n')
+        if not cur_line or cur_line.startswith('#'):
+            continue
+        corpus.append(CorpusEntry(cur_line))
+    return corpus
+
+def show_list(corpus):
+    """
+    Returns a show list with the shows of the corpus in it, so the anime releases are recognised as
+    anime like they would be with the shows added
+    """
+
+    shows = {}
+    for entry in corpus:
+        if entry.result.series_name and entry.result.series_name not in shows:
+            shows[entry.result.series_name] = CorpusShow(len(shows) + 1, entry.result.series_name, entry.anime)
+    return show_registry.ShowRegistry(sorted(shows.values(), key=lambda x: x.tvdbid))
+
+def _parser_for(entry):
+    if entry.anime:
+        return parser.NameParser(False, parser.NameParser.ANIME_REGEX)
+    else:
+        return parser.NameParser(False, parser.NameParser.NORMAL_REGEX)
+
+def _parsed_right(entry):
+    try:
+        result = _parser_for(entry).parse(entry.name)
+    except parser.InvalidNameException:
+        return False
+
+    # the corpus doesn't know what the extra info is supposed to be
+    return result.series_name == entry.result.series_name and \
+           result.season_number == entry.result.season_number and \
+           result.episode_numbers == entry.result.episode_numbers and \
+           result.ab_episode_numbers == entry.result.ab_episode_numbers and \
+           result.air_date == entry.result.air_date and \
+           result.release_group == entry.result.release_group
+
+def _clear_caches():
+    parser.parseCache.clear()
+    helpers.parseResultCache.clear()
+
+def check(corpus):
+    """
+    Returns {check: [the names it got wrong]}
+    """
+
+    _clear_caches()
+
+    wrong = dict([(x, []) for x in CHECKS])
+    for entry in corpus:
+        if not _parsed_right(entry):
+            wrong['NameParser'].append(entry.name)
+        if Quality.nameQuality(entry.name, entry.anime) != entry.quality:
+            wrong['nameQuality'].append(entry.name)
+        if show_name_helpers.filterBadReleases(entry.name) != entry.good:
+            wrong['filterBadReleases'].append(entry.name)
+
+    return wrong
+
+def _run_parser(corpus):
+    normal_parser = parser.NameParser(False, parser.NameParser.NORMAL_REGEX)
+    anime_parser = parser.NameParser(False, parser.NameParser.ANIME_REGEX)
+    for entry in corpus:
+        try:
+            (anime_parser if entry.anime else normal_parser).parse(entry.name)
+        except parser.InvalidNameException:
+            pass
+
+def _run_quality(corpus):
+    for entry in corpus:
+        Quality.nameQuality(entry.name, entry.anime)
+
+def _run_filter(corpus):
+    for entry in corpus:
+        show_name_helpers.filterBadReleases(entry.name)
+
+def measure(corpus, rounds):
+    """
+    Returns {check: names per second}, the best of a few rounds. The caches are cleared before every
+    round so every name is parsed for real.
+    """
+
+    speeds = {}
+    for check_name, run in (('NameParser', _run_parser), ('nameQuality', _run_quality), ('filterBadReleases', _run_filter)):
+        best = None
+        for cur_round in range(rounds):
+            _clear_caches()
+            start = time.time()
+            run(corpus)
+            duration = time.time() - start
+            if best == None or duration < best:
+                best = duration
+        speeds[check_name] = len(corpus) / best
+    return speeds
+
+def calibrate(rounds):
+    """
+    Returns how many iterations per second of a fixed string and regex workload this machine manages
+    """
+
+    pattern = re.compile(r'^(?P<name>.+?)[. _-]+s(?P<season>\d+)e(?P<episode>\d+)', re.I)
+
+    best = None
+    for cur_round in range(rounds):
+        start = time.time()
+        for i in xrange(20000):
+            match = pattern.match('calibration.show.name.s%02de%02d.x264' % (i % 30, i % 24))
+            match.group('name').replace('.', ' ').title()
+        duration = time.time() - start
+        if best == None or duration < best:
+            best = duration
+    return 20000 / best
+
+def accuracy_by_kind(corpus, wrong_names):
+    report = {}
+    wrong_names = set(wrong_names)
+    for kind in KINDS:
+        names = [x.name for x in corpus if x.kind == kind]
+        report[kind] = (len(names) - len([x for x in names if x in wrong_names]), len(names))
+    return report
+
+if __name__ == '__main__':
+    option_parser = optparse.OptionParser(usage="usage: %prog [--update-baseline] [--tolerance 0.25] [--rounds 5] [-v]")
+    option_parser.add_option('--update-baseline', action='store_true', dest='update', default=False,
+                             help="write the results of this run to " + os.path.basename(BASELINE_FILE))
+    option_parser.add_option('--tolerance', type='float', dest='tolerance', default=0.25,
+                             help="how much slower than the baseline is still fine, 0.25 is 25%")
+    option_parser.add_option('--rounds', type='int', dest='rounds', default=5,
+                             help="how many times the corpus is timed, the best round counts")
+    option_parser.add_option('-v', action='store_true', dest='verbose', default=False,
+                             help="list every name that's wrong")
+    (options, args) = option_parser.parse_args()
+
+    corpus = load_corpus()
+
+    sickbeard.showList = show_list(corpus)
+    helpers.update_anime_support()
+
+    wrong = check(corpus)
+    speeds = measure(corpus, options.rounds)
+    calibration = calibrate(options.rounds)
+
+    baseline = None
+    if os.path.isfile(BASELINE_FILE):
+        baseline = json.load(open(BASELINE_FILE))
+
+    print "Checking "+str(len(corpus))+" names from "+os.path.basename(CORPUS_FILE)+":"
+    print
+
+    failed = False
+
+    for check_name in CHECKS:
+        accuracy = accuracy_by_kind(corpus, wrong[check_name])
+        print "%-18s %s" % (check_name, "  ".join(["%s %d/%d" % (kind, accuracy[kind][0], accuracy[kind][1]) for kind in KINDS]))
+
+        if options.verbose:
+            for cur_name in wrong[check_name]:
+                print "    wrong: " + cur_name
+
+        if baseline and not options.update:
+            was_wrong = set(baseline['wrong'][check_name])
+            broken = [x for x in wrong[check_name] if x not in was_wrong]
+            fixed = was_wrong - set(wrong[check_name])
+
+            for cur_name in broken:
+                print "    REGRESSION: " + cur_name
+            if broken:
+                failed = True
+            if fixed:
+                print "    " + str(len(fixed)) + " names are right now that weren't in the baseline, update it to keep them that way"
+
+    print
+
+    # what the baseline's speeds would be on this machine
+    scale = 1.0
+    if baseline:
+        scale = calibration / baseline['calibration']
+
+    for check_name in CHECKS:
+        line = "%-18s %9.0f names/s" % (check_name, speeds[check_name])
+
+        if baseline and not options.update:
+            expected = baseline['names_per_second'][check_name] * scale
+            line += "  baseline %9.0f names/s  %+5.1f%%" % (expected, (speeds[check_name] / expected - 1) * 100)
+            if speeds[check_name] < expected * (1 - options.tolerance):
+                line += "  TOO SLOW"
+                failed = True
+
+        print line
+
+    if options.update or not baseline:
+        json.dump({'calibration': calibration,
+                   'names_per_second': speeds,
+                   'wrong': dict([(x, sorted(wrong[x])) for x in CHECKS])},
+                  open(BASELINE_FILE, 'w'), indent=1, sort_keys=True, separators=(',', ': '))
+        print
+        print "Wrote the baseline to " + os.path.basename(BASELINE_FILE)
+
+    if failed:
+        print
+        print "FAILED"
+        sys.exit(1)
@@ -1,4 +1,5 @@
 import datetime
+import pickle
 import unittest
 
 import sys, os.path
@@ -399,6 +400,130 @@ class BasicTests(unittest.TestCase):
     def test_combination_names(self):
         pass
 
+class ParseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        parser.parseCache.clear()
+
+    def test_cached_results_are_copies(self):
+        np = parser.NameParser(False)
+        hits = parser.parseCache.hits
+        first = np.parse('Show.Name.S01E02.Source.Quality.Etc-Group')
+        first.episode_numbers.append(3)
+        first.series_name = 'Changed'
+
+        second = np.parse('Show.Name.S01E02.Source.Quality.Etc-Group')
+        self.assertEqual(second, parser.ParseResult(None, 'Show Name', 1, [2], 'Source.Quality.Etc', 'Group'))
+        self.assertEqual(second.which_regex, ['standard'])
+        self.assertEqual(parser.parseCache.hits, hits + 1)
+
+    def test_invalid_names_are_cached(self):
+        np = parser.NameParser(False)
+        self.assertRaises(parser.InvalidNameException, np.parse, '')
+        hits = parser.parseCache.hits
+        self.assertRaises(parser.InvalidNameException, np.parse, '')
+        self.assertEqual(parser.parseCache.hits, hits + 1)
+
+    def test_least_recently_used_are_dropped(self):
+        cache = parser.ParseCache(2)
+        cache.put('a', parser.ParseResult('a'))
+        cache.put('b', parser.ParseResult('b'))
+        cache.get('a')
+        cache.put('c', parser.ParseResult('c'))
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a').original_name, 'a')
+        self.assertEqual(cache.stats()['size'], 2)
+
+class ParseManyTests(unittest.TestCase):
+
+    def _names(self):
+        names = []
+        for cur_section in simple_test_cases.values():
+            names += cur_section.keys()
+        return names + ['', 'not an episode']
+
+    def _parse(self, np, name):
+        try:
+            return np.parse(name)
+        except parser.InvalidNameException:
+            return None
+
+    def test_same_as_parse(self):
+        np = parser.NameParser(False)
+        names = self._names()
+        self.assertEqual(np.parse_many(names), [self._parse(np, x) for x in names])
+
+    def test_pool(self):
+        np = parser.NameParser(False, parser.NameParser.ALL_REGEX)
+        names = self._names() * 5
+
+        old_threshold = parser.PARSE_POOL_THRESHOLD
+        parser.PARSE_POOL_THRESHOLD = 10
+        try:
+            pooled = np.parse_many(names, processes=2)
+        finally:
+            parser.PARSE_POOL_THRESHOLD = old_threshold
+
+        self.assertEqual(pooled, np.parse_many(names, processes=1))
+        self.assertEqual([x and x.which_regex for x in pooled], [x and x.which_regex for x in np.parse_many(names, processes=1)])
+
+    def test_pickle(self):
+        result = parser.NameParser(False).parse('Show.Name.2010.11.23.Source.Quality.Etc-Group')
+        unpickled = pickle.loads(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(unpickled, result)
+        self.assertEqual(unpickled.which_regex, result.which_regex)
+        self.assertEqual(unpickled.air_date, datetime.date(2010, 11, 23))
+
+class RoutingTests(unittest.TestCase):
+    """
+    The required tokens may only rule out patterns that can't match anyway. Every name in this corpus
+    has to parse the same with them as it does when every pattern is tried.
+    """
+
+    def _corpus(self):
+
+        names = []
+        for cur_section in simple_test_cases.values():
+            names += cur_section.keys()
+        names += [x[0] for x in combination_test_cases]
+        names += [x[0] for x in unicode_test_cases]
+
+        corpus = []
+        for cur_name in names:
+            corpus += [cur_name, cur_name + '.avi', cur_name.lower(), cur_name.upper(),
+                       cur_name.replace('.', ' '), cur_name.replace('.', '_'), cur_name.replace(' ', '.'),
+                       os.path.join(names[len(corpus) % len(names)], cur_name)]
+
+        for cur_show in ('Show Name', 'Show.Name.2010', '24', '[Group] Anime Show', 'Show-Name (US)'):
+            for cur_ep in ('S01E02', 's1e2', '1x02', 'S01E02E03', 'S01E02-03', 'S01.E02.S01.E03', '1x02x03', '102', '1920',
+                           '2010.11.23', '2010-23-11', 'Season 1 Episode 2', 'Season.01', 'S04.Special', 'Part.1', 'Pt.IV',
+                           'Ep 5', 'E02-03', 'Part.1.and.Part.2', '05', '313', '313-314', '12v2', 'S16E03 - 313', '313 - s16e03'):
+                for cur_extra in ('', '.720p.HDTV.x264-GRP', ' [720p]', ' [XviD]', ' [h264-720p][96D3F1BF]', ' (1280x720 h264 AAC)',
+                                  ' - Ep Name', '_[H264][720p][EB7838FC]', '-abc102', ' [720p'):
+                    for cur_sep in ('.', ' - ', '_'):
+                        corpus.append(cur_show + cur_sep + cur_ep + cur_extra)
+
+        return corpus
+
+    def _parse(self, np, name):
+        try:
+            result = np._parse(name)
+        except Exception, e:
+            return (e.__class__, str(e))
+        return (result, result.which_regex)
+
+    def test_same_results(self):
+        corpus = self._corpus()
+
+        for regex_mode in (parser.NameParser.ALL_REGEX, parser.NameParser.NORMAL_REGEX, parser.NameParser.ANIME_REGEX):
+            for file_name in (True, False):
+                routed = parser.NameParser(file_name, regex_mode)
+                unrouted = parser.NameParser(file_name, regex_mode)
+                unrouted.regex_routes = [(x[0], x[1], None) for x in unrouted.regex_routes]
+
+                for cur_name in corpus:
+                    self.assertEqual(self._parse(routed, cur_name), self._parse(unrouted, cur_name), cur_name)
+
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         suite = unittest.TestLoader().loadTestsFromName('name_parser_tests.BasicTests.test_'+sys.argv[1])
@@ -411,3 +536,12 @@ if __name__ == '__main__':
 
     suite = unittest.TestLoader().loadTestsFromTestCase(UnicodeTests)
     unittest.TextTestRunner(verbosity=2).run(suite)
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(ParseCacheTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(ParseManyTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+    suite = unittest.TestLoader().loadTestsFromTestCase(RoutingTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,60 @@
+"""
+Measures NameParser.parse_many on a big batch of synthetic file names, the way the files of a big
+show dir are parsed when it's added, once one by one in this process and once with a pool of 2, 4, ...
+processes up to the number of CPUs.
+
+Usage: python parse_many_benchmark.py [number of names]
+"""
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import multiprocessing
+import time
+
+import sickbeard
+from sickbeard.name_parser import parser
+
+sickbeard.SYS_ENCODING = "UTF-8"
+
+def synthetic_names(count):
+    shows = ['Show Name', 'The.Other.Show', 'Show_Name_2010', 'Another Show (US)', 'Show Name - The Series']
+    formats = ['%(show)s.S%(season)02dE%(episode)02d.720p.HDTV.x264-GRP.mkv',
+               '%(show)s - %(season)dx%(episode)02d - Episode Name.avi',
+               '%(show)s.S%(season)02dE%(episode)02dE%(next)02d.Source.Quality.Etc-Group.mkv',
+               '%(show)s.2010.%(season)02d.%(episode)02d.HDTV.XviD-GRP.avi',
+               'Season %(season)d/%(show)s - S%(season)02dE%(episode)02d - Episode Name.mkv',
+               '%(show)s.%(season)d%(episode)02d.HDTV.XviD-GRP.avi']
+
+    names = []
+    for i in range(count):
+        values = {'show': shows[i % len(shows)],
+                  'season': i / 500 % 12 + 1,
+                  'episode': i % 24 + 1,
+                  'next': i % 24 + 2}
+        names.append(os.path.join('/tv', values['show'], formats[i / len(shows) % len(formats)] % values))
+    return names
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    names = synthetic_names(count)
+    name_parser = parser.NameParser()
+
+    cpus = multiprocessing.cpu_count()
+    process_counts = [1] + [x for x in (2, 4, 8, 16) if x < cpus] + (cpus > 1 and [cpus] or [])
+
+    print "Parsing "+str(count)+" file names on "+str(cpus)+" CPUs:"
+
+    serial_duration = None
+    for processes in process_counts:
+        start = time.time()
+        results = name_parser.parse_many(names, processes=processes)
+        duration = time.time() - start
+
+        if serial_duration == None:
+            serial_duration = duration
+
+        print "%2d processes %8.1f ms  %8.0f names/s  %5.2fx  (%d parsed)" % (processes, duration * 1000, count / duration,
+                                                                           serial_duration / duration, len(filter(None, results)))
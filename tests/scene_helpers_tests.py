@@ -64,7 +64,7 @@ class SceneTests(unittest.TestCase):
     def test_allPossibleShowNames(self):
         #common.sceneExceptions[-1] = ['Exception Test']
         myDB = db.DBConnection("cache.db")
-        myDB.action("INSERT INTO scene_exceptions (tvdb_id, show_name) VALUES (?,?)", [-1, 'Exception Test'])
+        myDB.action("INSERT INTO scene_exceptions (tvdb_id, show_name, show_name_lower) VALUES (?,?,?)", [-1, 'Exception Test', 'exception test'])
         common.countryList['Full Country Name'] = 'FCN'
         
         self._test_allPossibleShowNames('Show Name', expected=['Show Name'])
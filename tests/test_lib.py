@@ -0,0 +1,50 @@
+"""
+What the tests that need a database have in common: the settings the migrations read, a test case
+that gives every test fresh databases in a temp DATA_DIR and a way to add a show to them.
+
+Import it after adding .. and ../lib to sys.path.
+"""
+
+import shutil
+import tempfile
+import unittest
+
+import sickbeard
+from sickbeard import db, show_registry, tv
+from sickbeard.databases import mainDB, cache_db
+
+sickbeard.SYS_ENCODING = "UTF-8"
+
+# the migrations want to save the config and read a few settings
+sickbeard.save_config = lambda: None
+sickbeard.QUALITY_DEFAULT = 1
+sickbeard.SEASON_FOLDERS_DEFAULT = 0
+
+class SickbeardDBTestCase(unittest.TestCase):
+    """
+    Runs every test against new, fully migrated sickbeard.db and cache.db files and an empty show list
+    """
+
+    def setUp(self):
+        sickbeard.DATA_DIR = tempfile.mkdtemp()
+        sickbeard.showList = show_registry.ShowRegistry()
+        db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema)
+        db.upgradeDatabase(db.DBConnection("cache.db"), cache_db.InitialSchema)
+
+    def tearDown(self):
+        db.connectionPool.closeAll()
+        shutil.rmtree(sickbeard.DATA_DIR)
+
+def addShow(tvdbid=1, name="Show", location=""):
+    """
+    Writes a tv_shows row and returns the show built from it, it's in sickbeard.showList too
+    """
+
+    myDB = db.DBConnection()
+    myDB.action("INSERT INTO tv_shows (tvdb_id, tvr_id, tvr_name, network, genre, runtime, startyear, status, airs, show_name, location, lang, quality, seasonfolders, paused, air_by_date, anime)"
+                " VALUES (?, 0, '', '', '', 30, 2000, 'Continuing', '', ?, ?, 'en', 1, 0, 0, 0, 0)", [tvdbid, name, location])
+
+    show = tv.TVShow.fromDBRow(myDB.select("SELECT * FROM tv_shows WHERE tvdb_id = ?", [tvdbid])[0])
+    sickbeard.showList.append(show)
+
+    return show
@@ -0,0 +1,92 @@
+import unittest
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import test_lib
+
+import sickbeard
+from sickbeard import db, exceptions, metadata, tv
+from sickbeard.metadata import helpers as metadata_helpers
+from sickbeard.common import SKIPPED
+
+# the naming settings' defaults, prettyName needs them
+sickbeard.NAMING_EP_TYPE = 0
+sickbeard.NAMING_MULTI_EP_TYPE = 0
+sickbeard.NAMING_SEP_TYPE = 0
+
+class TVEpisodeTests(test_lib.SickbeardDBTestCase):
+    """
+    TVEpisode has __slots__, these go through the code outside tv.py that sets attributes on episodes
+    """
+
+    def setUp(self):
+        test_lib.SickbeardDBTestCase.setUp(self)
+
+        self.showDir = os.path.join(sickbeard.DATA_DIR, "Show")
+        os.mkdir(self.showDir)
+        self.show = test_lib.addShow(location=self.showDir)
+
+        # a double episode, hasnfo is set so building it doesn't go to TVDB
+        self.epFile = os.path.join(self.showDir, "Show.S01E01E02.avi")
+        open(self.epFile, "w").write("episode")
+        db.DBConnection().mass_action([["INSERT INTO tv_episodes (showid, tvdbid, name, season, episode, description, airdate, hasnfo, hastbn, status, location, absolute_number) VALUES (1, ?, ?, 1, ?, '', 730000, 1, 0, ?, ?, 0)",
+                                        [100 + x, "ep" + str(x), x, SKIPPED, self.epFile]] for x in (1, 2)])
+
+        self.ep = self.show.getEpisode(1, 1)
+        self.ep.relatedEps = [self.show.getEpisode(1, 2)]
+
+        self.oldProviders = sickbeard.metadata_provider_dict
+        self.oldGetShowImage = metadata_helpers.getShowImage
+
+    def tearDown(self):
+        sickbeard.metadata_provider_dict = self.oldProviders
+        metadata_helpers.getShowImage = self.oldGetShowImage
+        test_lib.SickbeardDBTestCase.tearDown(self)
+
+    def test_metadata_providers(self):
+        metadata_helpers.getShowImage = lambda url, which=None: "image"
+
+        for curName in metadata.available_generators():
+            curProvider = metadata._getMetadataModule(curName).metadata_class(episode_thumbnails=True)
+            curProvider._get_episode_thumb_url = lambda ep_obj: "http://thumb"
+            sickbeard.metadata_provider_dict = {curName: curProvider}
+
+            for curEp in [self.ep] + self.ep.relatedEps:
+                curEp.hastbn = False
+
+            self.assertTrue(self.ep.createThumbnail(), curName)
+            self.assertTrue(self.ep.hastbn and self.ep.relatedEps[0].hastbn, curName)
+
+            self.ep.checkForMetaFiles()
+            self.assertTrue(self.ep.hastbn, curName)
+
+    def test_delete_episode_the_show_already_dropped(self):
+        # another thread (a sync) takes the episode out of the show while it's being deleted
+        oldGetEpisode = self.show.getEpisode
+        def getEpisode(season, episode, *args, **kwargs):
+            result = oldGetEpisode(season, episode, *args, **kwargs)
+            self.show.episodes[season].pop(episode, None)
+            return result
+        self.show.getEpisode = getEpisode
+
+        self.assertRaises(exceptions.EpisodeDeletedException, self.ep.deleteEpisode)
+        self.assertEqual(db.DBConnection().select("SELECT * FROM tv_episodes WHERE showid = 1 AND season = 1 AND episode = 1"), [])
+
+    def test_unparsable_file_is_parsed_once(self):
+        open(os.path.join(self.showDir, "not an episode.avi"), "w").write("x")
+
+        parsed = []
+        oldWrapper = tv.parse_result_wrapper
+        tv.parse_result_wrapper = lambda show, name, *args: parsed.append(name) or oldWrapper(show, name, *args)
+        try:
+            self.show.loadEpisodesFromDir()
+        finally:
+            tv.parse_result_wrapper = oldWrapper
+
+        self.assertEqual(parsed, [])
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TVEpisodeTests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
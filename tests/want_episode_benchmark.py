@@ -0,0 +1,81 @@
+"""
+Measures TVShow.wantEpisode() for a batch of cached search results, once asking the database
+for every episode's status and once answering from the in-memory status map.
+
+Usage: python want_episode_benchmark.py [shows] [cached items]
+"""
+
+import sys, os.path
+sys.path.append(os.path.abspath('..'))
+sys.path.append(os.path.abspath('../lib'))
+
+import random
+import shutil
+import tempfile
+import time
+
+import sickbeard
+from sickbeard import db, show_registry
+from sickbeard.common import Quality, WANTED, SKIPPED, DOWNLOADED
+from sickbeard.databases import mainDB
+from sickbeard.tv import TVShow
+
+sickbeard.SYS_ENCODING = "UTF-8"
+
+# the migrations and TVShow want to save the config and read a few settings
+sickbeard.save_config = lambda: None
+sickbeard.QUALITY_DEFAULT = 1
+sickbeard.SEASON_FOLDERS_DEFAULT = 0
+
+EPISODES_PER_SHOW = 100
+
+def fill_library(num_shows):
+    queries = []
+    for cur_show in range(num_shows):
+        queries.append(["INSERT INTO tv_shows (tvdb_id, show_name, location, quality, seasonfolders, paused, tvr_id, lang) VALUES (?,?,?,?,?,?,?,?)",
+                        [cur_show, "Show "+str(cur_show), "", Quality.combineQualities([Quality.SDTV, Quality.HDTV], [Quality.HDWEBDL]), 0, 0, 0, "en"]])
+        for cur_ep in range(EPISODES_PER_SHOW):
+            status = random.choice([WANTED, SKIPPED, Quality.compositeStatus(DOWNLOADED, Quality.SDTV)])
+            queries.append(["INSERT INTO tv_episodes (showid, season, episode, name, airdate, status) VALUES (?,?,?,?,?,?)",
+                            [cur_show, cur_ep / 20 + 1, cur_ep % 20 + 1, "Episode "+str(cur_ep), 730000 + cur_ep, status]])
+    db.DBConnection().mass_action(queries)
+
+def measure(shows, items, use_cache, reset):
+    sickbeard.DB_EPISODE_STATUS_CACHE = use_cache
+    if reset:
+        for cur_show in shows:
+            cur_show.resetEpisodeStatus()
+
+    start = time.time()
+    wanted = 0
+    for show, season, episode, quality in items:
+        if show.wantEpisode(season, episode, quality):
+            wanted += 1
+    return time.time() - start, wanted
+
+if __name__ == '__main__':
+    num_shows = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    num_items = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    random.seed(1)
+    sickbeard.DATA_DIR = tempfile.mkdtemp()
+    try:
+        db.upgradeDatabase(db.DBConnection(), mainDB.InitialSchema)
+        fill_library(num_shows)
+
+        sickbeard.showList = show_registry.ShowRegistry()
+        for cur_show in range(num_shows):
+            sickbeard.showList.append(TVShow(cur_show))
+
+        items = [(random.choice(sickbeard.showList), random.randint(1, 6), random.randint(1, 20), random.choice([Quality.SDTV, Quality.HDTV, Quality.HDWEBDL, Quality.HDBLURAY]))
+                 for x in range(num_items)]
+
+        print "wantEpisode for "+str(num_items)+" cached items against "+str(num_shows)+" shows:"
+        # the first in-memory run includes loading every show's statuses
+        for use_cache, reset, label in ((False, True, "database"), (True, True, "in memory, cold"), (True, False, "in memory, warm")):
+            duration, wanted = measure(sickbeard.showList, items, use_cache, reset)
+            print "%-16s %8.1f ms  (%d wanted)" % (label, duration * 1000, wanted)
+
+        db.connectionPool.closeAll()
+    finally:
+        shutil.rmtree(sickbeard.DATA_DIR)